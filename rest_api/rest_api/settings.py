@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import datetime
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # mesure des requêtes (en-tête Server-Timing), voir SOFT_DESK_TIMING
+    'soft_desk.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,6 +52,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # lectures des requêtes GET sur les réplicas, voir soft_desk/routers.py
+    'soft_desk.middleware.ReadReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'rest_api.urls'
@@ -73,13 +79,114 @@ WSGI_APPLICATION = 'rest_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Profil choisi par la variable d'environnement SOFT_DESK_DB_PROFILE :
+# - 'sqlite' (par défaut) : fichier SQLite, journalisation par défaut
+# - 'sqlite-wal' : SQLite en WAL, connexions persistantes (voir SOFT_DESK_SQLITE_PRAGMAS)
+# - 'postgresql' : PostgreSQL, configuré par les variables POSTGRES_*
+SOFT_DESK_DB_PROFILE = os.environ.get('SOFT_DESK_DB_PROFILE', 'sqlite')
+
+if SOFT_DESK_DB_PROFILE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'soft_desk'),
+            'USER': os.environ.get('POSTGRES_USER', 'soft_desk'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('POSTGRES_CONNECT_TIMEOUT', 5)),
+                'sslmode': os.environ.get('POSTGRES_SSLMODE', 'prefer'),
+                'application_name': 'soft_desk',
+            },
+            # à activer derrière un pooler en mode transaction (PgBouncer)
+            'DISABLE_SERVER_SIDE_CURSORS':
+                os.environ.get('POSTGRES_DISABLE_SERVER_SIDE_CURSORS') == '1',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get(
+                'DB_CONN_MAX_AGE', 60 if SOFT_DESK_DB_PROFILE == 'sqlite-wal' else 0)),
+        }
     }
+
+# Caches : 'default' est local à chaque processus, 'shared' est partagé entre les
+# processus d'un même hôte (fichiers dans SOFT_DESK_SHARED_CACHE_PATH) ; sur plusieurs
+# hôtes, le remplacer par un cache réseau (Memcached)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SOFT_DESK_SHARED_CACHE_PATH',
+                                   os.path.join(tempfile.gettempdir(), 'soft_desk_cache')),
+    },
+}
+
+# Réplicas en lecture, voir soft_desk/routers.py :
+# - PostgreSQL : hôtes listés dans POSTGRES_REPLICA_HOSTS (séparés par des virgules)
+# - SQLite : fichiers listés dans SQLITE_REPLICA_PATHS (séparés par des virgules),
+#   recopiés depuis la base principale par ./manage.py sync_sqlite_replicas
+if SOFT_DESK_DB_PROFILE == 'postgresql':
+    replicas = [{'HOST': host} for host in os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')
+                if host]
+else:
+    replicas = [{'NAME': path} for path in os.environ.get('SQLITE_REPLICA_PATHS', '').split(',')
+                if path]
+for i, replica in enumerate(replicas, 1):
+    DATABASES[f'replica{i}'] = {**DATABASES['default'], **replica,
+                                'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['soft_desk.routers.ReadReplicaRouter']
+
+SOFT_DESK_READ_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    # secondes pendant lesquelles un client lit la base principale après une écriture
+    'STICKY_SECONDS': 5,
+    # cache mémorisant les écritures récentes, obligatoirement partagé entre les processus
+    # (un cache local à chaque processus est refusé au démarrage), voir CACHES
+    'CACHE_ALIAS': 'shared',
 }
 
+# PRAGMAs appliqués à chaque nouvelle connexion SQLite, voir soft_desk/db.py
+if SOFT_DESK_DB_PROFILE == 'sqlite-wal':
+    SOFT_DESK_SQLITE_PRAGMAS = {
+        # les lecteurs ne sont plus bloqués par un écrivain
+        'journal_mode': 'WAL',
+        # fsync aux checkpoints seulement, sans risque de corruption en WAL
+        'synchronous': 'NORMAL',
+        # millisecondes d'attente d'un verrou en écriture
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        # en KiB lorsque la valeur est négative
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }
+else:
+    SOFT_DESK_SQLITE_PRAGMAS = {}
+
+# Vérifie au début de chaque requête que les connexions persistantes sont utilisables
+# (l'équivalent de CONN_HEALTH_CHECKS, qui n'existe qu'à partir de Django 4.1)
+SOFT_DESK_CONN_HEALTH_CHECKS = SOFT_DESK_DB_PROFILE != 'sqlite'
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+
+PASSWORD_HASHERS = [
+    # PBKDF2 dont le coût est réglé par SOFT_DESK_PASSWORDS['ITERATIONS']
+    'soft_desk.passwords.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -130,18 +237,34 @@ AUTH_USER_MODEL = 'soft_desk.User'
 
 REST_FRAMEWORK = {
     # Paramètres de pagination
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # (numéros de page, ou pagination par clé avec ?pagination=keyset)
+    'DEFAULT_PAGINATION_CLASS': 'soft_desk.pagination.SoftDeskPagination',
     'PAGE_SIZE': 1000,
     # Classes de permission
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     # Authentification avec rest_framework_jwt
+    # (jetons vérifiés mis en cache, voir soft_desk/authentication.py)
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_jwt.authentication.JSONWebTokenAuthentication',
+        'soft_desk.authentication.CachedJSONWebTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ),
+    # Formats négociés par l'en-tête Accept (JSON encodé par orjson s'il est installé,
+    # MessagePack si msgpack est installé), voir soft_desk/renderers.py
+    'DEFAULT_RENDERER_CLASSES': (
+        'soft_desk.renderers.FastJSONRenderer',
+        'soft_desk.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'soft_desk.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'soft_desk.negotiation.AvailableContentNegotiation',
 }
 
 JWT_AUTH = {
@@ -152,3 +275,77 @@ JWT_AUTH = {
 }
 
 APPEND_SLASH = True
+
+# Cache des jetons JWT vérifiés, voir soft_desk/authentication.py
+SOFT_DESK_TOKEN_CACHE = {
+    'MAX_ENTRIES': 10000,
+    # durée de vie en secondes, bornée par l'expiration du jeton
+    'TIMEOUT': 300,
+    # cache partagé entre les processus, qui y voient à chaque requête les utilisateurs
+    # modifiés ou désactivés par les autres (None : jusqu'à TIMEOUT secondes de retard)
+    'CACHE_ALIAS': 'shared',
+}
+
+# Cache des appartenances (user, project), voir soft_desk/membership.py
+SOFT_DESK_MEMBERSHIP_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+    # alias d'un cache Django partagé entre processus, qui y voient à chaque lecture les
+    # appartenances modifiées par les autres (None : cache local uniquement, une
+    # appartenance retirée reste alors en cache dans les autres processus jusqu'à
+    # TIMEOUT secondes)
+    'CACHE_ALIAS': 'shared',
+}
+
+# Listes rendues directement depuis QuerySet.values_list(), voir FastListModelMixin
+# (basenames des viewsets : 'contributors', 'issues', 'comments')
+SOFT_DESK_FAST_LIST_ENDPOINTS = ()
+
+# Cache des réponses des listes, voir soft_desk/response_cache.py
+SOFT_DESK_RESPONSE_CACHE = {
+    # basenames des viewsets : 'contributors', 'issues', 'comments'
+    'ENDPOINTS': (),
+    'MAX_ENTRIES': 1000,
+    # budget mémoire du cache local, en octets de contenu rendu
+    'MAX_BYTES': 64 * 1024 * 1024,
+    'TIMEOUT': 300,
+    # alias d'un cache Django partagé entre processus (None : cache local uniquement)
+    'CACHE_ALIAS': None,
+}
+
+# Hachage des mots de passe (inscription, connexion), voir soft_desk/passwords.py
+SOFT_DESK_PASSWORDS = {
+    # itérations PBKDF2 des nouveaux hachages (les anciens sont mis à niveau à la connexion)
+    'ITERATIONS': 260000,
+    # processus dédiés au hachage (0 : dans le thread de la requête)
+    'WORKERS': 2,
+    # hachages en attente d'un processus, au-delà desquels les requêtes sont refusées (429)
+    'MAX_PENDING': 64,
+}
+
+# Threads exécutant les accès à la base des vues asynchrones (/async/...),
+# voir soft_desk/async_views.py
+SOFT_DESK_ASYNC_DB_THREADS = 8
+
+# Nombre maximal d'éléments d'une création en masse (liste en payload)
+SOFT_DESK_BULK_CREATE_MAX_ITEMS = 5000
+
+# Mesure des requêtes, voir soft_desk/timing.py
+SOFT_DESK_TIMING = {
+    # requêtes SQL, vérification des permissions, sérialisation et rendu de
+    # chaque requête, journalisés par le logger 'soft_desk.timing'
+    'ENABLED': os.environ.get('SOFT_DESK_TIMING') == '1',
+    # destinataires de l'en-tête Server-Timing : 'all', 'staff' ou None
+    'SERVER_TIMING': 'staff',
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'soft_desk.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
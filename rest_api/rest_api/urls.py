@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 
 from rest_framework_nested.routers import DefaultRouter,  NestedSimpleRouter
-from soft_desk import views
+from soft_desk import async_views, views
 
 router = DefaultRouter()
 router.register(r'login', views.UserLoginViewSet, basename='login')
@@ -46,12 +46,32 @@ issue_router.register(r'issues', views.IssueViewSet, basename='issues')
 # /projects/{project_pk}/issues/
 # /projects/{project_pk}/issues/{pk}/
 
+search_router = NestedSimpleRouter(project_router, r'projects', lookup='project')
+search_router.register(r'search', views.SearchViewSet, basename='search')
+# generates:
+# /projects/{project_pk}/search/
+
+export_router = NestedSimpleRouter(project_router, r'projects', lookup='project')
+export_router.register(r'export', views.ExportViewSet, basename='export')
+# generates:
+# /projects/{project_pk}/export/
+
 comment_router = NestedSimpleRouter(issue_router, r'issues', lookup='issue')
 comment_router.register(r'comments', views.CommentViewSet, basename='comments')
 # generates:
 # /projects/{project_pk}/issues/{issue_pk}/comments/
 # /projects/{project_pk}/issues/{issue_pk}/comments/{pk}/
 
+# async entry points of the read endpoints, for ASGI deployments
+async_urlpatterns = [
+    path('projects/', async_views.project_list),
+    path('projects/<pk>/', async_views.project_detail),
+    path('projects/<project_pk>/issues/', async_views.issue_list),
+    path('projects/<project_pk>/issues/<issue_pk>/comments/', async_views.comment_list),
+    path('projects/<project_pk>/issues/<issue_pk>/comments/<pk>/',
+         async_views.comment_detail),
+]
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include(router.urls)),
@@ -59,4 +79,7 @@ urlpatterns = [
     path('', include(contributor_router.urls)),
     path('', include(issue_router.urls)),
     path('', include(comment_router.urls)),
+    path('', include(search_router.urls)),
+    path('', include(export_router.urls)),
+    path('async/', include(async_urlpatterns)),
 ]
@@ -0,0 +1,140 @@
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import NotFound
+
+from soft_desk.membership import get_membership_cache
+from soft_desk.models import Comment, Contributor, Issue, Project, User
+
+
+class AccessContext:
+    """
+    Request-scoped view of the project, the parent issue, the target object
+    and the membership of the request user, resolved in a single query
+    """
+    def __init__(self, user, project, issue=None, obj=None, is_contributor=False):
+        self.user = user
+        self.project = project
+        self.issue = issue
+        self.obj = obj
+        self.is_contributor = is_contributor
+
+    @property
+    def user_is_authenticated(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    def project_of(self, obj):
+        """
+        Return the project the given object belongs to, reusing the resolved one
+        """
+        if isinstance(obj, Project):
+            project_id = obj.pk
+        elif isinstance(obj, Comment):
+            project_id = obj.issue.project_id
+        else:
+            project_id = obj.project_id
+        if project_id == self.project.pk:
+            return self.project
+        return obj if isinstance(obj, Project) else Project.objects.get(pk=project_id)
+
+    def is_contributor_of(self, obj):
+        if not self.user_is_authenticated:
+            return False
+        the_project = self.project_of(obj)
+        if the_project is self.project:
+            return self.is_contributor
+        return bool(self.user.is_contributor(the_project))
+
+    def is_owner_of(self, obj):
+        """
+        Ownership of a contributor link is the ownership of its project
+        """
+        if not self.user_is_authenticated:
+            return False
+        if isinstance(obj, Contributor):
+            obj = self.project_of(obj)
+        return obj.author_user_id == self.user.pk
+
+
+def _membership(user, project_path):
+    """
+    Annotation telling whether the user is a contributor of the project at project_path
+    """
+    if not (user and user.is_authenticated):
+        return Value(False, output_field=BooleanField())
+    return Exists(Contributor.objects.filter(project=OuterRef(project_path), user=user.pk))
+
+
+def _pk(kwargs, name):
+    try:
+        return int(kwargs[name])
+    except (TypeError, ValueError):
+        raise Http404
+
+
+def _get(queryset):
+    try:
+        return queryset.get()
+    except queryset.model.DoesNotExist:
+        raise Http404
+
+
+def _resolve(user, model, kwargs):
+    """
+    Run the single joined query matching the route of the view
+    """
+    if model is Project:
+        the_project = _get(Project.objects.filter(pk=_pk(kwargs, 'pk'))
+                           .annotate(user_is_contributor=_membership(user, 'pk')))
+        return AccessContext(user, the_project, obj=the_project,
+                             is_contributor=the_project.user_is_contributor)
+    project_pk = _pk(kwargs, 'project_pk')
+    if model is Contributor and 'pk' in kwargs:
+        try:
+            obj = (Contributor.objects.select_related('project')
+                   .annotate(user_is_contributor=_membership(user, 'project_id'))
+                   .get(project=project_pk, user=_pk(kwargs, 'pk')))
+        except Contributor.DoesNotExist:
+            get_object_or_404(User, pk=kwargs['pk'])
+            get_object_or_404(Project, pk=project_pk)
+            raise NotFound("The contributor does not exist")
+        return AccessContext(user, obj.project, obj=obj,
+                             is_contributor=obj.user_is_contributor)
+    if model is Issue and 'pk' in kwargs:
+        obj = _get(Issue.objects.select_related('project')
+                   .filter(pk=_pk(kwargs, 'pk'), project=project_pk)
+                   .annotate(user_is_contributor=_membership(user, 'project_id')))
+        return AccessContext(user, obj.project, issue=obj, obj=obj,
+                             is_contributor=obj.user_is_contributor)
+    if model is Comment:
+        if 'pk' in kwargs:
+            obj = _get(Comment.objects.select_related('issue__project')
+                       .filter(pk=_pk(kwargs, 'pk'), issue=_pk(kwargs, 'issue_pk'),
+                               issue__project=project_pk)
+                       .annotate(user_is_contributor=_membership(user, 'issue__project_id')))
+            return AccessContext(user, obj.issue.project, issue=obj.issue, obj=obj,
+                                 is_contributor=obj.user_is_contributor)
+        the_issue = _get(Issue.objects.select_related('project')
+                         .filter(pk=_pk(kwargs, 'issue_pk'), project=project_pk)
+                         .annotate(user_is_contributor=_membership(user, 'project_id')))
+        return AccessContext(user, the_issue.project, issue=the_issue,
+                             is_contributor=the_issue.user_is_contributor)
+    the_project = _get(Project.objects.filter(pk=project_pk)
+                       .annotate(user_is_contributor=_membership(user, 'pk')))
+    return AccessContext(user, the_project, is_contributor=the_project.user_is_contributor)
+
+
+def get_access_context(request, view):
+    """
+    Return the access context of the request, resolving it on first use.
+    The view declares the model of its route through its access_model attribute.
+    """
+    key = (view.access_model, tuple(sorted(view.kwargs.items())))
+    cached = getattr(request, '_access_context', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    context = _resolve(request.user, view.access_model, view.kwargs)
+    if context.user_is_authenticated:
+        get_membership_cache().prime(context.user.pk, context.project.pk, context.is_contributor)
+    request._access_context = (key, context)
+    return context
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SoftDeskConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'soft_desk'
+
+    def ready(self):
+        from soft_desk import db, signals  # noqa: F401
@@ -0,0 +1,151 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework_jwt.authentication import JSONWebTokenAuthentication
+
+from soft_desk.caching import LRUCache, bump_generation
+
+DEFAULTS = {
+    # number of verified tokens kept in memory
+    'MAX_ENTRIES': 10000,
+    # lifetime of an entry, in seconds, shortened to the expiration of the token
+    'TIMEOUT': 300,
+    # alias of a Django cache shared between processes, holding the generation
+    # of each user (None: a user changed in a process stays cached in the
+    # others up to TIMEOUT seconds)
+    'CACHE_ALIAS': None,
+}
+
+
+class TokenCache:
+    """
+    Process-local cache of the verified tokens: the digest of a token maps to
+    the id and the field values of its user. The cached rows hold password
+    hashes, so they never leave the process. Entries are evicted by the User
+    signals (see soft_desk.signals), expire with the token at the latest, and
+    after TIMEOUT seconds otherwise, which bounds the staleness of the writes
+    which bypass the signals, like QuerySet.update(). With a shared cache, the
+    signals also bump the generation of the user there, which every hit is
+    checked against, so that the other processes drop their entries at once.
+    """
+    key_prefix = 'soft_desk:token'
+
+    def __init__(self, max_entries, timeout, cache_alias=None):
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self.local = LRUCache(max_entries=max_entries, timeout=timeout)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def _generation_key(self, user_id):
+        return f'{self.key_prefix}:{user_id}:generation'
+
+    def _generation(self, user_id):
+        shared = self.shared
+        return 0 if shared is None else shared.get(self._generation_key(user_id), 0)
+
+    @staticmethod
+    def digest(jwt_value):
+        if isinstance(jwt_value, str):
+            jwt_value = jwt_value.encode()
+        return hashlib.sha256(jwt_value).hexdigest()
+
+    def get(self, jwt_value):
+        """
+        Return the user of the token, or None when the token is not cached
+        """
+        digest = self.digest(jwt_value)
+        entry = self.local.get(digest)
+        if entry is not None and entry[1] != self._generation(entry[0]):
+            self.local.delete(digest)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        user_id, generation, values = entry
+        User = get_user_model()
+        return User.from_db(None, [field.attname for field in User._meta.concrete_fields],
+                            values)
+
+    def set(self, jwt_value, payload, user):
+        timeout = self.timeout
+        if 'exp' in payload:
+            timeout = min(timeout, payload['exp'] - time.time())
+            if timeout <= 0:
+                return
+        values = tuple(getattr(user, field.attname)
+                       for field in user._meta.concrete_fields)
+        self.local.set(self.digest(jwt_value), (user.pk, self._generation(user.pk), values),
+                       timeout)
+
+    def invalidate_user(self, user_id):
+        self.local.delete_values_where(lambda entry: entry[0] == user_id)
+        shared = self.shared
+        if shared is not None:
+            bump_generation(shared, self._generation_key(user_id))
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.local),
+        }
+
+    def clear(self):
+        self.local.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        options = {**DEFAULTS, **getattr(settings, 'SOFT_DESK_TOKEN_CACHE', {})}
+        _token_cache = TokenCache(max_entries=options['MAX_ENTRIES'],
+                                  timeout=options['TIMEOUT'],
+                                  cache_alias=options['CACHE_ALIAS'])
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    global _token_cache
+    if setting in ('SOFT_DESK_TOKEN_CACHE', 'JWT_AUTH', 'CACHES'):
+        _token_cache = None
+
+
+class CachedJSONWebTokenAuthentication(JSONWebTokenAuthentication):
+    """
+    JSONWebTokenAuthentication which remembers the tokens it has verified,
+    so that a known token skips both the signature check and the User query
+    """
+    payload = None
+
+    def authenticate(self, request):
+        jwt_value = self.get_jwt_value(request)
+        if jwt_value is None:
+            return None
+        token_cache = get_token_cache()
+        user = token_cache.get(jwt_value)
+        if user is not None:
+            return (user, jwt_value)
+        user, jwt_value = super().authenticate(request)
+        token_cache.set(jwt_value, self.payload, user)
+        return (user, jwt_value)
+
+    def authenticate_credentials(self, payload):
+        self.payload = payload
+        return super().authenticate_credentials(payload)
@@ -0,0 +1,104 @@
+import logging
+import math
+import re
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.test.utils import override_settings
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back(using='default'):
+    """
+    Run the block in a transaction which is always rolled back, so that a
+    benchmark can seed its data in any database without leaving it behind
+    """
+    try:
+        with transaction.atomic(using=using):
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+class QueryLogHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.queries = []
+
+    def emit(self, record):
+        self.queries.append({'sql': record.sql, 'duration': record.duration})
+
+
+@contextmanager
+def logged_queries():
+    """
+    Capture the queries of the block, on every database and in every thread
+    (the async views run theirs in a thread pool), from the debug log of the
+    cursors: yield the list of their sql and duration in seconds
+    """
+    logger = logging.getLogger('django.db.backends')
+    handler = QueryLogHandler()
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    try:
+        with override_settings(DEBUG=True):
+            yield handler.queries
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+
+
+def percentile(values, rank):
+    """
+    Nearest-rank percentile of the values
+    """
+    ordered = sorted(values)
+    index = max(0, math.ceil(rank / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(timings):
+    """
+    Summary, in milliseconds, of timings measured in seconds
+    """
+    return {
+        'count': len(timings),
+        'mean': round(sum(timings) / len(timings) * 1000, 3),
+        'p50': round(percentile(timings, 50) * 1000, 3),
+        'p95': round(percentile(timings, 95) * 1000, 3),
+        'p99': round(percentile(timings, 99) * 1000, 3),
+    }
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def route_templates(patterns, prefix=''):
+    """
+    Yield the routes of the URL patterns as templates such as
+    'projects/{project_pk}/issues/{pk}/', without the format suffix variants
+    """
+    for pattern in patterns:
+        route = str(pattern.pattern)
+        if 'format' in pattern.pattern.regex.groupindex:
+            continue
+        route = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'{\1}', route)
+        route = re.sub(r'<(?:\w+:)?(\w+)>', r'{\1}', route)
+        route = prefix + route.lstrip('^').rstrip('$')
+        if hasattr(pattern, 'url_patterns'):
+            yield from route_templates(pattern.url_patterns, route)
+        else:
+            yield route
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TIMEOUT = object()
+
+
+def bump_generation(shared, key):
+    """
+    Increment the generation at key in the shared Django cache, which the
+    processes check their local entries against
+    """
+    try:
+        shared.incr(key)
+    except ValueError:
+        shared.set(key, 1, None)
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe and process-local LRU cache.
+    Entries expire after timeout seconds (None means they never expire).
+    When get_size is given, the least recently used entries are also evicted
+    as long as the total size of the values exceeds max_size.
+    """
+    def __init__(self, max_entries=1024, timeout=None, max_size=None, get_size=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.max_size = max_size
+        self.get_size = get_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _pop(self, key):
+        value, expires, size = self._data.pop(key)
+        self.size -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires, size = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= time.monotonic():
+                self._pop(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.timeout
+        expires = None if timeout is None else time.monotonic() + timeout
+        size = self.get_size(value) if self.get_size is not None else 0
+        if self.max_size is not None and size > self.max_size:
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires, size)
+            self.size += size
+            while len(self._data) > self.max_entries \
+                    or (self.max_size is not None and self.size > self.max_size):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def delete_where(self, predicate):
+        """
+        Delete every entry whose key matches the predicate
+        """
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                self._pop(key)
+
+    def delete_values_where(self, predicate):
+        """
+        Delete every entry whose value matches the predicate
+        """
+        with self._lock:
+            for key in [key for key, (value, expires, size) in self._data.items()
+                        if predicate(value)]:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Apply the SOFT_DESK_SQLITE_PRAGMAS setting to each new SQLite connection
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SOFT_DESK_SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(request_started)
+def check_connections_health(**kwargs):
+    """
+    Close the persistent connections which are no longer usable, so that the
+    request opens a new one instead of failing on its first query (what
+    CONN_HEALTH_CHECKS does from Django 4.1)
+    """
+    if not getattr(settings, 'SOFT_DESK_CONN_HEALTH_CHECKS', False):
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.in_atomic_block \
+                and not connection.is_usable():
+            connection.close()
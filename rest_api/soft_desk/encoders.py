@@ -0,0 +1,144 @@
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from soft_desk.renderers import orjson
+
+SUPPORTED_FIELDS = (serializers.CharField, serializers.ChoiceField,
+                    serializers.IntegerField, serializers.ReadOnlyField,
+                    serializers.DateTimeField)
+
+
+class ValuesRowEncoder:
+    """
+    Encode the rows of QuerySet.values_list() as the JSON objects the serializer
+    would render, without building model instances nor running the fields.
+    The output is byte-identical to JSONRenderer for the supported field types.
+    The rows are encoded by orjson when it is installed and the output is not
+    ASCII-only.
+    """
+    def __init__(self, serializer, ensure_ascii=False):
+        self.ensure_ascii = ensure_ascii
+        self.encode_string = encode_basestring_ascii if ensure_ascii else encode_basestring
+        self.fallback = JSONEncoder(ensure_ascii=ensure_ascii, separators=(',', ':'))
+        self.columns = []
+        self.names = []
+        self.keys = []
+        self.datetimes = []
+        for field in serializer._readable_fields:
+            if not isinstance(field, SUPPORTED_FIELDS) or '.' in field.source \
+                    or getattr(field, 'format', ISO_8601) != ISO_8601 \
+                    or hasattr(field, 'timezone'):
+                raise ImproperlyConfigured(
+                    f"{serializer.__class__.__name__}.{field.field_name} can not be "
+                    "rendered from values")
+            model_field = serializer.Meta.model._meta.get_field(field.source)
+            self.columns.append(model_field.attname)
+            self.names.append(field.field_name)
+            self.keys.append(('{' if not self.keys else ',')
+                             + self.encode_string(field.field_name) + ':')
+            self.datetimes.append(isinstance(field, serializers.DateTimeField))
+
+    def encode_value(self, value):
+        if value is None:
+            return 'null'
+        if value is True:
+            return 'true'
+        if value is False:
+            return 'false'
+        if isinstance(value, str):
+            return self.encode_string(value)
+        if isinstance(value, int):
+            return int.__repr__(value)
+        return self.fallback.encode(value)
+
+    def format_datetime(self, value, field_timezone):
+        if not value:
+            return None
+        if field_timezone is not None:
+            if timezone.is_aware(value):
+                value = value.astimezone(field_timezone)
+            else:
+                value = timezone.make_aware(value, field_timezone)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    def encode_datetime(self, value, field_timezone):
+        value = self.format_datetime(value, field_timezone)
+        return 'null' if value is None else self.encode_string(value)
+
+    def iter_dicts(self, rows, field_timezone):
+        """
+        Yield the rows as the dicts of the serializer, the datetimes formatted
+        """
+        format_datetime = self.format_datetime
+        datetimes = [index for index, is_datetime in enumerate(self.datetimes) if is_datetime]
+        for row in rows:
+            values = list(row[:len(self.names)])
+            for index in datetimes:
+                values[index] = format_datetime(values[index], field_timezone)
+            yield dict(zip(self.names, values))
+
+    def encode_rows_orjson(self, rows, field_timezone):
+        return orjson.dumps(list(self.iter_dicts(rows, field_timezone)),
+                            default=self.fallback.default).decode()
+
+    def encode_rows(self, rows):
+        """
+        Return the JSON array of the rows, as a string
+        """
+        field_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        if orjson is not None and not self.ensure_ascii:
+            try:
+                return self.encode_rows_orjson(rows, field_timezone)
+            except orjson.JSONEncodeError:
+                # integers out of the 64-bit range
+                pass
+        encode_value = self.encode_value
+        encode_datetime = self.encode_datetime
+        fields = list(zip(self.keys, self.datetimes))
+        objects = []
+        for row in rows:
+            parts = []
+            for (key, is_datetime), value in zip(fields, row):
+                parts.append(key)
+                if is_datetime:
+                    parts.append(encode_datetime(value, field_timezone))
+                else:
+                    parts.append(encode_value(value))
+            parts.append('}')
+            objects.append(''.join(parts))
+        return '[' + ','.join(objects) + ']'
+
+
+def can_encode_values(renderer, accepted_media_type, renderer_context):
+    """
+    Does the negotiated renderer produce the JSON of ValuesRowEncoder?
+    """
+    return (isinstance(renderer, JSONRenderer)
+            and renderer.compact
+            and renderer.encoder_class is JSONEncoder
+            and api_settings.DATETIME_FORMAT == ISO_8601
+            and renderer.get_indent(accepted_media_type, renderer_context) is None)
+
+
+def render_page(renderer, envelope, rows_json, accepted_media_type, renderer_context):
+    """
+    Render the pagination envelope with the already encoded results
+    """
+    rows_json = rows_json.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    if envelope is None:
+        return rows_json.encode()
+    rendered = renderer.render(envelope, accepted_media_type, renderer_context)
+    if not rendered.endswith(b'[]}'):
+        raise ImproperlyConfigured('the results must be the last key of the envelope')
+    return rendered[:-3] + rows_json.encode() + b'}'
@@ -0,0 +1,125 @@
+import csv
+import itertools
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from soft_desk.encoders import ValuesRowEncoder
+from soft_desk.models import Comment, Issue
+from soft_desk.renderers import FastJSONRenderer
+from soft_desk.serializers import CommentSerializer, IssueSerializer
+
+CHUNK_SIZE = 1000
+# bytes gathered before a piece of the response is sent
+BUFFER_SIZE = 64 * 1024
+
+
+def keyset_chunks(queryset, columns, keys, chunk_size):
+    """
+    Yield the values_list() rows of the queryset ordered by the keys, chunk by
+    chunk, each chunk being read after the keys of the last row of the
+    previous one: a range scan on an index of the keys, whatever its depth
+    """
+    indexes = [columns.index(key) for key in keys]
+    queryset = queryset.order_by(*keys)
+    after = None
+    while True:
+        chunk = queryset
+        if after is not None:
+            condition = Q()
+            for i, key in enumerate(keys):
+                condition |= Q(**dict(zip(keys[:i], after[:i])), **{f'{key}__gt': after[i]})
+            chunk = chunk.filter(condition)
+        rows = list(chunk.values_list(*columns)[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        after = [rows[-1][index] for index in indexes]
+
+
+def buffered(pieces, size=BUFFER_SIZE):
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class Echo:
+    """
+    File-like object returning the line written by csv.writer
+    """
+    def write(self, value):
+        return value
+
+
+class ProjectExport:
+    """
+    The issues of a project, each followed by its comments, as rendered by
+    their serializers. Both tables are read by keyset chunks of chunk_size
+    rows, so that the memory used does not depend on the size of the project.
+    The export is not a snapshot: the rows written meanwhile may be missed.
+    """
+    content_types = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv; charset=utf-8',
+    }
+
+    def __init__(self, project_id, using='default', chunk_size=CHUNK_SIZE):
+        self.project_id = project_id
+        self.using = using
+        self.chunk_size = chunk_size
+        self.issue_encoder = ValuesRowEncoder(IssueSerializer())
+        self.comment_encoder = ValuesRowEncoder(CommentSerializer())
+
+    def comment_rows(self, issue_ids):
+        queryset = Comment.objects.using(self.using).filter(issue_id__in=issue_ids)
+        for rows in keyset_chunks(queryset, self.comment_encoder.columns,
+                                  ('issue_id', 'comment_id'), self.chunk_size):
+            yield from rows
+
+    def records(self):
+        """
+        Yield the ('issue' or 'comment', dict) records of the project
+        """
+        field_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        issue_index = self.issue_encoder.columns.index('issue_id')
+        comment_index = self.comment_encoder.columns.index('issue_id')
+        issues = Issue.objects.using(self.using).filter(project_id=self.project_id)
+        for issue_rows in keyset_chunks(issues, self.issue_encoder.columns, ('issue_id',),
+                                        self.chunk_size):
+            comments = self.comment_rows([row[issue_index] for row in issue_rows])
+            comment = next(comments, None)
+            issue_dicts = self.issue_encoder.iter_dicts(issue_rows, field_timezone)
+            for issue_row, issue in zip(issue_rows, issue_dicts):
+                yield 'issue', issue
+                # the comments are in the order of the issues
+                while comment is not None and comment[comment_index] == issue_row[issue_index]:
+                    yield 'comment', next(self.comment_encoder.iter_dicts([comment],
+                                                                          field_timezone))
+                    comment = next(comments, None)
+
+    def ndjson(self):
+        render = FastJSONRenderer().render
+        return buffered(render({'type': kind, **record}) + b'\n'
+                        for kind, record in self.records())
+
+    def csv(self):
+        """
+        One row per issue or comment, with the fields of both
+        """
+        fieldnames = ['type'] + self.issue_encoder.names
+        fieldnames += [name for name in self.comment_encoder.names if name not in fieldnames]
+        writer = csv.DictWriter(Echo(), fieldnames)
+        lines = itertools.chain([writer.writeheader()],
+                                (writer.writerow({'type': kind, **record})
+                                 for kind, record in self.records()))
+        return buffered(line.encode() for line in lines)
@@ -0,0 +1,87 @@
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+def choice_list(choices):
+    """
+    Parser of a comma-separated list of the values of the choices
+    """
+    def parse(value):
+        values = value.split(',')
+        invalid = [item for item in values if item not in choices.values]
+        if invalid:
+            raise ValueError(f"{', '.join(invalid)}: not one of {', '.join(choices.values)}")
+        return values
+    return parse
+
+
+def integer_list(value):
+    try:
+        return [int(item) for item in value.split(',')]
+    except ValueError:
+        raise ValueError("a comma-separated list of ids is expected")
+
+
+def datetime_value(value):
+    """
+    An ISO 8601 date or datetime, in the current time zone when it has none
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError("an ISO 8601 date or datetime is expected")
+        parsed = datetime.datetime(date.year, date.month, date.day)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class QueryParamFilterBackend(BaseFilterBackend):
+    """
+    Filter the queryset on the query parameters declared by the filter_params
+    attribute of the view, as {parameter: (lookup, parse)}. A parser returning
+    a list filters on any of its values.
+    """
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        errors = {}
+        for param, (lookup, parse) in getattr(view, 'filter_params', {}).items():
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                value = parse(value)
+            except ValueError as e:
+                errors[param] = [str(e)]
+                continue
+            if not isinstance(value, list):
+                filters[lookup] = value
+            elif len(value) == 1:
+                filters[lookup] = value[0]
+            else:
+                filters[f'{lookup}__in'] = value
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**filters)
+
+
+class TiebreakOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter on the ordering_fields of the view, the primary key breaking
+    the ties, so that the pages of the keyset pagination never overlap. The
+    primary key follows the direction of the last field: an index scanned
+    backwards then still yields the rows in order.
+    """
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        pk = queryset.model._meta.pk.name
+        if pk not in [field.lstrip('-') for field in ordering]:
+            ordering = list(ordering) + ['-' + pk if ordering[-1].startswith('-') else pk]
+        return ordering
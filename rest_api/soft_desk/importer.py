@@ -0,0 +1,287 @@
+import csv
+import json
+import os
+from collections import ChainMap
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from soft_desk.caching import LRUCache
+from soft_desk.models import (
+    Comment, Contributor, ImportCheckpoint, ImportRef, Issue, Project, User
+)
+from soft_desk.signals import bulk_create_with_pks, post_bulk_create
+
+# in the order they are inserted in a chunk, so that a record may refer to
+# the ones before it in the same chunk
+RECORD_TYPES = ('project', 'contributor', 'issue', 'comment')
+
+
+class RecordError(ValueError):
+    pass
+
+
+def read_records(path, input_format):
+    """
+    Yield the records of the NDJSON or CSV file one by one, or the RecordError
+    of a line which can not be parsed. The empty CSV cells are left out.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if input_format == 'csv':
+            for row in csv.DictReader(f):
+                yield {key: value for key, value in row.items() if value not in ('', None)}
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield RecordError(f"invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield RecordError("a JSON object is expected")
+                continue
+            yield {key: value for key, value in record.items() if value is not None}
+
+
+class Checkpoint:
+    """
+    Progress of the import of a file, kept in the database by name and saved
+    in the transaction of each chunk (see Importer.import_chunk): an import
+    resumes right after its last committed chunk. The ids of the projects and
+    issues created for the refs of the file are added chunk by chunk.
+    """
+    def __init__(self, name, source):
+        self.source = os.path.abspath(source)
+        self.record, created = ImportCheckpoint.objects.get_or_create(
+            name=name, defaults={'source': self.source})
+        if self.record.source != self.source:
+            raise ValueError(f"{name} is the checkpoint of {self.record.source}")
+        self.position = self.record.position
+        self.counts = {kind: self.record.counts.get(kind, 0) for kind in RECORD_TYPES}
+        self.errors = self.record.errors
+        self.refs = {'project': {}, 'issue': {}}
+        for kind, ref, object_id in self.record.refs.values_list('kind', 'ref', 'object_id'):
+            self.refs[kind][ref] = object_id
+
+    @staticmethod
+    def delete(name):
+        ImportCheckpoint.objects.filter(name=name).delete()
+
+    def advance(self, position, counts, errors, new_refs):
+        """
+        Save the progress of a chunk, in its transaction
+        """
+        self.position = position
+        for kind, count in counts.items():
+            self.counts[kind] += count
+        self.errors += errors
+        ImportRef.objects.bulk_create(
+            [ImportRef(checkpoint=self.record, kind=kind, ref=ref, object_id=object_id)
+             for kind, refs in new_refs.items() for ref, object_id in refs.items()],
+            batch_size=1000)
+        ImportCheckpoint.objects.filter(pk=self.record.pk).update(
+            position=self.position, counts=self.counts, errors=self.errors)
+
+
+class Importer:
+    """
+    Insert chunks of records, each chunk in one transaction, with one
+    bulk_create per batch_size rows of a model. The users are looked up by
+    email for the whole chunk at once, and kept in an LRU cache. The records
+    refer to the projects and issues of the file by their "ref".
+    """
+    def __init__(self, refs, batch_size=1000, create_users=False):
+        self.refs = refs
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.users = LRUCache(max_entries=100000)
+
+    def load_users(self, emails):
+        missing = [email for email in emails if self.users.get(email) is None]
+        for email, user_id in User.objects.filter(email__in=missing) \
+                .values_list('email', 'user_id'):
+            self.users.set(email, user_id)
+        missing = [email for email in missing if self.users.get(email) is None]
+        if missing and self.create_users:
+            users = [User(email=email, is_active=False, password=make_password(None))
+                     for email in missing]
+            for user in self.insert(User, users):
+                self.users.set(user.email, user.pk)
+
+    def user_id(self, record, key):
+        try:
+            email = User.objects.normalize_email(record[key])
+        except KeyError:
+            raise RecordError(f"{key} is required")
+        user_id = self.users.get(email)
+        if user_id is None:
+            raise RecordError(f"{key}: no user {email}")
+        return user_id
+
+    def ref(self, refs, kind, record, key):
+        try:
+            return refs[kind][str(record[key])]
+        except KeyError:
+            raise RecordError(f"{key}: no {kind} {record.get(key)} in the file")
+
+    def check_ref(self, refs, kind, record, claimed):
+        """
+        Check the ref of the record, which must not be used by a record of
+        the previous chunks nor by one built before it in the chunk
+        """
+        if 'ref' not in record:
+            raise RecordError("ref is required")
+        ref = str(record['ref'])
+        if ref in refs[kind] or ref in claimed:
+            raise RecordError(f"ref {ref} already used")
+
+    def validated(self, obj, record, fields):
+        for field in fields:
+            if field in record:
+                setattr(obj, field, record[field])
+        try:
+            obj.clean_fields(exclude=[field.name for field in obj._meta.fields
+                                      if field.is_relation or field.name not in fields])
+        except ValidationError as e:
+            raise RecordError('; '.join(f"{field}: {' '.join(messages)}"
+                                        for field, messages in e.message_dict.items()))
+        created = getattr(obj, 'time_created', None)
+        if created is not None and settings.USE_TZ and timezone.is_naive(created):
+            obj.time_created = timezone.make_aware(created)
+        return obj
+
+    def build_project(self, record, refs, claimed):
+        self.check_ref(refs, 'project', record, claimed)
+        obj = Project(author_user_id=self.user_id(record, 'author_email'))
+        # the type of the record is not the one of the project
+        fields = {key: value for key, value in record.items() if key != 'type'}
+        if 'project_type' in record:
+            fields['type'] = record['project_type']
+        return self.validated(obj, fields, ['title', 'description', 'type'])
+
+    def build_contributor(self, record, refs, claimed):
+        obj = Contributor(project_id=self.ref(refs, 'project', record, 'project_ref'),
+                          user_id=self.user_id(record, 'user_email'))
+        return self.validated(obj, record, ['permission', 'role'])
+
+    def build_issue(self, record, refs, claimed):
+        self.check_ref(refs, 'issue', record, claimed)
+        obj = Issue(project_id=self.ref(refs, 'project', record, 'project_ref'),
+                    author_user_id=self.user_id(record, 'author_email'),
+                    assignee_user_id=self.user_id(record, 'assignee_email'))
+        obj = self.validated(obj, record, ['title', 'desc', 'tag', 'priority', 'status',
+                                           'time_created'])
+        obj.last_activity_at = obj.time_created
+        return obj
+
+    def build_comment(self, record, refs, claimed):
+        obj = Comment(issue_id=self.ref(refs, 'issue', record, 'issue_ref'),
+                      author_user_id=self.user_id(record, 'author_email'))
+        return self.validated(obj, record, ['description', 'time_created'])
+
+    def existing(self, kind, objs):
+        """
+        Keys of the objects of the chunk which would break a unique constraint
+        """
+        if kind == 'contributor':
+            return set(Contributor.objects
+                       .filter(project__in={obj.project_id for obj in objs},
+                               user__in={obj.user_id for obj in objs})
+                       .values_list('project_id', 'user_id'))
+        if kind == 'issue':
+            return set(Issue.objects
+                       .filter(project__in={obj.project_id for obj in objs},
+                               title__in={obj.title for obj in objs})
+                       .values_list('project_id', 'title', 'author_user_id'))
+        return set()
+
+    def unique_key(self, kind, obj):
+        if kind == 'contributor':
+            return obj.project_id, obj.user_id
+        if kind == 'issue':
+            return obj.project_id, obj.title, obj.author_user_id
+        return None
+
+    def insert(self, model, objs):
+        """
+        bulk_create the objects with their primary keys, and send post_bulk_create
+        """
+        bulk_create_with_pks(model, objs, batch_size=self.batch_size)
+        post_bulk_create.send(sender=model, instances=objs)
+        return objs
+
+    def import_chunk(self, records, checkpoint=None):
+        """
+        Insert the (number, record) of the chunk in one transaction, which
+        saves the progress of the checkpoint. Return the counts of the created
+        objects by type, and the (number, message) of the rejected records.
+        """
+        groups = {kind: [] for kind in RECORD_TYPES}
+        errors = []
+        emails = set()
+        for number, record in records:
+            if isinstance(record, RecordError):
+                errors.append((number, str(record)))
+            elif record.get('type') not in groups:
+                errors.append((number, f"type: one of {', '.join(RECORD_TYPES)} is expected"))
+            else:
+                groups[record['type']].append((number, record))
+                emails.update(User.objects.normalize_email(value) for key, value
+                              in record.items() if key.endswith('_email'))
+        new_refs = {'project': {}, 'issue': {}}
+        refs = {kind: ChainMap(new_refs[kind], self.refs[kind]) for kind in new_refs}
+        counts = {}
+        try:
+            with transaction.atomic():
+                self.load_users(emails)
+                for kind in RECORD_TYPES:
+                    counts[kind] = self.import_group(kind, groups[kind], refs, errors)
+                if checkpoint is not None:
+                    checkpoint.advance(records[-1][0], counts, len(errors), new_refs)
+        except Exception:
+            # the users created in the transaction are gone
+            self.users.clear()
+            raise
+        for kind in new_refs:
+            self.refs[kind].update(new_refs[kind])
+        return counts, sorted(errors)
+
+    def without_duplicates(self, kind, built, errors):
+        existing = self.existing(kind, [obj for number, record, obj in built])
+        accepted = []
+        for number, record, obj in built:
+            key = self.unique_key(kind, obj)
+            if key is not None:
+                if key in existing:
+                    errors.append((number, f"this {kind} already exists"))
+                    continue
+                existing.add(key)
+            accepted.append((record, obj))
+        return accepted
+
+    def import_group(self, kind, records, refs, errors):
+        build = getattr(self, f'build_{kind}')
+        built = []
+        claimed = set()
+        for number, record in records:
+            try:
+                built.append((number, record, build(record, refs, claimed)))
+            except RecordError as e:
+                errors.append((number, str(e)))
+                continue
+            if kind in refs:
+                claimed.add(str(record['ref']))
+        if not built:
+            return 0
+        accepted = self.without_duplicates(kind, built, errors)
+        if accepted:
+            self.insert(type(accepted[0][1]), [obj for record, obj in accepted])
+        if kind in refs:
+            for record, obj in accepted:
+                refs[kind][str(record['ref'])] = obj.pk
+        return len(accepted)
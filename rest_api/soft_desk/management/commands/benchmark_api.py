@@ -0,0 +1,272 @@
+import datetime
+import itertools
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from rest_framework.test import APIClient
+from rest_framework_jwt.settings import api_settings
+
+from rest_api.urls import urlpatterns
+from soft_desk.benchmark import logged_queries, rolled_back, route_templates, summarize
+from soft_desk.models import Comment, Contributor, Issue, Project, ProjectStat, User
+from soft_desk.seeding import SEED_PASSWORD
+
+jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
+jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
+
+
+class Target:
+    """
+    The objects the requests are about: the biggest project, its author, the
+    issue with the most comments among the ones of the author and a comment of
+    the author on it, the author being the only one allowed to change them.
+    The objects created or deleted by the requests are made fresh before each
+    request.
+    """
+    def __init__(self, project, password):
+        self.project = project
+        self.user = project.author_user
+        self.password = password
+        issues = Issue.objects.filter(project=project).order_by('-comment_count')
+        self.issue = issues.filter(author_user=self.user).first() or issues.first()
+        comments = Comment.objects.filter(issue=self.issue).order_by('comment_id')
+        self.comment = comments.filter(author_user=self.user).first() or comments.first()
+        self.numbers = itertools.count()
+
+    def name(self, kind):
+        return f'benchmark {kind} {next(self.numbers)}'
+
+    def new_user(self):
+        return User.objects.create(email=f'{self.name("user").replace(" ", ".")}@example.com')
+
+    def new_project(self):
+        return Project.objects.create(title=self.name('project'), author_user=self.user)
+
+    def new_issue(self):
+        return Issue.objects.create(title=self.name('issue'), project=self.project,
+                                    author_user=self.user, assignee_user=self.user)
+
+    def new_comment(self):
+        return Comment.objects.create(description=self.name('comment'), issue=self.issue,
+                                      author_user=self.user)
+
+    def new_contributor(self):
+        return Contributor.objects.create(user=self.new_user(), project=self.project)
+
+
+class Scenario:
+    """
+    A request on a route, prepare(target) returning the parameters of the
+    route and the payload
+    """
+    def __init__(self, method, route, query='', prepare=None):
+        self.method = method
+        self.route = route
+        self.query = query
+        self.prepare = prepare or (lambda target: ({}, None))
+
+    @property
+    def name(self):
+        return f'{self.method.upper()} /{self.route}{self.query}'
+
+    def request(self, target):
+        params, data = self.prepare(target)
+        params = {'pk': target.project.pk, 'project_pk': target.project.pk,
+                  'issue_pk': target.issue.pk, **params}
+        return '/' + self.route.format(**params) + self.query, data
+
+
+def on_comment(target):
+    return {'pk': target.comment.pk}, None
+
+
+PROJECT = 'projects/{pk}/'
+CONTRIBUTORS = 'projects/{project_pk}/users/'
+ISSUES = 'projects/{project_pk}/issues/'
+COMMENTS = 'projects/{project_pk}/issues/{issue_pk}/comments/'
+
+SCENARIOS = [
+    Scenario('get', ''),
+    Scenario('post', 'login/', prepare=lambda target: (
+        {}, {'email': target.user.email, 'password': target.password})),
+    Scenario('post', 'signup/', prepare=lambda target: (
+        {}, {'email': f"{target.name('signup').replace(' ', '.')}@example.com",
+             'password': SEED_PASSWORD, 'first_name': 'Bench', 'last_name': 'Mark'})),
+    Scenario('get', 'projects/'),
+    Scenario('get', 'projects/', '?pagination=keyset'),
+    Scenario('post', 'projects/', prepare=lambda target: (
+        {}, {'title': target.name('project')})),
+    Scenario('get', PROJECT),
+    Scenario('put', PROJECT, prepare=lambda target: ({}, {'title': target.name('project')})),
+    Scenario('delete', PROJECT, prepare=lambda target: ({'pk': target.new_project().pk}, None)),
+    Scenario('get', 'projects/{pk}/stats/'),
+    Scenario('get', CONTRIBUTORS),
+    Scenario('post', CONTRIBUTORS, prepare=lambda target: (
+        {}, {'user_id': target.new_user().pk, 'role': 'DEV'})),
+    Scenario('delete', CONTRIBUTORS + '{pk}/', prepare=lambda target: (
+        {'pk': target.new_contributor().user_id}, None)),
+    Scenario('get', ISSUES),
+    Scenario('get', ISSUES, '?pagination=keyset'),
+    Scenario('get', ISSUES, '?status=NEW,INP&ordering=-last_activity_at'),
+    Scenario('post', ISSUES, prepare=lambda target: (
+        {}, {'title': target.name('issue'), 'assignee_user_id': target.user.pk})),
+    Scenario('put', ISSUES + '{pk}/', prepare=lambda target: (
+        {'pk': target.issue.pk}, {'status': 'INP', 'assignee_user_id': target.user.pk})),
+    Scenario('delete', ISSUES + '{pk}/', prepare=lambda target: (
+        {'pk': target.new_issue().pk}, None)),
+    Scenario('get', COMMENTS),
+    Scenario('get', COMMENTS, '?pagination=keyset'),
+    Scenario('post', COMMENTS, prepare=lambda target: (
+        {}, {'description': target.name('comment')})),
+    Scenario('get', COMMENTS + '{pk}/', prepare=on_comment),
+    Scenario('put', COMMENTS + '{pk}/', prepare=lambda target: (
+        {'pk': target.comment.pk}, {'description': target.name('comment')})),
+    Scenario('delete', COMMENTS + '{pk}/', prepare=lambda target: (
+        {'pk': target.new_comment().pk}, None)),
+    Scenario('get', 'projects/{project_pk}/search/', '?q=serveur'),
+    Scenario('get', 'projects/{project_pk}/export/', '?output=ndjson'),
+    Scenario('get', 'async/projects/'),
+    Scenario('get', 'async/' + PROJECT),
+    Scenario('get', 'async/' + ISSUES),
+    Scenario('get', 'async/' + COMMENTS),
+    Scenario('get', 'async/' + COMMENTS + '{pk}/', prepare=on_comment),
+]
+
+
+def unmeasured_routes():
+    measured = {scenario.route for scenario in SCENARIOS}
+    return [route for route in dict.fromkeys(route_templates(urlpatterns))
+            if route not in measured and not route.startswith('admin/')]
+
+
+class Command(BaseCommand):
+    help = "Measure every route of the API in process, through the test client with a " \
+           "JWT, on the data of the database (see seed_dataset): latency percentiles, " \
+           "throughput, SQL queries and SQL time of each request. The requests are " \
+           "about the project with the most issues, or --project, and its issue with " \
+           "the most comments; the writes are rolled back. --output saves the results " \
+           "as JSON, to be given to --compare by a later run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help="by default, the biggest one")
+        parser.add_argument('--password', default=SEED_PASSWORD,
+                            help="password of the author of the project, for the login")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--only', nargs='+', default=[],
+                            help="measure the requests whose name contains one of these")
+        parser.add_argument('--output', help="write the results to this JSON file")
+        parser.add_argument('--compare', help="JSON file of a previous run")
+        parser.add_argument('--json', action='store_true', help="print the results as JSON")
+
+    def target_project(self, project_id):
+        if project_id is None:
+            biggest = ProjectStat.objects.filter(field='status').values('project') \
+                .annotate(issues=Sum('count')).order_by('-issues').first()
+            if biggest is None or not biggest['issues']:
+                raise CommandError("no project has issues: seed the database first "
+                                   "(see seed_dataset)")
+            project_id = biggest['project']
+        project = Project.objects.select_related('author_user').filter(pk=project_id).first()
+        if project is None:
+            raise CommandError(f"no project {project_id}")
+        return project
+
+    def host(self):
+        # localhost is only allowed by default in DEBUG
+        return next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'),
+                    'localhost')
+
+    def send(self, client, scenario, target):
+        path, data = scenario.request(target)
+        start = time.perf_counter()
+        response = getattr(client, scenario.method)(path, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return time.perf_counter() - start, response.status_code
+
+    def send_rolled_back(self, client, scenario, target):
+        """
+        Send the write in a transaction rolled back after it, its commit left
+        out: the reads run outside of any transaction, as the async views do
+        in their own threads
+        """
+        if scenario.method == 'get':
+            return self.send(client, scenario, target)
+        with rolled_back():
+            return self.send(client, scenario, target)
+
+    def run(self, client, scenario, target, repeat):
+        with logged_queries() as queries:
+            elapsed, status = self.send_rolled_back(client, scenario, target)
+        timings = []
+        statuses = {status}
+        for _ in range(repeat):
+            elapsed, status = self.send_rolled_back(client, scenario, target)
+            timings.append(elapsed)
+            statuses.add(status)
+        return {
+            'name': scenario.name,
+            'route': scenario.route,
+            'status': max(statuses),
+            'queries': len(queries),
+            'sql_ms': round(sum(query['duration'] for query in queries) * 1000, 3),
+            'throughput': round(len(timings) / sum(timings), 2),
+            **summarize(timings),
+        }
+
+    def metadata(self, project, options):
+        return {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'vendor': connection.vendor,
+            'debug': settings.DEBUG,
+            'repeat': options['repeat'],
+            'project': project.pk,
+            'project_issues': Issue.objects.filter(project=project).count(),
+            'counts': {model.__name__.lower(): model.objects.count()
+                       for model in (User, Project, Issue, Comment)},
+        }
+
+    def handle(self, *args, **options):
+        for route in unmeasured_routes():
+            self.stderr.write(f"/{route} is not measured")
+        scenarios = [scenario for scenario in SCENARIOS
+                     if not options['only'] or any(part in scenario.name
+                                                   for part in options['only'])]
+        project = self.target_project(options['project'])
+        target = Target(project, options['password'])
+        token = jwt_encode_handler(jwt_payload_handler(target.user))
+        client = APIClient(HTTP_HOST=self.host(), HTTP_AUTHORIZATION=f'Bearer {token}')
+        run = {'meta': self.metadata(project, options),
+               'results': [self.run(client, scenario, target, options['repeat'])
+                           for scenario in scenarios]}
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(run, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(run, indent=2))
+            return
+        self.report(run, options['compare'])
+
+    def report(self, run, compare):
+        previous = {}
+        if compare:
+            with open(compare, encoding='utf-8') as f:
+                previous = {result['name']: result for result in json.load(f)['results']}
+        meta = run['meta']
+        self.stdout.write(f"{meta['vendor']}, project {meta['project']} "
+                          f"({meta['project_issues']} issues), {meta['counts']}")
+        if meta['debug']:
+            self.stderr.write("DEBUG is on: the queries are logged in every request")
+        for result in run['results']:
+            line = (f"{result['name']:<72} {result['status']}  "
+                    f"p50 {result['p50']:>8.2f}  p95 {result['p95']:>8.2f}  "
+                    f"p99 {result['p99']:>8.2f} ms  {result['throughput']:>8.1f} req/s  "
+                    f"{result['queries']:>3} queries {result['sql_ms']:>7.2f} ms")
+            before = previous.get(result['name'])
+            if before:
+                line += f"  p50 {(result['p50'] / before['p50'] - 1) * 100:+.0f}%"
+            self.stdout.write(line)
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from rest_framework_jwt.settings import api_settings
+
+from soft_desk.benchmark import summarize
+from soft_desk.seeding import seed_benchmark_project
+
+jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
+jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
+
+MODES = ('wsgi', 'asgi-sync', 'asgi-async')
+
+
+class Command(BaseCommand):
+    help = "Compare the read endpoints served by a threaded WSGI server, by ASGI through " \
+           "the synchronous views, and by ASGI through the async views (/async/...), " \
+           "for concurrent slow clients. A slow client takes --client-delay seconds to " \
+           "send its request: a WSGI worker is held meanwhile, while the ASGI handler " \
+           "awaits it. The data is seeded in the database, then deleted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, nargs='+', default=[10, 100])
+        parser.add_argument('--requests', type=int, default=5,
+                            help="requests sent in a row by each client")
+        parser.add_argument('--client-delay', type=float, default=0.05)
+        parser.add_argument('--wsgi-threads', type=int, default=8,
+                            help="worker threads of the WSGI server")
+        parser.add_argument('--issues', type=int, default=100)
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument('--json', action='store_true', help="print the results as JSON")
+
+    def paths(self, the_project, the_issue):
+        return ['/projects/',
+                f'/projects/{the_project.pk}/',
+                f'/projects/{the_project.pk}/issues/',
+                f'/projects/{the_project.pk}/issues/{the_issue.pk}/comments/']
+
+    def run_wsgi(self, paths, token, clients, requests, delay, threads):
+        application = get_wsgi_application()
+        workers = threading.BoundedSemaphore(threads)
+
+        def request(path):
+            environ = {}
+            setup_testing_defaults(environ)
+            environ.update({'PATH_INFO': path, 'SERVER_NAME': 'localhost',
+                            'HTTP_HOST': 'localhost', 'HTTP_AUTHORIZATION': f'Bearer {token}'})
+            statuses = []
+            with workers:
+                # the worker reads the request of the slow client
+                time.sleep(delay)
+                response = application(environ, lambda status, headers, exc_info=None:
+                                       statuses.append(int(status.split()[0])))
+                try:
+                    b''.join(response)
+                finally:
+                    response.close()
+            return statuses[0]
+
+        def client(_):
+            results = []
+            for i in range(requests):
+                start = time.perf_counter()
+                status = request(paths[i % len(paths)])
+                results.append((time.perf_counter() - start, status))
+            return results
+
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            return [result for results in executor.map(client, range(clients))
+                    for result in results]
+
+    async def run_asgi(self, prefix, paths, token, clients, requests, delay):
+        application = get_asgi_application()
+
+        async def request(path):
+            async def receive():
+                # the slow client sends its request
+                await asyncio.sleep(delay)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            statuses = []
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+            path = prefix + path
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 0),
+                'server': ('localhost', 80),
+                'headers': [(b'host', b'localhost'),
+                            (b'authorization', f'Bearer {token}'.encode())],
+            }
+            await application(scope, receive, send)
+            return statuses[0]
+
+        async def client():
+            results = []
+            for i in range(requests):
+                start = time.perf_counter()
+                status = await request(paths[i % len(paths)])
+                results.append((time.perf_counter() - start, status))
+            return results
+
+        return [result for results in await asyncio.gather(*[client() for _ in range(clients)])
+                for result in results]
+
+    def run(self, mode, paths, token, clients, options):
+        start = time.perf_counter()
+        if mode == 'wsgi':
+            results = self.run_wsgi(paths, token, clients, options['requests'],
+                                    options['client_delay'], options['wsgi_threads'])
+        else:
+            prefix = '/async' if mode == 'asgi-async' else ''
+            results = asyncio.run(self.run_asgi(prefix, paths, token, clients,
+                                                options['requests'], options['client_delay']))
+        elapsed = time.perf_counter() - start
+        return {
+            'mode': mode,
+            'clients': clients,
+            'requests': len(results),
+            'errors': sum(1 for timing, status in results if status != 200),
+            'throughput': round(len(results) / elapsed, 2),
+            **summarize([timing for timing, status in results]),
+        }
+
+    def handle(self, *args, **options):
+        the_user = None
+        results = []
+        try:
+            the_user, the_project, the_issue = seed_benchmark_project(
+                'asgi', issues=options['issues'], comments=options['issues'])
+            paths = self.paths(the_project, the_issue)
+            token = jwt_encode_handler(jwt_payload_handler(the_user))
+            for clients in options['clients']:
+                for mode in options['modes']:
+                    results.append(self.run(mode, paths, token, clients, options))
+        finally:
+            # the projects of the user are deleted with it
+            if the_user is not None:
+                the_user.delete()
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(
+                f"{result['clients']:>5} clients  {result['mode']:<10} "
+                f"{result['throughput']:>9.2f} req/s  p50 {result['p50']:>9.3f} ms  "
+                f"p95 {result['p95']:>9.3f} ms  p99 {result['p99']:>9.3f} ms  "
+                f"errors {result['errors']}")
@@ -0,0 +1,131 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from soft_desk.benchmark import summarize
+from soft_desk.models import Comment
+from soft_desk.seeding import seed_benchmark_project
+
+PROFILES = ('sqlite', 'sqlite-wal', 'postgresql')
+
+
+class Command(BaseCommand):
+    help = "Measure the read and write throughput of the database profile (see " \
+           "SOFT_DESK_DB_PROFILE): reader threads list the comments of an issue while " \
+           "writer threads post comments to it. With --profiles, each profile is run in " \
+           "its own process, the SQLite ones on a scratch database file. The data is " \
+           "seeded in the database, then deleted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5, help="in seconds")
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES,
+                            help="run each of these profiles in a subprocess")
+        parser.add_argument('--json', action='store_true', help="print the results as JSON")
+
+    def run_threads(self, the_user, the_issue, readers, writers, duration):
+        stop = threading.Event()
+        timings = {'read': [], 'write': []}
+        errors = []
+
+        def read():
+            list(Comment.objects.filter(issue=the_issue).order_by('-comment_id')[:100])
+
+        def write():
+            Comment.objects.create(description='benchmark', issue=the_issue,
+                                   author_user=the_user)
+
+        def loop(kind, function):
+            try:
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    try:
+                        function()
+                    except DatabaseError as e:
+                        errors.append(str(e))
+                        continue
+                    timings[kind].append(time.perf_counter() - start)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=loop, args=('read', read)) for _ in range(readers)]
+        threads += [threading.Thread(target=loop, args=('write', write))
+                    for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return timings, errors
+
+    def run(self, options):
+        the_user = None
+        try:
+            the_user, the_project, the_issue = seed_benchmark_project(
+                'database', issues=1, comments=100)
+            timings, errors = self.run_threads(the_user, the_issue, options['readers'],
+                                               options['writers'], options['duration'])
+        finally:
+            # the projects of the user are deleted with it
+            if the_user is not None:
+                the_user.delete()
+        result = {
+            'profile': settings.SOFT_DESK_DB_PROFILE,
+            'vendor': connection.vendor,
+            'readers': options['readers'],
+            'writers': options['writers'],
+            'reads_per_second': round(len(timings['read']) / options['duration'], 2),
+            'writes_per_second': round(len(timings['write']) / options['duration'], 2),
+            'errors': len(errors),
+        }
+        for kind in ('read', 'write'):
+            if timings[kind]:
+                result[kind] = summarize(timings[kind])
+        return result
+
+    def run_profile(self, profile, options):
+        manage = sys.argv[0]
+        arguments = ['--readers', str(options['readers']), '--writers', str(options['writers']),
+                     '--duration', str(options['duration']), '--json']
+        env = {**os.environ, 'SOFT_DESK_DB_PROFILE': profile}
+        with tempfile.TemporaryDirectory() as directory:
+            if profile.startswith('sqlite'):
+                env['SQLITE_PATH'] = os.path.join(directory, 'db.sqlite3')
+                subprocess.run([sys.executable, manage, 'migrate', '-v0'], env=env, check=True)
+            completed = subprocess.run(
+                [sys.executable, manage, 'benchmark_database'] + arguments,
+                env=env, stdout=subprocess.PIPE, check=False)
+        if completed.returncode:
+            return {'profile': profile, 'error': f"exit status {completed.returncode}"}
+        return json.loads(completed.stdout)[0]
+
+    def handle(self, *args, **options):
+        if options['profiles']:
+            if not os.path.exists(sys.argv[0]):
+                raise CommandError("--profiles must be run through manage.py")
+            results = [self.run_profile(profile, options) for profile in options['profiles']]
+        else:
+            results = [self.run(options)]
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            if 'error' in result:
+                self.stdout.write(f"{result['profile']:<11} error: {result['error']}")
+                continue
+            summary = f"{result['profile']:<11} {result['reads_per_second']:>9.2f} reads/s  " \
+                      f"{result['writes_per_second']:>8.2f} writes/s"
+            for kind in ('read', 'write'):
+                if kind in result:
+                    summary += f"  {kind} p95 {result[kind]['p95']:>8.3f} ms"
+            self.stdout.write(f"{summary}  errors {result['errors']}")
@@ -0,0 +1,61 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from soft_desk.benchmark import summarize
+from soft_desk.models import User
+from soft_desk.passwords import get_password_options, verify_password
+
+
+class Command(BaseCommand):
+    help = "Measure the login capacity: password verifications per second, and per " \
+           "core, through the password pool configured by SOFT_DESK_PASSWORDS. " \
+           "Nothing is written to the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help="concurrent login requests (default: 2 per worker)")
+        parser.add_argument('--json', action='store_true', help="print the results as JSON")
+
+    def handle(self, *args, **options):
+        password_options = get_password_options()
+        workers = password_options['WORKERS']
+        concurrency = options['concurrency'] or max(1, 2 * workers)
+        password = 'N3wpolo6'
+        # an unsaved user: the hash is current, so verify_password never writes it
+        the_user = User(email='benchmark.user@example.com', password=make_password(password))
+
+        def login():
+            start = time.perf_counter()
+            if not verify_password(the_user, password):
+                raise AssertionError("the password does not verify")
+            return time.perf_counter() - start
+
+        login()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            timings = list(executor.map(lambda _: login(), range(options['logins'])))
+        elapsed = time.perf_counter() - start
+        cores = min(workers or 1, os.cpu_count() or 1)
+        result = {
+            'iterations': password_options['ITERATIONS'],
+            'workers': workers,
+            'concurrency': concurrency,
+            'cores': cores,
+            'logins_per_second': round(len(timings) / elapsed, 2),
+            'logins_per_second_per_core': round(len(timings) / elapsed / cores, 2),
+            'latency': summarize(timings),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        self.stdout.write(
+            f"{result['iterations']} iterations, {workers} workers, {concurrency} concurrent "
+            f"logins: {result['logins_per_second']} logins/s, "
+            f"{result['logins_per_second_per_core']} logins/s per core, "
+            f"p50 {result['latency']['p50']:.3f} ms  p95 {result['latency']['p95']:.3f} ms")
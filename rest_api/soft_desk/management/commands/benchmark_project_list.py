@@ -0,0 +1,96 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from soft_desk.benchmark import measure, rolled_back, summarize
+from soft_desk.models import Contributor, Project, User
+
+
+def materialized_ids(user):
+    """
+    The listing as it was: project ids fetched in Python, then an IN (...) list
+    """
+    list_project_id = [q['project_id'] for q in
+                       Contributor.objects.filter(user=user).values('project_id')]
+    return Project.objects.filter(Q(author_user=user) | Q(project_id__in=list_project_id))
+
+
+def correlated_exists(user):
+    return Project.objects.filter(
+        Q(author_user=user)
+        | Exists(Contributor.objects.filter(project=OuterRef('project_id'), user=user)))
+
+
+def union_of_ids(user):
+    return Project.objects.owned_or_contributed_by(user)
+
+
+APPROACHES = {
+    'materialized': materialized_ids,
+    'exists': correlated_exists,
+    'union': union_of_ids,
+}
+
+
+class Command(BaseCommand):
+    help = "Compare the ways of listing the projects of a user, for growing numbers " \
+           "of memberships. The data is seeded in a transaction which is rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--memberships', type=int, nargs='+', default=[10, 1000, 100000])
+        parser.add_argument('--other-projects', type=int, default=10000,
+                            help="projects the user has nothing to do with")
+        parser.add_argument('--page-size', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help="print the results as JSON")
+
+    def seed(self, memberships, other_projects):
+        the_user = User.objects.create(email='benchmark.user@example.com')
+        the_other = User.objects.create(email='benchmark.other@example.com')
+        projects = [Project(title='owned', author_user=the_user)
+                    for _ in range(memberships // 10 + 1)]
+        projects += [Project(title='member', author_user=the_other) for _ in range(memberships)]
+        projects += [Project(title='other', author_user=the_other) for _ in range(other_projects)]
+        Project.objects.bulk_create(projects, batch_size=5000)
+        member_ids = Project.objects.filter(author_user=the_other, title='member') \
+            .values_list('project_id', flat=True)
+        Contributor.objects.bulk_create(
+            [Contributor(user=the_user, project_id=project_id) for project_id in member_ids],
+            batch_size=5000)
+        return the_user
+
+    def run(self, approach, the_user, page_size, repeat):
+        def list_projects():
+            queryset = APPROACHES[approach](the_user).order_by('project_id')
+            queryset.count()
+            list(queryset[:page_size])
+        try:
+            # a failure, like too many SQL variables, only rolls back its savepoint:
+            # PostgreSQL would refuse any other query in the transaction
+            with transaction.atomic():
+                return summarize(measure(list_projects, repeat))
+        except DatabaseError as e:
+            return {'error': str(e)}
+
+    def handle(self, *args, **options):
+        results = []
+        for memberships in options['memberships']:
+            with rolled_back():
+                the_user = self.seed(memberships, options['other_projects'])
+                for approach in APPROACHES:
+                    result = self.run(approach, the_user, options['page_size'],
+                                      options['repeat'])
+                    results.append({'memberships': memberships, 'approach': approach,
+                                    **result})
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            if 'error' in result:
+                summary = f"error: {result['error']}"
+            else:
+                summary = f"p50 {result['p50']:>9.3f} ms  p95 {result['p95']:>9.3f} ms"
+            self.stdout.write(f"{result['memberships']:>8} memberships  "
+                              f"{result['approach']:<13} {summary}")
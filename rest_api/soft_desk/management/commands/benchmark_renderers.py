@@ -0,0 +1,96 @@
+import gzip
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from soft_desk.benchmark import measure, rolled_back, summarize
+from soft_desk.encoders import ValuesRowEncoder, render_page
+from soft_desk.models import Comment, Issue, Project, User
+from soft_desk.renderers import FastJSONRenderer, MessagePackRenderer
+from soft_desk.seeding import text
+from soft_desk.serializers import CommentSerializer, IssueSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare the encoding time and the size of pages of issues and comments " \
+           "rendered as JSON by the stdlib encoder of JSONRenderer, by FastJSONRenderer, " \
+           "by the values fast path, and as MessagePack when msgpack is installed. The " \
+           "time runs from the fetched rows to the bytes, the serializer included. The " \
+           "data is seeded in a transaction which is rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help="print the results as JSON")
+
+    def seed(self, page_size):
+        random.seed(0)
+        the_user = User.objects.create(email='benchmark.renderers@example.com',
+                                       first_name='Bench', last_name='Mark')
+        the_project = Project.objects.create(title='benchmark', author_user=the_user)
+        Issue.objects.bulk_create([
+            Issue(title=text(random.randint(20, 128)), desc=text(random.randint(0, 2048)),
+                  tag=random.choice(Issue.Tag.values),
+                  priority=random.choice(Issue.Priority.values),
+                  status=random.choice(Issue.Status.values),
+                  project=the_project, author_user=the_user, assignee_user=the_user)
+            for _ in range(page_size)], batch_size=500)
+        the_issue = Issue.objects.filter(project=the_project).first()
+        Comment.objects.bulk_create([
+            Comment(description=text(random.randint(10, 1024)), issue=the_issue,
+                    author_user=the_user)
+            for _ in range(page_size)], batch_size=500)
+        return {
+            'issues': (IssueSerializer, Issue.objects.filter(project=the_project)
+                       .order_by('issue_id')),
+            'comments': (CommentSerializer, Comment.objects.filter(issue=the_issue)
+                         .order_by('comment_id')),
+        }
+
+    def encoders(self, serializer_class, queryset):
+        objs = list(queryset)
+        envelope = {'count': len(objs), 'next': None, 'previous': None}
+        encoder = ValuesRowEncoder(serializer_class())
+        rows = list(queryset.values_list(*encoder.columns))
+        fast_renderer = FastJSONRenderer()
+
+        def serialized(renderer):
+            return lambda: renderer.render({**envelope, 'results':
+                                            serializer_class(objs, many=True).data})
+        encoders = {
+            'json': serialized(JSONRenderer()),
+            f"json-fast ({fast_renderer.accelerator or 'stdlib'})": serialized(fast_renderer),
+            'json-values': lambda: render_page(fast_renderer, {**envelope, 'results': []},
+                                               encoder.encode_rows(rows),
+                                               'application/json', {}),
+        }
+        if MessagePackRenderer.available:
+            encoders['msgpack'] = serialized(MessagePackRenderer())
+        return encoders
+
+    def handle(self, *args, **options):
+        results = []
+        with rolled_back():
+            pages = self.seed(options['page_size'])
+            for endpoint, (serializer_class, queryset) in pages.items():
+                for name, encode in self.encoders(serializer_class, queryset).items():
+                    content = encode()
+                    results.append({
+                        'endpoint': endpoint,
+                        'format': name,
+                        'bytes': len(content),
+                        'gzip_bytes': len(gzip.compress(content)),
+                        **summarize(measure(encode, options['repeat'])),
+                    })
+        if not MessagePackRenderer.available:
+            self.stderr.write("msgpack is not installed: MessagePack is not measured")
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(
+                f"{result['endpoint']:<9} {result['format']:<19} "
+                f"p50 {result['p50']:>8.3f} ms  p95 {result['p95']:>8.3f} ms  "
+                f"{result['bytes']:>9} bytes  {result['gzip_bytes']:>8} gzipped")
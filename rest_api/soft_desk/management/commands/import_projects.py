@@ -0,0 +1,81 @@
+import itertools
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from soft_desk.importer import RECORD_TYPES, Checkpoint, Importer, read_records
+
+
+class Command(BaseCommand):
+    help = "Import projects, contributors, issues and comments from an NDJSON or CSV " \
+           "file, read as a stream. Each record has a type (project, contributor, " \
+           "issue or comment) and refers to the users by email: author_email, " \
+           "assignee_email, user_email. The projects and issues have a ref, by which " \
+           "the records after them refer to them: project_ref, issue_ref. The other " \
+           "keys are the fields of the models, the type of a project being " \
+           "project_type. The records are inserted by chunks, each chunk in one " \
+           "transaction, which saves the progress in a checkpoint of the database: an " \
+           "interrupted import resumes after the last committed chunk, and a " \
+           "finished one is not imported again unless --restart is given. The " \
+           "rejected records are reported with their number, and skipped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('ndjson', 'csv'),
+                            help="by default, from the extension of the file")
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help="records inserted per transaction")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="rows per INSERT statement")
+        parser.add_argument('--checkpoint',
+                            help="name of the checkpoint, by default the absolute path")
+        parser.add_argument('--restart', action='store_true',
+                            help="ignore the checkpoint and import the file from the start")
+        parser.add_argument('--create-users', action='store_true',
+                            help="create the unknown users, inactive and without password")
+
+    def report(self, checkpoint, records, elapsed):
+        counts = ', '.join(f"{checkpoint.counts[kind]} {kind}s" for kind in RECORD_TYPES)
+        rate = records / elapsed if elapsed else 0
+        self.stdout.write(f"{checkpoint.position} records ({rate:.0f}/s): {counts}, "
+                          f"{checkpoint.errors} rejected")
+
+    def load_checkpoint(self, path, options):
+        name = options['checkpoint'] or os.path.abspath(path)
+        if options['restart']:
+            Checkpoint.delete(name)
+        try:
+            checkpoint = Checkpoint(name, path)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if checkpoint.position:
+            self.stdout.write(f"resuming after record {checkpoint.position}")
+        return checkpoint
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+        input_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        checkpoint = self.load_checkpoint(path, options)
+        importer = Importer(checkpoint.refs, batch_size=options['batch_size'],
+                            create_users=options['create_users'])
+        records = enumerate(read_records(path, input_format), start=1)
+        records = itertools.islice(records, checkpoint.position, None)
+        start = time.perf_counter()
+        imported = 0
+        while True:
+            chunk = list(itertools.islice(records, options['chunk_size']))
+            if not chunk:
+                break
+            counts, errors = importer.import_chunk(chunk, checkpoint)
+            for number, message in errors:
+                self.stderr.write(f"record {number}: {message}")
+            imported += len(chunk)
+            if options['verbosity'] >= 1:
+                self.report(checkpoint, imported, time.perf_counter() - start)
+        self.stdout.write(self.style.SUCCESS(
+            f"imported {path}: " + ', '.join(f"{checkpoint.counts[kind]} {kind}s"
+                                             for kind in RECORD_TYPES)
+            + f", {checkpoint.errors} rejected"))
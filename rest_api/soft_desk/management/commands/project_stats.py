@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from soft_desk.models import Project
+from soft_desk.stats import rebuild, verify
+
+
+class Command(BaseCommand):
+    help = "Check the counters of issues by status, priority and tag of the projects " \
+           "against their issues, and fail listing the wrong ones. With --rebuild, " \
+           "recompute them instead: the counters drift when issues are written " \
+           "without their signals, by QuerySet.update() or raw SQL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, nargs='+', dest='project_ids',
+                            help="ids of the projects, by default all of them")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="recompute the counters from the issues")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="projects checked or rebuilt per transaction")
+
+    def handle(self, *args, **options):
+        project_ids = options['project_ids'] or list(
+            Project.objects.order_by('pk').values_list('pk', flat=True))
+        size = options['batch_size']
+        batches = [project_ids[i:i + size] for i in range(0, len(project_ids), size)]
+        if options['rebuild']:
+            for batch in batches:
+                rebuild(batch)
+            self.stdout.write(self.style.SUCCESS(
+                f"rebuilt the counters of {len(project_ids)} projects"))
+            return
+        mismatches = [mismatch for batch in batches for mismatch in verify(batch)]
+        for project_id, field, value, stored, computed in mismatches:
+            self.stderr.write(f"project {project_id}: {field} {value} is {stored}, "
+                              f"{computed} issues")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} wrong counters, fix them with --rebuild")
+        self.stdout.write(self.style.SUCCESS(
+            f"the counters of {len(project_ids)} projects are right"))
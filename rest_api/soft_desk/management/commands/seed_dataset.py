@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from soft_desk.seeding import SEED_PASSWORD, Seeder
+
+
+class Command(BaseCommand):
+    help = "Seed the database with a generated dataset, for the benchmarks (see " \
+           "benchmark_api). The authors of the projects and the projects of the issues " \
+           "follow a Zipf law of exponent --skew, as do the issues of the comments: a " \
+           "few big projects hold most of the issues. The same --seed gives the same " \
+           "dataset, and its users have the emails seed{seed}.user{n}@example.com and " \
+           f"the password {SEED_PASSWORD}. The rows are kept: seed a dedicated database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--projects', type=int, default=50000)
+        parser.add_argument('--issues', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=5000000)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help="exponent of the Zipf laws, 0 for uniform draws")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--days', type=int, default=365,
+                            help="the issues are created over the last days")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="rows per transaction")
+
+    def handle(self, *args, **options):
+        sizes = [options[kind] for kind in ('users', 'projects', 'issues', 'comments')]
+        if min(sizes) < 0 or any(size and not parent for parent, size in zip(sizes, sizes[1:])):
+            raise CommandError("the counts must be positive, and there must be users for "
+                               "projects, projects for issues and issues for comments")
+        seeder = Seeder(*sizes, skew=options['skew'], seed=options['seed'],
+                        days=options['days'], batch_size=options['batch_size'])
+        if seeder.exists():
+            raise CommandError(f"the dataset of seed {options['seed']} is already in the "
+                               f"database, give another --seed")
+        totals = dict.fromkeys(seeder.counts, 0)
+        start = time.perf_counter()
+        for kind, count in seeder.run():
+            totals[kind] += count
+            if options['verbosity'] >= 2 or kind in ('users', 'projects'):
+                self.stdout.write(f"{totals[kind]} {kind} "
+                                  f"({time.perf_counter() - start:.1f} s)")
+        rows = sum(totals.values())
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f"{count} {kind}" for kind, count in totals.items())
+            + f" seeded in {elapsed:.1f} s ({rows / elapsed:.0f} rows/s)"))
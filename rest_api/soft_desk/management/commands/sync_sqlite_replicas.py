@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from soft_desk.routers import get_replica_options
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database to the SQLite files standing in for the " \
+           "read replicas (SQLITE_REPLICA_PATHS), with the online backup API"
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("the primary database is not a SQLite database")
+        aliases = get_replica_options()['ALIASES']
+        if not aliases:
+            raise CommandError("no replica is configured (see SQLITE_REPLICA_PATHS)")
+        source = sqlite3.connect(str(primary['NAME']))
+        try:
+            for alias in aliases:
+                replica = connections[alias].settings_dict
+                if replica['ENGINE'] != 'django.db.backends.sqlite3':
+                    raise CommandError(f"the replica {alias} is not a SQLite database")
+                connections[alias].close()
+                target = sqlite3.connect(str(replica['NAME']))
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f"{alias}: {replica['NAME']}")
+        finally:
+            source.close()
@@ -0,0 +1,150 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from soft_desk.caching import LRUCache, bump_generation
+
+DEFAULTS = {
+    # size of the process-local tier
+    'MAX_ENTRIES': 10000,
+    # lifetime of an entry, in seconds, in both tiers
+    'TIMEOUT': 60,
+    # alias of a Django cache shared between processes (None disables the tier,
+    # and a membership removed in a process stays cached in the others up to
+    # TIMEOUT seconds)
+    'CACHE_ALIAS': None,
+}
+
+
+class MembershipCache:
+    """
+    Cache of the (user_id, project_id) -> is contributor answers.
+    A bounded process-local LRU tier sits in front of an optional tier
+    backed by the Django cache framework. Entries are invalidated by the
+    Contributor and Project signals (see soft_desk.signals), which bump the
+    generation of the project in the shared tier: every read checks the
+    local entries against it, so the other processes see the invalidation
+    at once. Without a shared tier, they keep their entries up to the timeout.
+    """
+    key_prefix = 'soft_desk:membership'
+
+    def __init__(self, max_entries, timeout, cache_alias=None):
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self.local = LRUCache(max_entries=max_entries, timeout=timeout)
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    @property
+    def hits(self):
+        return self.local_hits + self.shared_hits
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'size': len(self.local),
+        }
+
+    def _entry_key(self, user_id, project_id):
+        return f'{self.key_prefix}:{project_id}:{user_id}'
+
+    def _generation_key(self, project_id):
+        return f'{self.key_prefix}:{project_id}:generation'
+
+    def _generation(self, project_id):
+        shared = self.shared
+        return 0 if shared is None else shared.get(self._generation_key(project_id), 0)
+
+    def get_or_load(self, user_id, project_id, load):
+        """
+        Return the cached membership, calling load() to compute it on a miss
+        """
+        shared = self.shared
+        found = {}
+        generation = 0
+        if shared is not None:
+            entry_key = self._entry_key(user_id, project_id)
+            generation_key = self._generation_key(project_id)
+            found = shared.get_many([entry_key, generation_key])
+            generation = found.get(generation_key, 0)
+        # the local and shared entries are (generation, value)
+        entry = self.local.get((user_id, project_id))
+        if entry is not None and entry[0] == generation:
+            self.local_hits += 1
+            return entry[1]
+        entry = found.get(self._entry_key(user_id, project_id))
+        if entry is not None and entry[0] == generation:
+            self.shared_hits += 1
+            self.local.set((user_id, project_id), entry)
+            return entry[1]
+        self.misses += 1
+        value = bool(load())
+        self.set(user_id, project_id, value, generation)
+        return value
+
+    def set(self, user_id, project_id, value, generation=None):
+        """
+        Cache the membership, read at the given generation of the project
+        (the current one by default)
+        """
+        if generation is None:
+            generation = self._generation(project_id)
+        self.local.set((user_id, project_id), (generation, value))
+        shared = self.shared
+        if shared is not None:
+            shared.set(self._entry_key(user_id, project_id), (generation, value),
+                       self.timeout)
+
+    def prime(self, user_id, project_id, value):
+        """
+        Record a membership already known from another query, in the local tier only
+        """
+        self.local.set((user_id, project_id), (self._generation(project_id), value))
+
+    def invalidate(self, user_id, project_id):
+        self.local.delete((user_id, project_id))
+        shared = self.shared
+        if shared is not None:
+            shared.delete(self._entry_key(user_id, project_id))
+            bump_generation(shared, self._generation_key(project_id))
+
+    def invalidate_project(self, project_id):
+        self.local.delete_where(lambda key: key[1] == project_id)
+        shared = self.shared
+        if shared is not None:
+            bump_generation(shared, self._generation_key(project_id))
+
+    def clear(self):
+        self.local.clear()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+
+_membership_cache = None
+
+
+def get_membership_cache():
+    global _membership_cache
+    if _membership_cache is None:
+        options = {**DEFAULTS, **getattr(settings, 'SOFT_DESK_MEMBERSHIP_CACHE', {})}
+        _membership_cache = MembershipCache(max_entries=options['MAX_ENTRIES'],
+                                            timeout=options['TIMEOUT'],
+                                            cache_alias=options['CACHE_ALIAS'])
+    return _membership_cache
+
+
+@receiver(setting_changed)
+def reset_membership_cache(setting, **kwargs):
+    global _membership_cache
+    if setting in ('SOFT_DESK_MEMBERSHIP_CACHE', 'CACHES'):
+        _membership_cache = None
@@ -0,0 +1,80 @@
+import logging
+
+from rest_framework.permissions import SAFE_METHODS
+
+from soft_desk.routers import (
+    check_sticky_cache, choose_replica, is_sticky, mark_sticky, reset_read_database,
+    set_read_database
+)
+from soft_desk.timing import get_timing_options, timed_request
+
+logger = logging.getLogger('soft_desk.timing')
+
+
+class ReadReplicaMiddleware:
+    """
+    Route the reads of the safe requests to the soft_desk views to a replica
+    (see soft_desk.routers), except during the STICKY_SECONDS following a
+    write of the same client, which then reads its own writes on the primary
+    """
+    def __init__(self, get_response):
+        check_sticky_cache()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = set_read_database(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_read_database(token)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            mark_sticky(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS \
+                or not view_func.__module__.startswith('soft_desk.'):
+            return
+        replica = choose_replica()
+        if replica is not None and not is_sticky(request):
+            set_read_database(replica)
+
+
+class RequestTimingMiddleware:
+    """
+    Measure the requests when the ENABLED option of SOFT_DESK_TIMING is set
+    (see soft_desk.timing): the number and duration of their SQL queries, the
+    time spent in the permission checks, the serializers and the rendering,
+    and the total, are logged on one line and sent in a Server-Timing header
+    to the clients chosen by the SERVER_TIMING option
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = get_timing_options()
+        if not options['ENABLED']:
+            return self.get_response(request)
+        with timed_request() as timing:
+            response = self.get_response(request)
+        if self.sends_server_timing(request, options['SERVER_TIMING']):
+            response['Server-Timing'] = timing.server_timing()
+        self.log(request, response, timing)
+        return response
+
+    def sends_server_timing(self, request, clients):
+        if clients == 'staff':
+            # the user authenticated by the view, see rest_framework.request.Request.user
+            user = getattr(request, 'user', None)
+            return bool(user is not None and user.is_staff)
+        return clients == 'all'
+
+    def log(self, request, response, timing):
+        match = request.resolver_match
+        fields = {'method': request.method,
+                  'view': (match.url_name or match.route) if match is not None else None,
+                  'status': response.status_code,
+                  'queries': timing.queries,
+                  **{f'{name}_ms': round(ms, 2) for name, ms in timing.metrics()}}
+        logger.info(' '.join(f'{key}={value}' for key, value in fields.items()),
+                    extra={'timing': fields})
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+# the page order of the issues and comments of a parent: on SQLite, the
+# foreign key indexes end with the rowid, which is the primary key, and
+# already give it; on PostgreSQL, they do not
+POSTGRESQL_INDEXES = [
+    ('issue_project_issue_idx', 'soft_desk_issue', 'project_id, issue_id'),
+    ('comment_issue_comment_idx', 'soft_desk_comment', 'issue_id, comment_id'),
+]
+
+
+def create_page_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, table, columns in POSTGRESQL_INDEXES:
+            schema_editor.execute(f'CREATE INDEX {name} ON {table} ({columns})')
+
+
+def drop_page_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, table, columns in POSTGRESQL_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_desk', '0002_alter_comment_description'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contributor',
+            index=models.Index(fields=['project', 'user'], name='contributor_project_user_idx'),
+        ),
+        migrations.RunPython(create_page_indexes, drop_page_indexes),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_desk', '0004_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import migrations
+
+
+def hash_plaintext_passwords(apps, schema_editor):
+    """
+    The users created through the signup endpoint had their password stored as given
+    """
+    User = apps.get_model('soft_desk', 'User')
+    for user in User.objects.exclude(password='').exclude(password__startswith='!'):
+        try:
+            identify_hasher(user.password)
+        except ValueError:
+            user.password = make_password(user.password)
+            user.save(update_fields=['password'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_desk', '0005_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(hash_plaintext_passwords, migrations.RunPython.noop),
+    ]
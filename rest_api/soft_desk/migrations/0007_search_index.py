@@ -0,0 +1,102 @@
+from django.db import migrations
+
+# the SQL of the search index as of this migration, which must not follow
+# the later changes of soft_desk.search
+# SQLite: FTS5 table indexing the issues at rowid issue_id * 2 and the comments at
+# rowid comment_id * 2 + 1, with the project in the scope column, as "p<project_id>"
+SQLITE_TABLE = 'soft_desk_search'
+SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE}
+        USING fts5(scope, title, body, tokenize = 'unicode61 remove_diacritics 2')""",
+]
+SQLITE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_issue_search_insert
+        AFTER INSERT ON soft_desk_issue BEGIN
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            VALUES (new.issue_id * 2, 'p' || new.project_id, new.title, new."desc");
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_issue_search_update
+        AFTER UPDATE OF title, "desc", project_id ON soft_desk_issue BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.issue_id * 2;
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            VALUES (new.issue_id * 2, 'p' || new.project_id, new.title, new."desc");
+            UPDATE {SQLITE_TABLE} SET scope = 'p' || new.project_id
+            WHERE new.project_id <> old.project_id AND rowid IN (
+                SELECT comment_id * 2 + 1 FROM soft_desk_comment
+                WHERE issue_id = new.issue_id);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_issue_search_delete
+        AFTER DELETE ON soft_desk_issue BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.issue_id * 2;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_comment_search_insert
+        AFTER INSERT ON soft_desk_comment BEGIN
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            SELECT new.comment_id * 2 + 1, 'p' || project_id, '', new.description
+            FROM soft_desk_issue WHERE issue_id = new.issue_id;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_comment_search_update
+        AFTER UPDATE OF description ON soft_desk_comment BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.comment_id * 2 + 1;
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            SELECT new.comment_id * 2 + 1, 'p' || project_id, '', new.description
+            FROM soft_desk_issue WHERE issue_id = new.issue_id;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_comment_search_delete
+        AFTER DELETE ON soft_desk_comment BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.comment_id * 2 + 1;
+        END""",
+]
+SQLITE_TRIGGER_NAMES = [f'soft_desk_{table}_search_{event}'
+                        for table in ('issue', 'comment')
+                        for event in ('insert', 'update', 'delete')]
+SQLITE_BACKFILL = [
+    f"""INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+        SELECT issue_id * 2, 'p' || project_id, title, "desc" FROM soft_desk_issue""",
+    f"""INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+        SELECT c.comment_id * 2 + 1, 'p' || i.project_id, '', c.description
+        FROM soft_desk_comment c JOIN soft_desk_issue i ON i.issue_id = c.issue_id""",
+]
+
+# PostgreSQL: generated tsvector columns, kept up to date by the database, with GIN indexes
+POSTGRESQL_SCHEMA = [
+    """ALTER TABLE soft_desk_issue ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+           setweight(to_tsvector('simple', title), 'A')
+           || setweight(to_tsvector('simple', "desc"), 'B')) STORED""",
+    "CREATE INDEX soft_desk_issue_search_idx ON soft_desk_issue USING GIN (search_vector)",
+    """ALTER TABLE soft_desk_comment ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+           setweight(to_tsvector('simple', description), 'B')) STORED""",
+    "CREATE INDEX soft_desk_comment_search_idx ON soft_desk_comment USING GIN (search_vector)",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_SCHEMA + SQLITE_BACKFILL + SQLITE_TRIGGERS:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        for statement in POSTGRESQL_SCHEMA:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for name in SQLITE_TRIGGER_NAMES:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE soft_desk_issue DROP COLUMN search_vector')
+        schema_editor.execute('ALTER TABLE soft_desk_comment DROP COLUMN search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_desk', '0006_hash_plaintext_passwords'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_desk', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'status', 'issue_id'],
+                               name='issue_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'assignee_user', 'status', 'issue_id'],
+                               name='issue_project_assignee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'time_created', 'issue_id'],
+                               name='issue_project_created_idx'),
+        ),
+    ]
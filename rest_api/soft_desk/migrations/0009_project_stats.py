@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:46
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def count_issues(apps, schema_editor):
+    """
+    The counters of the existing projects, maintained on every write from now on
+    """
+    Project = apps.get_model('soft_desk', 'Project')
+    Issue = apps.get_model('soft_desk', 'Issue')
+    ProjectStat = apps.get_model('soft_desk', 'ProjectStat')
+    counts = {}
+    for field in ('status', 'priority', 'tag'):
+        for project_id in Project.objects.values_list('project_id', flat=True):
+            for value, label in Issue._meta.get_field(field).choices:
+                counts[(project_id, field, value)] = 0
+        for project_id, value, count in Issue.objects.values_list('project_id', field) \
+                .annotate(count=Count('issue_id')).order_by():
+            counts[(project_id, field, value)] = count
+    ProjectStat.objects.bulk_create(
+        [ProjectStat(project_id=project_id, field=field, value=value, count=count)
+         for (project_id, field, value), count in counts.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_desk', '0008_issue_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True,
+                                           serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=16)),
+                ('value', models.CharField(max_length=4)),
+                ('count', models.BigIntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                              related_name='stats', to='soft_desk.project')),
+            ],
+            options={
+                'unique_together': {('project', 'field', 'value')},
+            },
+        ),
+        migrations.RunPython(count_issues, migrations.RunPython.noop),
+    ]
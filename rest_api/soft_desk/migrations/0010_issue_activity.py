@@ -0,0 +1,122 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:49
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+import django.utils.timezone
+
+# the SQL of the search index as of this migration, which must not follow
+# the later changes of soft_desk.search
+SQLITE_TABLE = 'soft_desk_search'
+SQLITE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_issue_search_insert
+        AFTER INSERT ON soft_desk_issue BEGIN
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            VALUES (new.issue_id * 2, 'p' || new.project_id, new.title, new."desc");
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_issue_search_update
+        AFTER UPDATE OF title, "desc", project_id ON soft_desk_issue BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.issue_id * 2;
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            VALUES (new.issue_id * 2, 'p' || new.project_id, new.title, new."desc");
+            UPDATE {SQLITE_TABLE} SET scope = 'p' || new.project_id
+            WHERE new.project_id <> old.project_id AND rowid IN (
+                SELECT comment_id * 2 + 1 FROM soft_desk_comment
+                WHERE issue_id = new.issue_id);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_issue_search_delete
+        AFTER DELETE ON soft_desk_issue BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.issue_id * 2;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_comment_search_insert
+        AFTER INSERT ON soft_desk_comment BEGIN
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            SELECT new.comment_id * 2 + 1, 'p' || project_id, '', new.description
+            FROM soft_desk_issue WHERE issue_id = new.issue_id;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_comment_search_update
+        AFTER UPDATE OF description ON soft_desk_comment BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.comment_id * 2 + 1;
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            SELECT new.comment_id * 2 + 1, 'p' || project_id, '', new.description
+            FROM soft_desk_issue WHERE issue_id = new.issue_id;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_comment_search_delete
+        AFTER DELETE ON soft_desk_comment BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.comment_id * 2 + 1;
+        END""",
+]
+SQLITE_TRIGGER_NAMES = [f'soft_desk_{table}_search_{event}'
+                        for table in ('issue', 'comment')
+                        for event in ('insert', 'update', 'delete')]
+
+
+def drop_search_triggers(apps, schema_editor):
+    """
+    Drop the triggers before the rebuild of the issue table: the ones of the
+    comment table refer to it, which fails its rename
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        for name in SQLITE_TRIGGER_NAMES:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def install_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [SQLITE_TABLE])
+        if cursor.fetchone() is None:
+            return
+    for statement in SQLITE_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+def count_comments(apps, schema_editor):
+    """
+    The comment_count and last_activity_at of the existing issues, in one
+    UPDATE, maintained on every write of comments from now on
+    """
+    Issue = apps.get_model('soft_desk', 'Issue')
+    Comment = apps.get_model('soft_desk', 'Comment')
+    comments = Comment.objects.filter(issue=OuterRef('pk')).order_by().values('issue')
+    Issue.objects.update(
+        comment_count=Coalesce(Subquery(comments.annotate(count=Count('comment_id'))
+                                        .values('count')), 0),
+        last_activity_at=Greatest(F('time_created'), Coalesce(
+            Subquery(comments.annotate(latest=Max('time_created')).values('latest')),
+            F('time_created'))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_desk', '0009_project_stats'),
+    ]
+
+    operations = [
+        # the SQLite schema editor rebuilds the issue table
+        migrations.RunPython(drop_search_triggers, install_search_triggers),
+        migrations.AddField(
+            model_name='issue',
+            name='comment_count',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'comment_count', 'issue_id'],
+                               name='issue_project_comments_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'last_activity_at', 'issue_id'],
+                               name='issue_project_activity_idx'),
+        ),
+        migrations.RunPython(install_search_triggers, drop_search_triggers),
+    ]
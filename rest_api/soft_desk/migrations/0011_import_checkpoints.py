@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_desk', '0010_issue_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True,
+                                           serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('source', models.CharField(max_length=1024)),
+                ('position', models.BigIntegerField(default=0)),
+                ('counts', models.JSONField(default=dict)),
+                ('errors', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImportRef',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True,
+                                           serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16)),
+                ('ref', models.CharField(max_length=255)),
+                ('object_id', models.BigIntegerField()),
+                ('checkpoint', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='refs',
+                    to='soft_desk.importcheckpoint')),
+            ],
+            options={
+                'unique_together': {('checkpoint', 'kind', 'ref')},
+            },
+        ),
+        # auto_now_add and default=timezone.now give the same column: only the
+        # state changes, and SQLite does not rebuild the tables of the triggers
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='comment',
+                name='time_created',
+                field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+            ),
+            migrations.AlterField(
+                model_name='issue',
+                name='time_created',
+                field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+            ),
+        ]),
+    ]
@@ -1,6 +1,189 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.response import SimpleTemplateResponse
+from django.utils.http import parse_etags
 from rest_framework import mixins
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer
+
+from soft_desk.access import get_access_context
+from soft_desk.encoders import ValuesRowEncoder, can_encode_values, render_page
+from soft_desk.response_cache import get_response_cache, get_response_cache_options
+from soft_desk.timing import get_timing, timed
+
+
+class AccessContextMixin:
+    """
+    Customized class to share the access context resolved by the permission
+    classes with the view, so that the project, the issue and the target
+    object are fetched only once per request.
+    """
+    access_model = None
+
+    def get_access_context(self):
+        return get_access_context(self.request, self)
+
+    def get_object(self):
+        obj = self.get_access_context().obj
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class RenderTimingMixin:
+    """
+    Customized class to measure the rendering of the response, which happens
+    once the view has returned, for the requests measured by soft_desk.timing.
+    """
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        timing = get_timing()
+        if timing is not None and isinstance(response, SimpleTemplateResponse) \
+                and not response.is_rendered:
+            start = time.perf_counter()
+
+            def rendered(response):
+                timing.add('render', time.perf_counter() - start)
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class SparseFieldsetMixin:
+    """
+    Customized class to load, for a list, only the columns of the fields
+    rendered by the serializer (see DynamicFieldsMixin), joining the related
+    objects expanded by the request rather than fetching them row by row.
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list':
+            return queryset
+        serializer = self.get_serializer()
+        if not hasattr(serializer, 'narrow_queryset'):
+            return queryset
+        return serializer.narrow_queryset(queryset)
+
+
+class NotModified(Exception):
+    pass
+
+
+def has_expanded(view):
+    """
+    Does the response nest related objects (?expand=)? Their changes do not
+    bump the versions of the ETags and of the response cache.
+    """
+    return bool(getattr(view.get_serializer(), 'expanded', ()))
+
+
+class ConditionalGetMixin:
+    """
+    Customized class to answer conditional GET requests. The ETag derives from
+    the version counter returned by get_version(), which is read from the
+    access context: an If-None-Match hit is answered 304 Not Modified right
+    after the permission checks, before any queryset is evaluated.
+    """
+    etag = None
+
+    def get_version(self):
+        return None
+
+    def get_etag(self, request):
+        version = self.get_version()
+        if version is None or has_expanded(self):
+            return None
+        key = f'{self.basename}:{self.action}:{request.user.pk}:{request.accepted_media_type}'
+        return f'W/"{version}-{hashlib.md5(key.encode()).hexdigest()[:16]}"'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            self.etag = self.get_etag(request)
+            if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+            if self.etag is not None and if_none_match:
+                etags = parse_etags(if_none_match)
+                if '*' in etags or self.etag in etags:
+                    raise NotModified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': self.etag})
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag is not None and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = self.etag
+        return response
+
+
+class CachedListMixin:
+    """
+    Customized class to serve the list action from the response cache (see
+    soft_desk.response_cache). The cache key holds the version returned by
+    get_version(), and the cache is only read once initial() has run the
+    authentication and the permission checks. The cache is enabled per
+    endpoint, by listing the basename of the viewset in the ENDPOINTS of the
+    SOFT_DESK_RESPONSE_CACHE setting.
+    """
+    def get_response_cache_key(self, request):
+        if self.basename not in get_response_cache_options()['ENDPOINTS'] \
+                or isinstance(request.accepted_renderer, BrowsableAPIRenderer):
+            return None
+        version = self.get_version()
+        if version is None or has_expanded(self):
+            return None
+        ctx = self.get_access_context()
+        issue_id = ctx.issue.pk if ctx.issue is not None else None
+        return get_response_cache().make_key(self.basename, ctx.project.pk, issue_id,
+                                             version, request)
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        response_cache = get_response_cache()
+        entry = response_cache.get(key)
+        if entry is not None:
+            content, content_type = entry
+            return HttpResponse(content, content_type=content_type)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+
+        def store(response):
+            response_cache.set(key, response.content, response['Content-Type'])
+        if isinstance(response, Response):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
+
+
+class BulkCreateModelMixin(mixins.CreateModelMixin):
+    """
+    Customized class to create either one model instance, or all the model
+    instances of a list payload. A list is validated as a whole and inserted
+    in one transaction; when an item is invalid, nothing is created and the
+    response holds one dict of errors per item.
+    """
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        max_items = getattr(settings, 'SOFT_DESK_BULK_CREATE_MAX_ITEMS', 5000)
+        if len(request.data) > max_items:
+            raise ValidationError(f"a list payload holds at most {max_items} items")
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, serializer):
+        serializer.save()
 
 
 class CustomUpdateModelMixin(mixins.UpdateModelMixin):
@@ -20,3 +203,40 @@ class CustomUpdateModelMixin(mixins.UpdateModelMixin):
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class FastListModelMixin(mixins.ListModelMixin):
+    """
+    Customized class to list a queryset from QuerySet.values_list() rows
+    encoded straight to JSON, bypassing the model instances and the fields
+    of the serializer. The response body is byte-identical to the one of
+    ListModelMixin. The fast path is enabled per endpoint, by listing the
+    basename of the viewset in the SOFT_DESK_FAST_LIST_ENDPOINTS setting.
+    """
+    def use_fast_list(self, request):
+        # the nested serializers of the expanded objects are not encoded from values
+        return (self.basename in getattr(settings, 'SOFT_DESK_FAST_LIST_ENDPOINTS', ())
+                and not getattr(self.get_serializer(), 'expanded', ())
+                and can_encode_values(request.accepted_renderer, request.accepted_media_type,
+                                      self.get_renderer_context()))
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list(request):
+            return super().list(request, *args, **kwargs)
+        renderer = request.accepted_renderer
+        encoder = ValuesRowEncoder(self.get_serializer(), ensure_ascii=renderer.ensure_ascii)
+        queryset = self.filter_queryset(self.get_queryset())
+        # the ordering columns are needed by the keyset pagination
+        columns = encoder.columns + [column.lstrip('-') for column in queryset.query.order_by
+                                     if column.lstrip('-') not in encoder.columns]
+        rows = queryset.values_list(*columns, named=True)
+        page = self.paginate_queryset(rows)
+        envelope = None
+        if page is not None:
+            rows = page
+            envelope = self.get_paginated_response([]).data
+        # the rows are encoded and rendered at once
+        with timed('serialization'):
+            content = render_page(renderer, envelope, encoder.encode_rows(rows),
+                                  request.accepted_media_type, self.get_renderer_context())
+        return HttpResponse(content, content_type=renderer.media_type)
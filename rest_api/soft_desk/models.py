@@ -1,11 +1,16 @@
-from django.db import models
+import contextvars
+
+from django.db import models, router, transaction
 
 from django.contrib.auth.models import BaseUserManager
 from django.contrib.auth.models import AbstractBaseUser
 from django.contrib.auth import get_user_model
 
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from soft_desk.membership import get_membership_cache
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password, first_name=None, last_name=None):
@@ -113,18 +118,73 @@ class User(AbstractBaseUser):
         return self.admin
 
     def is_contributor(self, the_project):
-        try:
-            assert(isinstance(the_project, Project))
-            contributor = Contributor.objects.get(user=self, project=the_project)
-        except AssertionError:
-            return False
-        except Contributor.DoesNotExist:
+        """
+        Is the user a contributor of the project? The answer is cached, see
+        soft_desk.membership.
+        """
+        if not isinstance(the_project, Project):
             return False
-        if contributor:
-            return True
+        return get_membership_cache().get_or_load(
+            self.pk, the_project.pk,
+            lambda: Contributor.objects.filter(user=self, project=the_project).exists())
+
+
+# (model, pk) of the instances being deleted with their cascade, in this context
+_deleted_parents = contextvars.ContextVar('soft_desk_deleted_parents', default=frozenset())
+
+
+def mark_deleted(model, pk):
+    _deleted_parents.set(_deleted_parents.get() | {(model, pk)})
+
+
+def is_deleted_parent(model, pk):
+    """
+    Is the instance being deleted, the signals of the rows deleted by its
+    cascade being sent? Their receivers then leave it alone.
+    """
+    return (model, pk) in _deleted_parents.get()
+
+
+class VersionedModelMixin:
+    """
+    The version column, and the other maintained_fields, are only ever
+    changed with F() expressions (see soft_desk.versioning): saving a loaded
+    instance leaves them untouched, so that a stale in-memory value never
+    overwrites a concurrent update. While the instance is deleted, the
+    receivers of the children deleted by its cascade skip the bumps and
+    counters of the parent (see is_deleted_parent).
+    """
+    maintained_fields = ('version',)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key
+                                       and field.name not in self.maintained_fields]
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        token = _deleted_parents.set(_deleted_parents.get())
+        mark_deleted(type(self), self.pk)
+        try:
+            return super().delete(*args, **kwargs)
+        finally:
+            _deleted_parents.reset(token)
+
+
+class ProjectManager(models.Manager):
+    def owned_or_contributed_by(self, user):
+        """
+        Projects of which the user is the author or a contributor.
+        The union of both sets of ids is computed by the database, each side
+        being an index search, instead of materializing the ids in Python.
+        """
+        owned = self.filter(author_user=user).values('project_id')
+        contributed = Contributor.objects.filter(user=user).values('project_id')
+        return self.filter(project_id__in=owned.union(contributed))
 
 
-class Project(models.Model):
+class Project(VersionedModelMixin, models.Model):
     """
     Entity Project
     """
@@ -140,6 +200,10 @@ class Project(models.Model):
 
     type = models.CharField(max_length=1, choices=Type.choices, default=Type.BACK_END)
     author_user = models.ForeignKey(to=get_user_model(), on_delete=models.CASCADE)
+    # bumped on every write to the project, its contributors, issues and comments
+    version = models.BigIntegerField(default=0, editable=False)
+
+    objects = ProjectManager()
 
     def __str__(self):
         return self.title
@@ -171,12 +235,15 @@ class Contributor(models.Model):
         Contrainte d'unicité pour éviter des liens en doublons
         """
         unique_together = ('user', 'project', )
+        indexes = [
+            models.Index(fields=['project', 'user'], name='contributor_project_user_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.project.title}"
 
 
-class Issue(models.Model):
+class Issue(VersionedModelMixin, models.Model):
     """
     Entity Issue
     """
@@ -213,17 +280,66 @@ class Issue(models.Model):
                                     related_name='author_user')
     assignee_user = models.ForeignKey(to=get_user_model(), on_delete=models.CASCADE,
                                       related_name='assignee_user')
-    time_created = models.DateTimeField(auto_now_add=True)
+    # set when the instance is made rather than by auto_now_add, so that the
+    # importer and the seeder may give the past creation times
+    time_created = models.DateTimeField(default=timezone.now, editable=False)
+    # bumped on every write to the issue and its comments
+    version = models.BigIntegerField(default=0, editable=False)
+    # maintained on every write of its comments: the number of comments, and
+    # the time of the creation of the issue or of its last comment
+    comment_count = models.BigIntegerField(default=0, editable=False)
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    maintained_fields = ('version', 'comment_count', 'last_activity_at')
 
     class Meta:
         """
         Contrainte d'unicité pour éviter des anomalies en doublons
         """
         unique_together = ('title', 'project', 'author_user',)
+        # the unfiltered page order, (project, issue_id), comes from the foreign key
+        # index on SQLite and from an index of migration 0004 on PostgreSQL
+        indexes = [
+            # filters of the issue list, the trailing issue_id giving the page order
+            models.Index(fields=['project', 'status', 'issue_id'],
+                         name='issue_project_status_idx'),
+            models.Index(fields=['project', 'assignee_user', 'status', 'issue_id'],
+                         name='issue_project_assignee_idx'),
+            models.Index(fields=['project', 'time_created', 'issue_id'],
+                         name='issue_project_created_idx'),
+            models.Index(fields=['project', 'comment_count', 'issue_id'],
+                         name='issue_project_comments_idx'),
+            models.Index(fields=['project', 'last_activity_at', 'issue_id'],
+                         name='issue_project_activity_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # the counters of the project (see soft_desk.stats) are updated by the
+        # post_save receivers in the transaction of the write
+        using = kwargs.get('using') or router.db_for_write(Issue, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class ProjectStat(models.Model):
+    """
+    Number of issues of a project by value of one of their fields (status,
+    priority or tag), maintained by soft_desk.stats
+    """
+    project = models.ForeignKey(to=Project, on_delete=models.CASCADE, related_name='stats')
+    field = models.CharField(max_length=16)
+    value = models.CharField(max_length=4)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('project', 'field', 'value')
+
+    def __str__(self):
+        return f"{self.project_id} - {self.field} {self.value} : {self.count}"
+
 
 class Comment(models.Model):
     """
@@ -233,7 +349,41 @@ class Comment(models.Model):
     description = models.CharField(max_length=1024)
     author_user = models.ForeignKey(to=get_user_model(), on_delete=models.CASCADE)
     issue = models.ForeignKey(to=Issue, on_delete=models.CASCADE)
-    time_created = models.DateTimeField(auto_now_add=True)
+    # see Issue.time_created
+    time_created = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f"Comment : {self.comment_id} - {self.author_user.email}"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of the import of a file (see soft_desk.importer), saved in the
+    transaction of each chunk: the number of records read, the counts of the
+    created objects by type and the number of rejected records
+    """
+    name = models.CharField(max_length=255, unique=True)
+    source = models.CharField(max_length=1024)
+    position = models.BigIntegerField(default=0)
+    counts = models.JSONField(default=dict)
+    errors = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} : {self.position}"
+
+
+class ImportRef(models.Model):
+    """
+    Id of the project or issue created for a ref of an imported file
+    """
+    checkpoint = models.ForeignKey(to=ImportCheckpoint, on_delete=models.CASCADE,
+                                   related_name='refs')
+    kind = models.CharField(max_length=16)
+    ref = models.CharField(max_length=255)
+    object_id = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ('checkpoint', 'kind', 'ref')
+
+    def __str__(self):
+        return f"{self.kind} {self.ref} : {self.object_id}"
@@ -0,0 +1,20 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+def is_available(component):
+    return getattr(component, 'available', True)
+
+
+class AvailableContentNegotiation(DefaultContentNegotiation):
+    """
+    Content negotiation among the renderers and parsers whose optional
+    dependency is installed: a client asking for an unavailable format gets
+    a 406, or a 415 for its request body, as for an unknown one.
+    """
+    def select_parser(self, request, parsers):
+        return super().select_parser(request, [parser for parser in parsers
+                                               if is_available(parser)])
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return super().select_renderer(request, [renderer for renderer in renderers
+                                                 if is_available(renderer)], format_suffix)
@@ -0,0 +1,63 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination on the ordering of the view queryset.
+    The viewsets order by their primary key, so every page is a range scan
+    on that key: no COUNT(*) and no OFFSET, whatever the depth of the page.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        if queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+        return (queryset.model._meta.pk.attname,)
+
+
+class SoftDeskPagination(PageNumberPagination):
+    """
+    Page number pagination, unless the client opts in keyset pagination
+    with ?pagination=keyset (the next and previous links keep the parameter)
+    """
+    keyset_query_param = 'pagination'
+    keyset_query_value = 'keyset'
+    keyset_class = KeysetPagination
+
+    keyset = None
+
+    def use_keyset(self, request):
+        return request.query_params.get(self.keyset_query_param) == self.keyset_query_value
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            page = self.keyset.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.keyset.display_page_controls
+            return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.keyset is not None:
+            return self.keyset.get_html_context()
+        return super().get_html_context()
+
+    def to_html(self):
+        if self.keyset is not None:
+            return self.keyset.to_html()
+        return super().to_html()
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Pages of ranked search results
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,18 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from soft_desk.renderers import MessagePackRenderer, msgpack
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parser of MessagePack request bodies, available when msgpack is installed
+    """
+    media_type = MessagePackRenderer.media_type
+    available = MessagePackRenderer.available
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (TypeError, ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
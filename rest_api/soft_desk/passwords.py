@@ -0,0 +1,110 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.exceptions import Throttled
+
+DEFAULTS = {
+    # PBKDF2 iterations of the new hashes; the older hashes are upgraded at login
+    'ITERATIONS': hashers.PBKDF2PasswordHasher.iterations,
+    # processes hashing and verifying the passwords (0: in the request thread)
+    'WORKERS': 2,
+    # hashings waiting for a worker, beyond which the requests are throttled
+    'MAX_PENDING': 64,
+}
+
+
+def get_password_options():
+    return {**DEFAULTS, **getattr(settings, 'SOFT_DESK_PASSWORDS', {})}
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher whose cost is the ITERATIONS of the SOFT_DESK_PASSWORDS setting
+    """
+    @property
+    def iterations(self):
+        return get_password_options()['ITERATIONS']
+
+
+class PasswordPool:
+    """
+    Bounded pool of processes running the password hashers, so that their
+    CPU time is not taken from the threads serving the API. When all the
+    workers are busy and MAX_PENDING hashings are already waiting, the
+    request is throttled instead of queued.
+    """
+    def __init__(self, workers, max_pending):
+        self.executor = None
+        if workers:
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+        self.slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def run(self, function, *args):
+        if self.executor is None:
+            return function(*args)
+        if not self.slots.acquire(blocking=False):
+            raise Throttled(detail="too many password checks in progress, retry later")
+        try:
+            return self.executor.submit(function, *args).result()
+        finally:
+            self.slots.release()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+_password_pool = None
+_password_pool_lock = threading.Lock()
+
+
+def get_password_pool():
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is None:
+            options = get_password_options()
+            _password_pool = PasswordPool(workers=options['WORKERS'],
+                                          max_pending=options['MAX_PENDING'])
+        return _password_pool
+
+
+@receiver(setting_changed)
+def reset_password_pool(setting, **kwargs):
+    global _password_pool
+    if setting in ('SOFT_DESK_PASSWORDS', 'PASSWORD_HASHERS'):
+        with _password_pool_lock:
+            if _password_pool is not None:
+                _password_pool.shutdown()
+            _password_pool = None
+
+
+def hash_password(raw_password):
+    return get_password_pool().run(hashers.make_password, raw_password)
+
+
+def verify_password(user, raw_password):
+    """
+    Check the password of the user, and upgrade its hash when the preferred
+    hasher or its cost have changed since it was computed
+    """
+    if not get_password_pool().run(hashers.check_password, raw_password, user.password):
+        return False
+    hasher = hashers.identify_hasher(user.password)
+    if hasher.algorithm != hashers.get_hasher().algorithm or hasher.must_update(user.password):
+        user.password = hash_password(raw_password)
+        user.save(update_fields=['password'])
+    return True
+
+
+def reject_password(raw_password):
+    """
+    Spend the time of a password check when no user matches, as the
+    ModelBackend of Django does, so that the response time does not tell
+    whether the email is registered
+    """
+    hash_password(raw_password)
@@ -1,9 +1,10 @@
-from django.shortcuts import get_object_or_404
 from rest_framework import permissions
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import exceptions
 
+from soft_desk.access import get_access_context
 from soft_desk.models import Contributor, Comment, Issue, Project
+from soft_desk.timing import timed
 
 
 class IsAuthenticatedOwnerOrContributor(permissions.BasePermission):
@@ -12,42 +13,20 @@ class IsAuthenticatedOwnerOrContributor(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        from soft_desk.views import CommentViewSet, IssueViewSet, ProjectViewSet
-        user_is_authenticated = bool(request.user and request.user.is_authenticated)
-        if isinstance(view, ProjectViewSet):
-            the_project = get_object_or_404(Project, pk=view.kwargs['pk'])
+        context = get_access_context(request, view)
+        if isinstance(context.obj, (Issue, Comment)):
+            the_object = context.obj
         else:
-            the_project = get_object_or_404(Project, pk=view.kwargs['project_pk'])
-        user_is_contributor = request.user.is_contributor(the_project)
-        the_object = the_project
-        if isinstance(view, IssueViewSet):
-            if 'pk' in view.kwargs:
-                the_object = get_object_or_404(Issue, pk=view.kwargs['pk'])
-            else:
-                the_object = the_project
-        elif isinstance(view, CommentViewSet):
-            if 'pk' in view.kwargs:
-                the_object = get_object_or_404(Comment, pk=view.kwargs['pk'])
-            else:
-                the_object = the_project
-        user_is_owner = bool(the_object.author_user == request.user)
-        return bool(user_is_authenticated and (user_is_contributor or user_is_owner))
+            the_object = context.project
+        user_is_contributor = context.is_contributor_of(context.project)
+        user_is_owner = context.is_owner_of(the_object)
+        return bool(context.user_is_authenticated and (user_is_contributor or user_is_owner))
 
     def has_object_permission(self, request, view, obj):
-        user_is_authenticated = bool(request.user and request.user.is_authenticated)
-        if isinstance(obj, Contributor) or isinstance(obj, Issue):
-            the_project = obj.project
-        elif isinstance(obj, Comment):
-            the_project = obj.issue.project
-        else:
-            the_project = obj
-        user_is_contributor = request.user.is_contributor(the_project)
-        if isinstance(obj, Contributor):
-            the_object = the_project
-        else:
-            the_object = obj
-        user_is_owner = bool(the_object.author_user == request.user)
-        return bool(user_is_authenticated and (user_is_contributor or user_is_owner))
+        context = get_access_context(request, view)
+        user_is_contributor = context.is_contributor_of(obj)
+        user_is_owner = context.is_owner_of(obj)
+        return bool(context.user_is_authenticated and (user_is_contributor or user_is_owner))
 
 
 class IsAuthenticatedOwner(permissions.BasePermission):
@@ -56,24 +35,14 @@ class IsAuthenticatedOwner(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        from soft_desk.views import ProjectViewSet
-        user_is_authenticated = bool(request.user and request.user.is_authenticated)
-        if isinstance(view, ProjectViewSet):
-            the_project = get_object_or_404(Project, pk=view.kwargs['pk'])
-        else:
-            the_project = get_object_or_404(Project, pk=view.kwargs['project_pk'])
-        the_object = the_project
-        user_is_owner = bool(the_object.author_user == request.user)
-        return bool(user_is_authenticated and user_is_owner)
+        context = get_access_context(request, view)
+        user_is_owner = context.is_owner_of(context.project)
+        return bool(context.user_is_authenticated and user_is_owner)
 
     def has_object_permission(self, request, view, obj):
-        user_is_authenticated = bool(request.user and request.user.is_authenticated)
-        if isinstance(obj, Contributor):
-            the_object = obj.project
-        else:
-            the_object = obj
-        user_is_owner = bool(the_object.author_user == request.user)
-        return bool(user_is_authenticated and user_is_owner)
+        context = get_access_context(request, view)
+        user_is_owner = context.is_owner_of(obj)
+        return bool(context.user_is_authenticated and user_is_owner)
 
 
 class GenericModelPermission(permissions.BasePermission):
@@ -83,6 +52,7 @@ class GenericModelPermission(permissions.BasePermission):
     else if the view.action is in permissions_view_map it returns the matching
     view level permissions
     else it raises a MethodNotAllowed exception
+    the checks are measured for soft_desk.timing
     """
     def __init__(self, model):
         super()
@@ -91,29 +61,31 @@ class GenericModelPermission(permissions.BasePermission):
         self.permissions_object_map = {}
 
     def has_permission(self, request, view):
-        if 'pk' in view.kwargs:
-            obj = view.get_object()
-            return self.has_object_permission(request, view, obj)
-        elif view.action in self.permissions_view_map:
-            perms = {f().has_permission(request, view) for f
-                     in self.permissions_view_map[view.action]}
-            if False in perms:
-                return False
+        with timed('permission'):
+            if 'pk' in view.kwargs:
+                obj = view.get_object()
+                return self.has_object_permission(request, view, obj)
+            elif view.action in self.permissions_view_map:
+                perms = {f().has_permission(request, view) for f
+                         in self.permissions_view_map[view.action]}
+                if False in perms:
+                    return False
+                else:
+                    return True
             else:
-                return True
-        else:
-            raise exceptions.MethodNotAllowed(request.method)
+                raise exceptions.MethodNotAllowed(request.method)
 
     def has_object_permission(self, request, view, obj):
-        if view.action in self.permissions_object_map:
-            perms = {f().has_object_permission(request, view, obj) for f
-                     in self.permissions_object_map[view.action]}
-            if False in perms:
-                return False
+        with timed('permission'):
+            if view.action in self.permissions_object_map:
+                perms = {f().has_object_permission(request, view, obj) for f
+                         in self.permissions_object_map[view.action]}
+                if False in perms:
+                    return False
+                else:
+                    return True
             else:
-                return True
-        else:
-            raise exceptions.MethodNotAllowed(request.method)
+                raise exceptions.MethodNotAllowed(request.method)
 
 
 class ProjectPermission(GenericModelPermission):
@@ -125,6 +97,7 @@ class ProjectPermission(GenericModelPermission):
         self.permissions_view_map['list'] = (IsAuthenticated,)
         self.permissions_view_map['create'] = (IsAuthenticated,)
         self.permissions_object_map['retrieve'] = (IsAuthenticatedOwnerOrContributor,)
+        self.permissions_object_map['stats'] = (IsAuthenticatedOwnerOrContributor,)
         self.permissions_object_map['update'] = (IsAuthenticatedOwner,)
         self.permissions_object_map['destroy'] = (IsAuthenticatedOwner,)
 
@@ -163,3 +136,21 @@ class CommentPermission(GenericModelPermission):
         self.permissions_object_map['retrieve'] = (IsAuthenticatedOwnerOrContributor,)
         self.permissions_object_map['update'] = (IsAuthenticatedOwner,)
         self.permissions_object_map['destroy'] = (IsAuthenticatedOwner,)
+
+
+class SearchPermission(GenericModelPermission):
+    """
+    class SearchPermission based on GenericModelPermission
+    """
+    def __init__(self):
+        super().__init__(model=Project)
+        self.permissions_view_map['list'] = (IsAuthenticatedOwnerOrContributor,)
+
+
+class ExportPermission(GenericModelPermission):
+    """
+    class ExportPermission based on GenericModelPermission
+    """
+    def __init__(self):
+        super().__init__(model=Project)
+        self.permissions_view_map['list'] = (IsAuthenticatedOwnerOrContributor,)
@@ -0,0 +1,54 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson when it is installed, with the output of
+    JSONRenderer: compact separators, the types orjson does not know, datetimes
+    included, converted by the JSONEncoder of DRF, U+2028 and U+2029 escaped.
+    The stdlib encoder of JSONRenderer is used when orjson is missing, and for
+    the output orjson can not produce: indented, ASCII-only, or with integers
+    out of the 64-bit range or keys other than strings.
+    """
+    accelerator = 'orjson' if orjson is not None else None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact \
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default,
+                               option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # escaped by JSONRenderer, for the output to be valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renderer of MessagePack, available when msgpack is installed. The values
+    msgpack does not know, datetimes included, are converted by the
+    JSONEncoder of DRF, as for JSON.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    available = msgpack is not None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=True)
@@ -0,0 +1,136 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from soft_desk.caching import LRUCache
+
+DEFAULTS = {
+    # basenames of the viewsets whose list action is cached
+    # ('contributors', 'issues', 'comments')
+    'ENDPOINTS': (),
+    # size of the process-local tier
+    'MAX_ENTRIES': 1000,
+    # memory budget of the process-local tier, in bytes of rendered content
+    'MAX_BYTES': 64 * 1024 * 1024,
+    # lifetime of an entry, in seconds, in both tiers
+    'TIMEOUT': 300,
+    # alias of a Django cache shared between processes (None disables the tier)
+    'CACHE_ALIAS': None,
+}
+
+
+def entry_size(entry):
+    content, content_type = entry
+    return len(content)
+
+
+class ResponseCache:
+    """
+    Cache of rendered list responses, as (content, content type) entries.
+    The key holds the version of the project (or of the issue, for the
+    comments), so a write makes the previous entries unreachable in every
+    process; the signals (see soft_desk.signals) evict them from the local
+    tier right away, and they expire from the shared tier after TIMEOUT.
+    """
+    key_prefix = 'soft_desk:response'
+
+    def __init__(self, max_entries, max_bytes, timeout, cache_alias=None):
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self.local = LRUCache(max_entries=max_entries, timeout=timeout,
+                              max_size=max_bytes, get_size=entry_size)
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    @property
+    def hits(self):
+        return self.local.hits + self.shared_hits
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'local_hits': self.local.hits,
+            'shared_hits': self.shared_hits,
+            'size': len(self.local),
+            'bytes': self.local.size,
+        }
+
+    def make_key(self, basename, project_id, issue_id, version, request):
+        """
+        Key of the response of the request, which is rendered for its
+        absolute URL (pagination links) and negotiated media type
+        """
+        variant = f'{request.build_absolute_uri()}|{request.accepted_media_type}'
+        digest = hashlib.md5(variant.encode()).hexdigest()
+        return (basename, project_id, issue_id, version, digest)
+
+    def _shared_key(self, key):
+        return ':'.join([self.key_prefix] + [str(part) for part in key])
+
+    def get(self, key):
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+        shared = self.shared
+        if shared is not None:
+            entry = shared.get(self._shared_key(key))
+            if entry is not None:
+                self.shared_hits += 1
+                self.local.set(key, entry)
+                return entry
+        self.misses += 1
+        return None
+
+    def set(self, key, content, content_type):
+        entry = (bytes(content), content_type)
+        self.local.set(key, entry)
+        shared = self.shared
+        if shared is not None:
+            shared.set(self._shared_key(key), entry, self.timeout)
+
+    def invalidate(self, project_id=None, issue_id=None):
+        """
+        Evict the local entries of the project, or of the issue
+        """
+        if project_id is not None:
+            self.local.delete_where(lambda key: key[1] == project_id)
+        if issue_id is not None:
+            self.local.delete_where(lambda key: key[2] == issue_id)
+
+    def clear(self):
+        self.local.clear()
+        self.shared_hits = 0
+        self.misses = 0
+
+
+_response_cache = None
+
+
+def get_response_cache_options():
+    return {**DEFAULTS, **getattr(settings, 'SOFT_DESK_RESPONSE_CACHE', {})}
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        options = get_response_cache_options()
+        _response_cache = ResponseCache(max_entries=options['MAX_ENTRIES'],
+                                        max_bytes=options['MAX_BYTES'],
+                                        timeout=options['TIMEOUT'],
+                                        cache_alias=options['CACHE_ALIAS'])
+    return _response_cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    global _response_cache
+    if setting in ('SOFT_DESK_RESPONSE_CACHE', 'CACHES'):
+        _response_cache = None
@@ -0,0 +1,110 @@
+import contextvars
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+
+DEFAULTS = {
+    # aliases of the databases replicating DEFAULT_DB_ALIAS
+    'ALIASES': [],
+    # seconds during which the reads of a client go to the primary after its write
+    'STICKY_SECONDS': 5,
+    # alias of the Django cache remembering the clients which wrote recently,
+    # required with replicas: it must be shared between the processes for a
+    # client to read its own writes whichever process serves its next request
+    'CACHE_ALIAS': None,
+}
+
+# backends keeping their entries in the memory of each process
+LOCAL_CACHE_BACKENDS = (LocMemCache, DummyCache)
+
+# database of the reads of the current request, None for the default routing
+_read_database = contextvars.ContextVar('soft_desk_read_database', default=None)
+
+
+def get_replica_options():
+    return {**DEFAULTS, **getattr(settings, 'SOFT_DESK_READ_REPLICAS', {})}
+
+
+def get_read_database():
+    return _read_database.get()
+
+
+def set_read_database(alias):
+    return _read_database.set(alias)
+
+
+def reset_read_database(token):
+    _read_database.reset(token)
+
+
+def check_sticky_cache():
+    """
+    Raise ImproperlyConfigured unless the replicas come with a cache shared
+    between the processes for the stickiness
+    """
+    options = get_replica_options()
+    if not options['ALIASES']:
+        return
+    alias = options['CACHE_ALIAS']
+    if alias is None:
+        raise ImproperlyConfigured(
+            "SOFT_DESK_READ_REPLICAS needs the CACHE_ALIAS of a cache shared between "
+            "the processes")
+    if isinstance(caches[alias], LOCAL_CACHE_BACKENDS):
+        raise ImproperlyConfigured(
+            f"the {alias} cache of SOFT_DESK_READ_REPLICAS is local to each process")
+
+
+def choose_replica():
+    aliases = get_replica_options()['ALIASES']
+    return random.choice(aliases) if aliases else None
+
+
+def client_key(request):
+    """
+    Key of the client of the request, from its credentials, since the
+    routing is decided before the authentication of the request
+    """
+    credentials = request.META.get('HTTP_AUTHORIZATION') \
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return 'soft_desk:sticky:' + hashlib.sha256(credentials.encode()).hexdigest()
+
+
+def mark_sticky(request):
+    options = get_replica_options()
+    key = client_key(request)
+    if key is not None and options['ALIASES'] and options['STICKY_SECONDS']:
+        caches[options['CACHE_ALIAS']].set(key, True, options['STICKY_SECONDS'])
+
+
+def is_sticky(request):
+    key = client_key(request)
+    return key is not None and \
+        caches[get_replica_options()['CACHE_ALIAS']].get(key, False)
+
+
+class ReadReplicaRouter:
+    """
+    Send the reads of the requests chosen by ReadReplicaMiddleware to a
+    replica, and every write to the primary, even for the instances loaded
+    from a replica
+    """
+    def db_for_read(self, model, **hints):
+        return get_read_database()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replica_options()['ALIASES']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,218 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from soft_desk.models import Comment, Issue
+
+# words of the query, a trailing * asking for a prefix match
+WORD = re.compile(r'\w+\*?')
+MAX_TERMS = 16
+
+# SQLite: FTS5 table indexing the issues at rowid issue_id * 2 and the comments at
+# rowid comment_id * 2 + 1, with the project in the scope column, as "p<project_id>"
+SQLITE_TABLE = 'soft_desk_search'
+SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE}
+        USING fts5(scope, title, body, tokenize = 'unicode61 remove_diacritics 2')""",
+]
+SQLITE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_issue_search_insert
+        AFTER INSERT ON soft_desk_issue BEGIN
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            VALUES (new.issue_id * 2, 'p' || new.project_id, new.title, new."desc");
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_issue_search_update
+        AFTER UPDATE OF title, "desc", project_id ON soft_desk_issue BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.issue_id * 2;
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            VALUES (new.issue_id * 2, 'p' || new.project_id, new.title, new."desc");
+            UPDATE {SQLITE_TABLE} SET scope = 'p' || new.project_id
+            WHERE new.project_id <> old.project_id AND rowid IN (
+                SELECT comment_id * 2 + 1 FROM soft_desk_comment
+                WHERE issue_id = new.issue_id);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_issue_search_delete
+        AFTER DELETE ON soft_desk_issue BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.issue_id * 2;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_comment_search_insert
+        AFTER INSERT ON soft_desk_comment BEGIN
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            SELECT new.comment_id * 2 + 1, 'p' || project_id, '', new.description
+            FROM soft_desk_issue WHERE issue_id = new.issue_id;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_comment_search_update
+        AFTER UPDATE OF description ON soft_desk_comment BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.comment_id * 2 + 1;
+            INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+            SELECT new.comment_id * 2 + 1, 'p' || project_id, '', new.description
+            FROM soft_desk_issue WHERE issue_id = new.issue_id;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS soft_desk_comment_search_delete
+        AFTER DELETE ON soft_desk_comment BEGIN
+            DELETE FROM {SQLITE_TABLE} WHERE rowid = old.comment_id * 2 + 1;
+        END""",
+]
+SQLITE_TRIGGER_NAMES = [f'soft_desk_{table}_search_{event}'
+                        for table in ('issue', 'comment')
+                        for event in ('insert', 'update', 'delete')]
+SQLITE_BACKFILL = [
+    f"""INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+        SELECT issue_id * 2, 'p' || project_id, title, "desc" FROM soft_desk_issue""",
+    f"""INSERT INTO {SQLITE_TABLE} (rowid, scope, title, body)
+        SELECT c.comment_id * 2 + 1, 'p' || i.project_id, '', c.description
+        FROM soft_desk_comment c JOIN soft_desk_issue i ON i.issue_id = c.issue_id""",
+]
+
+# PostgreSQL: generated tsvector columns, kept up to date by the database, with GIN indexes
+POSTGRESQL_SCHEMA = [
+    """ALTER TABLE soft_desk_issue ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+           setweight(to_tsvector('simple', title), 'A')
+           || setweight(to_tsvector('simple', "desc"), 'B')) STORED""",
+    "CREATE INDEX soft_desk_issue_search_idx ON soft_desk_issue USING GIN (search_vector)",
+    """ALTER TABLE soft_desk_comment ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+           setweight(to_tsvector('simple', description), 'B')) STORED""",
+    "CREATE INDEX soft_desk_comment_search_idx ON soft_desk_comment USING GIN (search_vector)",
+]
+
+
+def install_sqlite_triggers(connection):
+    """
+    (Re)create the triggers maintaining the FTS5 table: rebuilding a table, as
+    the SQLite schema editor does on most ALTER TABLE, drops its triggers
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [SQLITE_TABLE])
+        if cursor.fetchone() is None:
+            return
+        for statement in SQLITE_TRIGGERS:
+            cursor.execute(statement)
+
+
+def drop_sqlite_triggers(connection):
+    """
+    Drop the triggers before a rebuild of the issue table: the ones of the
+    comment table refer to it, which fails its rename
+    """
+    with connection.cursor() as cursor:
+        for name in SQLITE_TRIGGER_NAMES:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def parse_terms(query):
+    return WORD.findall(query or '')[:MAX_TERMS]
+
+
+class SqliteSearch:
+    def __init__(self, connection, project_id, terms):
+        self.connection = connection
+        phrases = ' '.join(f'"{term[:-1]}"*' if term.endswith('*') else f'"{term}"'
+                           for term in terms)
+        self.match = f'scope : "p{int(project_id)}" AND {{title body}} : ({phrases})'
+
+    def count(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s",
+                           [self.match])
+            return cursor.fetchone()[0]
+
+    def hits(self, limit, offset):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT rowid, -bm25({SQLITE_TABLE}, 0.0, 10.0, 1.0) AS rank
+                    FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s
+                    ORDER BY rank DESC, rowid LIMIT %s OFFSET %s""",
+                [self.match, limit, offset])
+            return [('comment' if rowid % 2 else 'issue', rowid // 2, rank)
+                    for rowid, rank in cursor.fetchall()]
+
+
+class PostgresqlSearch:
+    hits_sql = """
+        SELECT kind, pk, rank FROM (
+            SELECT 'issue' AS kind, i.issue_id AS pk, ts_rank(i.search_vector, q.query) AS rank
+            FROM soft_desk_issue i, q
+            WHERE i.project_id = %s AND i.search_vector @@ q.query
+            UNION ALL
+            SELECT 'comment', c.comment_id, ts_rank(c.search_vector, q.query)
+            FROM soft_desk_comment c JOIN soft_desk_issue i ON i.issue_id = c.issue_id, q
+            WHERE i.project_id = %s AND c.search_vector @@ q.query
+        ) hits"""
+
+    def __init__(self, connection, project_id, terms):
+        self.connection = connection
+        self.project_id = project_id
+        self.query = ' & '.join(f'{term[:-1]}:*' if term.endswith('*') else term
+                                for term in terms)
+
+    def execute(self, cursor, sql, params=()):
+        cursor.execute("WITH q AS (SELECT to_tsquery('simple', %s) AS query) " + sql,
+                       [self.query, self.project_id, self.project_id, *params])
+
+    def count(self):
+        with self.connection.cursor() as cursor:
+            self.execute(cursor, f"SELECT count(*) FROM ({self.hits_sql}) counted")
+            return cursor.fetchone()[0]
+
+    def hits(self, limit, offset):
+        with self.connection.cursor() as cursor:
+            self.execute(cursor, self.hits_sql + " ORDER BY rank DESC, kind DESC, pk "
+                                                 "LIMIT %s OFFSET %s", [limit, offset])
+            return cursor.fetchall()
+
+
+class ContainsSearch:
+    """
+    Unranked search of the other databases, with case-insensitive substring
+    filters: the issues, by id, then the comments, by id, containing every term
+    """
+    def __init__(self, connection, project_id, terms):
+        words = [term.rstrip('*') for term in terms]
+        issues = Issue.objects.using(connection.alias).filter(project=project_id)
+        comments = Comment.objects.using(connection.alias).filter(issue__project=project_id)
+        for word in words:
+            issues = issues.filter(Q(title__icontains=word) | Q(desc__icontains=word))
+            comments = comments.filter(description__icontains=word)
+        self.issues = issues.order_by('issue_id').values_list('issue_id', flat=True)
+        self.comments = comments.order_by('comment_id').values_list('comment_id', flat=True)
+
+    def count(self):
+        return self.issues.count() + self.comments.count()
+
+    def hits(self, limit, offset):
+        hits = [('issue', pk, 0.0) for pk in self.issues[offset:offset + limit]]
+        if len(hits) < limit:
+            offset = max(offset - self.issues.count(), 0)
+            hits += [('comment', pk, 0.0)
+                     for pk in self.comments[offset:offset + limit - len(hits)]]
+        return hits
+
+
+BACKENDS = {
+    'sqlite': SqliteSearch,
+    'postgresql': PostgresqlSearch,
+}
+
+
+class SearchResults:
+    """
+    Ranked (kind, pk, rank) hits of the terms in the issues and the comments
+    of the project. The index is only queried when the paginator counts or
+    slices the results.
+    """
+    def __init__(self, project_id, terms):
+        connection = connections[router.db_for_read(Issue)]
+        backend = BACKENDS.get(connection.vendor, ContainsSearch)
+        self.search = backend(connection, project_id, terms) if terms else None
+
+    def count(self):
+        return self.search.count() if self.search is not None else 0
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, page):
+        if self.search is None:
+            return []
+        return self.search.hits(page.stop - page.start, page.start)
@@ -0,0 +1,218 @@
+import datetime
+import itertools
+import random
+import uuid
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from soft_desk.models import Comment, Contributor, Issue, Project, ProjectStat, User
+from soft_desk.signals import bulk_create_with_pks, post_bulk_create
+from soft_desk.stats import STAT_FIELDS, empty_counters
+
+WORDS = "le serveur plante au démarrage quand la base est vide erreur écran noir " \
+        "after login the page stays blank request timeout crash null pointer".split()
+
+# password of all the seeded users, hashed once
+SEED_PASSWORD = 'N3wpolo6'
+
+# share of each choice among the seeded issues
+STATUS_WEIGHTS = {'NEW': 30, 'INP': 20, 'COM': 25, 'REJ': 5, 'CLO': 20}
+PRIORITY_WEIGHTS = {'L': 20, 'N': 50, 'H': 20, 'U': 8, 'I': 2}
+TAG_WEIGHTS = {'BF': 50, 'NF': 30, 'TA': 20}
+
+
+def text(length, rng=random):
+    # a word and its space take at least 3 characters
+    return ' '.join(rng.choices(WORDS, k=length // 3 + 1))[:length]
+
+
+def zipf_weights(count, skew, rng):
+    """
+    Cumulative weights of count items, the item of rank r weighing 1 / r ** skew,
+    the ranks being shuffled: a few items get most of the draws
+    """
+    weights = [1 / rank ** skew for rank in range(1, count + 1)]
+    rng.shuffle(weights)
+    return list(itertools.accumulate(weights))
+
+
+def shares(total, parts):
+    """
+    Split the total into the given number of parts, as evenly as possible
+    """
+    return [total * (i + 1) // parts - total * i // parts for i in range(parts)]
+
+
+def seed_benchmark_project(name, issues=0, comments=0, batch_size=5000):
+    """
+    A user, contributor of its own project, with the issues of the project and
+    the comments of its first issue, for a benchmark. The rows are inserted
+    with post_bulk_create, which keeps the versions and counters read by the
+    endpoints. The email is unique to the run: a run which crashed before its
+    cleanup does not block the next ones. Return the user, the project and the
+    first issue.
+    """
+    with transaction.atomic():
+        the_user = User.objects.create(
+            email=f'benchmark.{name}.{uuid.uuid4().hex[:12]}@example.com')
+        the_project = Project.objects.create(title='benchmark', author_user=the_user)
+        Contributor.objects.create(user=the_user, project=the_project)
+        objs = [Issue(title=f'Issue {i}', project=the_project, author_user=the_user,
+                      assignee_user=the_user) for i in range(issues)]
+        bulk_create_with_pks(Issue, objs, batch_size)
+        post_bulk_create.send(sender=Issue, instances=objs)
+        the_issue = objs[0] if objs else None
+        if the_issue is not None and comments:
+            objs = [Comment(description=f'Comment {i}', issue=the_issue, author_user=the_user)
+                    for i in range(comments)]
+            Comment.objects.bulk_create(objs, batch_size=batch_size)
+            post_bulk_create.send(sender=Comment, instances=objs)
+    return the_user, the_project, the_issue
+
+
+class Seeder:
+    """
+    Generate a dataset of users, projects, contributors, issues and comments
+    with a skewed distribution: the authors of the projects, and the projects
+    of the issues, are drawn from a Zipf law of exponent skew, and so are the
+    issues of the comments within each batch. The same seed gives the same
+    dataset. The rows are inserted by bulk_create, one transaction per batch,
+    without the signals: the maintained fields and counters (comment_count,
+    last_activity_at, ProjectStat) are computed by the seeder instead.
+    """
+    def __init__(self, users, projects, issues, comments, skew=1.1, seed=0, days=365,
+                 batch_size=5000, max_contributors=50):
+        self.counts = {'users': users, 'projects': projects, 'issues': issues,
+                       'comments': comments}
+        self.skew = skew
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.max_contributors = max_contributors
+        self.now = timezone.now()
+        self.start = self.now - datetime.timedelta(days=days)
+        self.stats = Counter()
+
+    def email(self, number):
+        return f'seed{self.seed}.user{number}@example.com'
+
+    def exists(self):
+        return User.objects.filter(email=self.email(0)).exists()
+
+    def time_between(self, start, end):
+        return start + (end - start) * self.rng.random()
+
+    def batches(self, total):
+        return shares(total, max(1, -(-total // self.batch_size)))
+
+    def seed_users(self):
+        password = make_password(SEED_PASSWORD)
+        user_ids = []
+        number = 0
+        for size in self.batches(self.counts['users']):
+            users = [User(email=self.email(number + i), first_name='Seed',
+                          last_name=f'User {number + i}', password=password)
+                     for i in range(size)]
+            with transaction.atomic():
+                bulk_create_with_pks(User, users, self.batch_size)
+            user_ids += [user.pk for user in users]
+            number += size
+        return user_ids
+
+    def seed_projects(self, user_ids):
+        """
+        Return the members, author first, of each project
+        """
+        rng = self.rng
+        authors = zipf_weights(len(user_ids), self.skew, rng)
+        members = {}
+        for size in self.batches(self.counts['projects']):
+            projects = [Project(title=text(rng.randint(10, 60), rng),
+                                description=text(rng.randint(0, 300), rng),
+                                type=rng.choice(Project.Type.values),
+                                author_user_id=rng.choices(user_ids, cum_weights=authors)[0])
+                        for _ in range(size)]
+            with transaction.atomic():
+                contributors = []
+                for project in bulk_create_with_pks(Project, projects, self.batch_size):
+                    count = min(int(rng.paretovariate(1.2)), self.max_contributors,
+                                len(user_ids) - 1)
+                    others = [user_id for user_id in rng.sample(user_ids, count + 1)
+                              if user_id != project.author_user_id][:count]
+                    members[project.pk] = [project.author_user_id] + others
+                    contributors += [Contributor(project=project, user_id=user_id,
+                                                 role=rng.choice(Contributor.Role.values))
+                                     for user_id in others]
+                Contributor.objects.bulk_create(contributors, batch_size=self.batch_size)
+        return members
+
+    def build_issue(self, number, project_id, members):
+        rng = self.rng
+        issue = Issue(title=f'Issue {number} {text(rng.randint(10, 100), rng)}'[:128],
+                      desc=text(rng.randint(0, 1000), rng), project_id=project_id,
+                      status=rng.choices(*zip(*STATUS_WEIGHTS.items()))[0],
+                      priority=rng.choices(*zip(*PRIORITY_WEIGHTS.items()))[0],
+                      tag=rng.choices(*zip(*TAG_WEIGHTS.items()))[0],
+                      author_user_id=rng.choice(members), assignee_user_id=rng.choice(members),
+                      time_created=self.time_between(self.start, self.now))
+        issue.last_activity_at = issue.time_created
+        for field in STAT_FIELDS:
+            self.stats[(project_id, field, getattr(issue, field))] += 1
+        return issue
+
+    def seed_issues(self, members):
+        """
+        Insert the issues, batch by batch, each batch followed by its comments
+        """
+        rng = self.rng
+        project_ids = list(members)
+        projects = zipf_weights(len(project_ids), self.skew, rng)
+        batches = self.batches(self.counts['issues'])
+        comment_batches = shares(self.counts['comments'], len(batches))
+        number = 0
+        for size, comment_count in zip(batches, comment_batches):
+            issues = [self.build_issue(number + i, project_id, members[project_id])
+                      for i, project_id in enumerate(
+                          rng.choices(project_ids, cum_weights=projects, k=size))]
+            number += size
+            comments = Counter(rng.choices(range(size), k=comment_count,
+                                           cum_weights=zipf_weights(size, self.skew, rng)))
+            times = {}
+            for index, count in comments.items():
+                issue = issues[index]
+                times[index] = sorted(self.time_between(issue.time_created, self.now)
+                                      for _ in range(count))
+                issue.comment_count = count
+                issue.last_activity_at = times[index][-1]
+            with transaction.atomic():
+                bulk_create_with_pks(Issue, issues, self.batch_size)
+                comments = [Comment(description=text(rng.randint(10, 500), rng),
+                                    issue_id=issues[index].pk, time_created=time,
+                                    author_user_id=rng.choice(members[issues[index].project_id]))
+                            for index, issue_times in times.items() for time in issue_times]
+                Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+            yield size, comment_count
+
+    def seed_stats(self, project_ids):
+        counters = {(stat.project_id, stat.field, stat.value): stat
+                    for stat in empty_counters(project_ids)}
+        for key, count in self.stats.items():
+            counters[key].count = count
+        with transaction.atomic():
+            ProjectStat.objects.bulk_create(counters.values(), batch_size=self.batch_size)
+
+    def run(self):
+        """
+        Seed the dataset, yielding the (kind, count) of each inserted batch
+        """
+        user_ids = self.seed_users()
+        yield 'users', len(user_ids)
+        members = self.seed_projects(user_ids)
+        yield 'projects', len(members)
+        for issues, comments in self.seed_issues(members):
+            yield 'issues', issues
+            yield 'comments', comments
+        self.seed_stats(list(members))
@@ -1,18 +1,122 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, models, transaction
+from django.utils.functional import cached_property
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from soft_desk.passwords import hash_password
+from soft_desk.signals import bulk_create_with_pks, post_bulk_create
 from soft_desk.models import Comment
 from soft_desk.models import Contributor
 from soft_desk.models import Issue
 from soft_desk.models import Project
 from soft_desk.models import User
+from soft_desk.timing import timed
 
 
-class UserSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """
+    Serializer mixin rendering, for a GET request, only the fields listed by
+    ?fields= or all but the ones listed by ?omit=, and nesting the related
+    objects listed by ?expand= among expandable_fields next to their id.
+    Only the serializer of the view is narrowed, not the nested ones. The
+    serialization and validation are measured for soft_desk.timing.
+    """
+    expandable_fields = {}
+
+    @cached_property
+    def requested(self):
+        """
+        The (fields, omit, expand) lists of the request, fields being None when not given
+        """
+        request = self.context.get('request')
+        is_root = self.parent is None or (isinstance(self.parent, serializers.ListSerializer)
+                                          and self.parent.parent is None)
+        if request is None or request.method not in SAFE_METHODS or not is_root:
+            return None, [], []
+        lists = [request.query_params.get(param) for param in ('fields', 'omit', 'expand')]
+        # a name repeated in a list is taken once
+        fields, omit, expand = [list(dict.fromkeys(name for name in value.split(',') if name))
+                                if value is not None else None for value in lists]
+        return fields, omit or [], expand or []
+
+    @property
+    def expanded(self):
+        return self.requested[2]
+
+    def check_requested(self, fields):
+        only, omit, expand = self.requested
+        readable = [name for name, field in fields.items() if not field.write_only]
+        errors = {}
+        for param, names, allowed in (('fields', only or [], readable + list(expand)),
+                                      ('omit', omit, readable),
+                                      ('expand', expand, self.expandable_fields)):
+            unknown = [name for name in names if name not in allowed]
+            if unknown:
+                errors[param] = [f"unknown fields: {', '.join(unknown)}"]
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        self.check_requested(fields)
+        only, omit, expand = self.requested
+        if only is not None:
+            fields = {name: field for name, field in fields.items()
+                      if name in only or field.write_only}
+        for name in omit:
+            # the field may be left out by ?fields= already
+            fields.pop(name, None)
+        narrowed = {}
+        for name, field in fields.items():
+            narrowed[name] = field
+            if name.endswith('_id') and name[:-3] in expand:
+                narrowed[name[:-3]] = self.expandable_fields[name[:-3]](read_only=True)
+        for name in expand:
+            if name not in narrowed:
+                narrowed[name] = self.expandable_fields[name](read_only=True)
+        return narrowed
+
+    def to_representation(self, instance):
+        with timed('serialization'):
+            return super().to_representation(instance)
+
+    def run_validation(self, data=serializers.empty):
+        with timed('serialization'):
+            return super().run_validation(data)
+
+    def narrow_queryset(self, queryset):
+        """
+        Load only the columns of the rendered fields, and join the expanded objects
+        """
+        columns = {queryset.model._meta.pk.name}
+        for field in self._readable_fields:
+            if field.field_name in self.expanded:
+                related_meta = queryset.model._meta.get_field(field.source).related_model._meta
+                columns.add(field.source)
+                columns.update(f'{field.source}__{related_meta.get_field(nested.source).name}'
+                               for nested in field._readable_fields)
+                continue
+            try:
+                columns.add(queryset.model._meta.get_field(field.source).name)
+            except FieldDoesNotExist:
+                # a computed field may read any column
+                return queryset.select_related(*self.expanded)
+        return queryset.select_related(*self.expanded).only(*columns)
+
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     User serializer
     """
     class Meta:
         model = User
         fields = ['user_id', 'first_name', 'last_name', 'email', 'password']
+        extra_kwargs = {'password': {'write_only': True}}
+
+    def create(self, validated_data):
+        validated_data['password'] = hash_password(validated_data['password'])
+        return super().create(validated_data)
 
     def validate(self, data):
         try:
@@ -29,61 +133,182 @@ class UserSerializer(serializers.ModelSerializer):
         return data
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class PublicUserSerializer(serializers.ModelSerializer):
+    """
+    User serializer nested by ?expand=, without the email of the user
+    """
+    class Meta:
+        model = User
+        fields = ['user_id', 'first_name', 'last_name']
+
+
+class BulkCreateListSerializer(serializers.ListSerializer):
+    """
+    List serializer inserting all the validated items with a single bulk_create,
+    in one transaction. The items of the payload are validated as a whole by
+    validate_items(), which returns one dict of errors per item.
+    """
+    def id_of(self, item, name):
+        try:
+            return int(item[name])
+        except KeyError:
+            return None
+        except (TypeError, ValueError):
+            return False
+
+    def validate_items(self, attrs):
+        return [{} for _ in attrs]
+
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        errors = self.validate_items(attrs)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        objs = [model(**attrs) for attrs in validated_data]
+        scope = {name: value for name, value in validated_data[0].items()
+                 if isinstance(value, models.Model)}
+        try:
+            with transaction.atomic():
+                bulk_create_with_pks(model, objs, **scope)
+                post_bulk_create.send(sender=model, instances=objs)
+        except IntegrityError:
+            raise serializers.ValidationError("some of these objects already exist")
+        return objs
+
+
+class ProjectSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Project serializer
     """
-    author_user_id = serializers.ReadOnlyField(source='author_user.user_id')
+    author_user_id = serializers.ReadOnlyField()
+    expandable_fields = {'author_user': PublicUserSerializer}
 
     class Meta:
         model = Project
         fields = ['project_id', 'title', 'description', 'type', 'author_user_id']
 
 
-class ContributorSerializer(serializers.ModelSerializer):
+class ContributorListSerializer(BulkCreateListSerializer):
+    """
+    Checks all the users of the payload with one query on User and one on Contributor
+    """
+    def validate_items(self, attrs):
+        the_project = self.context['view'].get_access_context().project
+        user_ids = [self.id_of(item, 'user_id') for item in self.initial_data]
+        known_ids = {user_id for user_id in user_ids if user_id}
+        existing_users = set(User.objects.filter(pk__in=known_ids)
+                             .values_list('user_id', flat=True))
+        contributors = set(Contributor.objects.filter(project=the_project, user__in=known_ids)
+                           .values_list('user_id', flat=True))
+        errors = []
+        seen = set()
+        for item, user_id in zip(attrs, user_ids):
+            if user_id is None:
+                errors.append({'user_id': ["this field is required"]})
+            elif user_id is False or user_id not in existing_users:
+                errors.append({'user_id': ["this user does not exist"]})
+            elif user_id in contributors or user_id in seen:
+                errors.append({'user_id': ["this contributor already exists"]})
+            else:
+                errors.append({})
+                item['user_id'] = user_id
+            seen.add(user_id)
+        return errors
+
+
+class ContributorSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Contributor serializer
     """
-    user_id = serializers.ReadOnlyField(source='user.user_id')
-    project_id = serializers.ReadOnlyField(source='project.project_id')
+    user_id = serializers.ReadOnlyField()
+    project_id = serializers.ReadOnlyField()
+    expandable_fields = {'user': PublicUserSerializer}
 
     class Meta:
         model = Contributor
         fields = ['user_id', 'project_id', 'permission', 'role']
+        list_serializer_class = ContributorListSerializer
+
+
+class IssueListSerializer(BulkCreateListSerializer):
+    """
+    Checks all the assignees of the payload with one query on Contributor,
+    and all the titles with one query on Issue
+    """
+    def validate_items(self, attrs):
+        the_project = self.context['view'].get_access_context().project
+        the_author_user = self.context['request'].user
+        assignee_ids = [self.id_of(item, 'assignee_user_id') for item in self.initial_data]
+        allowed_ids = set(Contributor.objects
+                          .filter(project=the_project,
+                                  user__in={user_id for user_id in assignee_ids if user_id})
+                          .values_list('user_id', flat=True))
+        allowed_ids.add(the_project.author_user_id)
+        titles = {item['title'] for item in attrs}
+        existing_titles = set(Issue.objects.filter(project=the_project,
+                                                   author_user=the_author_user,
+                                                   title__in=titles)
+                              .values_list('title', flat=True))
+        errors = []
+        seen = set()
+        for item, data, assignee_user_id in zip(attrs, self.initial_data, assignee_ids):
+            if assignee_user_id is None:
+                errors.append({'assignee_user_id': ["this field is required"]})
+            elif assignee_user_id not in allowed_ids:
+                errors.append({'assignee_user_id': [
+                    f"assignee_user ({data['assignee_user_id']}) has no permission "
+                    f"(contributor or owner) in project ({the_project.project_id})"]})
+            elif item['title'] in existing_titles or item['title'] in seen:
+                errors.append({'title': ["this issue already exists"]})
+            else:
+                errors.append({})
+                item['assignee_user_id'] = assignee_user_id
+            seen.add(item['title'])
+        return errors
 
 
-class IssueSerializer(serializers.ModelSerializer):
+class IssueSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Issue serializer
     """
-    assignee_user_id = serializers.ReadOnlyField(source='assignee_user.user_id')
-    author_user_id = serializers.ReadOnlyField(source='author_user.user_id')
-    project_id = serializers.ReadOnlyField(source='project.project_id')
+    assignee_user_id = serializers.ReadOnlyField()
+    author_user_id = serializers.ReadOnlyField()
+    project_id = serializers.ReadOnlyField()
+    expandable_fields = {'author_user': PublicUserSerializer,
+                         'assignee_user': PublicUserSerializer}
 
     class Meta:
         model = Issue
         fields = ['issue_id', 'title', 'desc', 'tag', 'priority',
                   'project_id', 'status', 'author_user_id',
-                  'assignee_user_id', 'time_created']
+                  'assignee_user_id', 'time_created', 'comment_count', 'last_activity_at']
+        list_serializer_class = IssueListSerializer
 
     def validate(self, data):
-        request = self._kwargs['context']['request']
-        the_project = Project.objects.get(pk=request.parser_context['kwargs']['project_pk'])
+        if isinstance(self.parent, serializers.ListSerializer):
+            return data
+        the_project = self.context['view'].get_access_context().project
         the_assignee_user = User.objects.get(pk=self._kwargs['data']['assignee_user_id'])
         if not the_assignee_user.is_contributor(the_project) \
-                and not (the_assignee_user == the_project.author_user):
+                and not (the_assignee_user.pk == the_project.author_user_id):
             raise serializers.ValidationError(f"assignee_user ({the_assignee_user.user_id}) \
                  has no permission (contributor or owner) in project ({the_project.project_id})")
         return data
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Comment serializer
     """
-    issue_id = serializers.ReadOnlyField(source='issue.issue_id')
-    author_user_id = serializers.ReadOnlyField(source='author_user.user_id')
+    issue_id = serializers.ReadOnlyField()
+    author_user_id = serializers.ReadOnlyField()
+    expandable_fields = {'author_user': PublicUserSerializer}
 
     class Meta:
         model = Comment
         fields = ['comment_id', 'description', 'author_user_id', 'issue_id', 'time_created']
+        list_serializer_class = BulkCreateListSerializer
@@ -0,0 +1,272 @@
+from collections import Counter
+
+from django.db import connections, router, transaction
+from django.db.transaction import TransactionManagementError
+from django.db.utils import NotSupportedError
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_delete, pre_save
+)
+from django.dispatch import Signal, receiver
+
+from soft_desk.authentication import get_token_cache
+from soft_desk.membership import get_membership_cache
+from soft_desk.models import (
+    Comment, Contributor, Issue, Project, User, is_deleted_parent, mark_deleted
+)
+from soft_desk.response_cache import get_response_cache
+from soft_desk.search import install_sqlite_triggers
+from soft_desk.stats import (
+    TRACKED_FIELDS, TRACKED_NAMES, apply_deltas, create_counters, issue_deltas, loaded_values
+)
+from soft_desk.versioning import bump_issues, bump_projects, comment_changes
+
+# sent, with the list of the created instances, after a bulk_create which
+# bypassed post_save (see BulkCreateListSerializer)
+post_bulk_create = Signal()
+
+
+def bulk_create_with_pks(model, objs, batch_size=None, **scope):
+    """
+    bulk_create the objects, and set their primary keys when the backend does
+    not return them: they are then read back as the last keys of the rows
+    matching the scope lookups. That holds only when no other transaction
+    inserts such rows meanwhile, as on SQLite, where the transaction of the
+    insert holds the write lock of the whole database until its commit; the
+    other backends not returning the keys (MySQL) are refused. No signal is sent.
+    """
+    using = router.db_for_write(model)
+    connection = connections[using]
+    if not connection.features.can_return_rows_from_bulk_insert:
+        if connection.vendor != 'sqlite':
+            raise NotSupportedError(f"{connection.vendor} does not return the primary keys "
+                                    f"of the rows inserted by bulk_create")
+        if not connection.in_atomic_block:
+            raise TransactionManagementError("the primary keys are read back in the "
+                                             "transaction of the insert")
+    model.objects.using(using).bulk_create(objs, batch_size=batch_size)
+    if objs and objs[0].pk is None:
+        pks = list(model.objects.using(using).filter(**scope).order_by('-pk')
+                   .values_list('pk', flat=True)[:len(objs)])[::-1]
+        for obj, pk in zip(objs, pks):
+            obj.pk = pk
+    return objs
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    get_token_cache().invalidate_user(instance.pk)
+
+
+def invalidate_on_commit(using, invalidate):
+    """
+    Invalidate now, for the reads of the transaction, and again once it is
+    committed: a concurrent read may have cached the old value in between
+    """
+    invalidate()
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(invalidate, using=using)
+
+
+@receiver(post_save, sender=Contributor)
+@receiver(post_delete, sender=Contributor)
+def invalidate_contributor_membership(sender, instance, using, **kwargs):
+    invalidate_on_commit(using, lambda: get_membership_cache().invalidate(
+        instance.user_id, instance.project_id))
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_membership(sender, instance, using, **kwargs):
+    invalidate_on_commit(using, lambda: get_membership_cache().invalidate_project(instance.pk))
+
+
+@receiver(post_bulk_create, sender=Contributor)
+def invalidate_bulk_contributor_membership(sender, instances, **kwargs):
+    keys = {(instance.user_id, instance.project_id) for instance in instances}
+
+    def invalidate():
+        membership_cache = get_membership_cache()
+        for user_id, project_id in keys:
+            membership_cache.invalidate(user_id, project_id)
+    invalidate_on_commit(router.db_for_write(Contributor), invalidate)
+
+
+@receiver(pre_delete, sender=Issue)
+def mark_cascaded_issue(sender, instance, **kwargs):
+    # the pre_delete of a cascade are all sent before the first row is deleted
+    if is_deleted_parent(Project, instance.project_id):
+        mark_deleted(Issue, instance.pk)
+
+
+def deleted_with_parent(sender, instance):
+    """
+    Is the row deleted by the cascade of its issue or project? The receivers
+    of the parent then bump, count and evict once for all the rows.
+    """
+    if sender is Comment:
+        return is_deleted_parent(Issue, instance.issue_id)
+    return is_deleted_parent(Project, instance.project_id)
+
+
+@receiver(post_save, sender=Project)
+def bump_project_version(sender, instance, created, **kwargs):
+    if not created:
+        bump_projects(pk=instance.pk)
+
+
+@receiver(post_save, sender=Contributor)
+@receiver(post_delete, sender=Contributor)
+def bump_contributor_versions(sender, instance, **kwargs):
+    if not deleted_with_parent(sender, instance):
+        bump_projects(pk=instance.project_id)
+
+
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+def bump_issue_versions(sender, instance, **kwargs):
+    if deleted_with_parent(sender, instance):
+        return
+    if kwargs.get('created') is False:
+        bump_issues(pk=instance.pk)
+    bump_projects(pk=instance.project_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_versions(sender, instance, created=None, **kwargs):
+    changes = None
+    if created:
+        changes = comment_changes([instance])
+    elif created is None:
+        # a deletion
+        if deleted_with_parent(sender, instance):
+            return
+        changes = comment_changes([instance], -1)
+    bump_issues(changes, pk=instance.issue_id)
+    bump_projects(issue=instance.issue_id)
+
+
+@receiver(post_bulk_create)
+def bump_bulk_versions(sender, instances, **kwargs):
+    if sender is Comment:
+        issue_ids = {instance.issue_id for instance in instances}
+        bump_issues(comment_changes(instances), pk__in=issue_ids)
+        bump_projects(issue__in=issue_ids)
+    elif sender in (Contributor, Issue):
+        bump_projects(pk__in={instance.project_id for instance in instances})
+
+
+# the counters of the project are updated after its version is bumped (see
+# soft_desk.stats.rebuild), in the transaction of the write
+
+@receiver(post_save, sender=Project)
+def create_project_counters(sender, instance, created, **kwargs):
+    if created:
+        create_counters([instance.pk])
+
+
+@receiver(post_bulk_create, sender=Project)
+def create_bulk_project_counters(sender, instances, **kwargs):
+    create_counters([instance.pk for instance in instances])
+
+
+@receiver(pre_save, sender=Issue)
+def remember_issue_stat_values(sender, instance, update_fields=None, **kwargs):
+    """
+    The stored values of the counted fields, read before a save which may
+    change them, None otherwise
+    """
+    instance._stat_values = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not TRACKED_NAMES & set(update_fields):
+        return
+    instance._stat_values = Issue.objects.filter(pk=instance.pk) \
+        .values(*TRACKED_FIELDS).first()
+
+
+@receiver(pre_delete, sender=Issue)
+def remember_deleted_issue_stat_values(sender, instance, **kwargs):
+    # the counters of a deleted project are deleted with it
+    if deleted_with_parent(sender, instance):
+        return
+    values = loaded_values(instance)
+    missing = [field for field, value in values.items() if value is None]
+    if missing:
+        values.update(Issue.objects.filter(pk=instance.pk).values(*missing).first() or {})
+    instance._stat_values = values
+
+
+@receiver(post_save, sender=Issue)
+def count_saved_issue(sender, instance, created, update_fields=None, **kwargs):
+    old = instance._stat_values
+    if not created and old is None:
+        return
+    new = loaded_values(instance)
+    if old is not None:
+        for field, value in new.items():
+            name = Issue._meta.get_field(field).name
+            unsaved = update_fields is not None and not {field, name} & set(update_fields)
+            if value is None or unsaved:
+                new[field] = old[field]
+    apply_deltas(issue_deltas(None if created else old, new))
+
+
+@receiver(post_delete, sender=Issue)
+def count_deleted_issue(sender, instance, **kwargs):
+    if not deleted_with_parent(sender, instance):
+        apply_deltas(issue_deltas(old=instance._stat_values))
+
+
+@receiver(post_bulk_create, sender=Issue)
+def count_bulk_issues(sender, instances, **kwargs):
+    deltas = Counter()
+    for instance in instances:
+        deltas.update(issue_deltas(new=loaded_values(instance)))
+    apply_deltas(deltas)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Contributor)
+@receiver(post_delete, sender=Contributor)
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+def evict_project_responses(sender, instance, **kwargs):
+    if sender is not Project and deleted_with_parent(sender, instance):
+        return
+    project_id = instance.pk if sender is Project else instance.project_id
+    get_response_cache().invalidate(project_id=project_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def evict_issue_responses(sender, instance, **kwargs):
+    if deleted_with_parent(sender, instance):
+        return
+    # the views set the issue of the comment; otherwise, rather than loading it,
+    # the issue lists of the project are left to expire: their keys hold the
+    # version of the project, bumped with the comment
+    project_id = instance.issue.project_id if Comment.issue.is_cached(instance) else None
+    get_response_cache().invalidate(project_id=project_id, issue_id=instance.issue_id)
+
+
+@receiver(post_bulk_create)
+def evict_bulk_responses(sender, instances, **kwargs):
+    response_cache = get_response_cache()
+    if sender is Comment:
+        issue_ids = {instance.issue_id for instance in instances}
+        for issue_id, project_id in Issue.objects.filter(pk__in=issue_ids) \
+                .values_list('issue_id', 'project_id'):
+            response_cache.invalidate(project_id=project_id, issue_id=issue_id)
+    elif sender in (Contributor, Issue):
+        for project_id in {instance.project_id for instance in instances}:
+            response_cache.invalidate(project_id=project_id)
+
+
+@receiver(post_migrate)
+def install_search_triggers(sender, using, **kwargs):
+    # the SQLite schema editor drops the triggers of the tables it rebuilds
+    if sender.name == 'soft_desk' and connections[using].vendor == 'sqlite':
+        install_sqlite_triggers(connections[using])
@@ -0,0 +1,145 @@
+import functools
+import operator
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, Count, F, Q, Value, When
+
+from soft_desk.models import Issue, Project, ProjectStat
+
+# the fields of Issue counted per project, with their choices
+STAT_FIELDS = {
+    'status': Issue.Status,
+    'priority': Issue.Priority,
+    'tag': Issue.Tag,
+}
+TRACKED_FIELDS = ('project_id',) + tuple(STAT_FIELDS)
+# the names of the tracked fields in the update_fields of a save
+TRACKED_NAMES = {'project', *TRACKED_FIELDS}
+
+
+def loaded_values(issue):
+    """
+    The tracked values of the issue, None for the deferred ones
+    """
+    return {field: issue.__dict__.get(field) for field in TRACKED_FIELDS}
+
+
+def issue_deltas(old=None, new=None):
+    """
+    Changes of the counters when an issue goes from the old values to the new
+    ones, None standing for a missing issue
+    """
+    deltas = Counter()
+    for field in STAT_FIELDS:
+        if old is not None:
+            deltas[(old['project_id'], field, old[field])] -= 1
+        if new is not None:
+            deltas[(new['project_id'], field, new[field])] += 1
+    return deltas
+
+
+def empty_counters(project_ids):
+    return [ProjectStat(project_id=project_id, field=field, value=value, count=0)
+            for project_id in project_ids
+            for field, choices in STAT_FIELDS.items() for value in choices.values]
+
+
+def create_counters(project_ids):
+    """
+    Create the counters of new projects, so that the writes of their issues
+    only ever update them
+    """
+    ProjectStat.objects.bulk_create(empty_counters(project_ids), batch_size=1000)
+
+
+def apply_deltas(deltas):
+    """
+    Add the deltas, by (project_id, field, value), to the counters with one
+    UPDATE. A missing counter is created for a positive delta only: a
+    negative one comes from a deletion, possibly the cascade of the project's.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    conditions = [Q(project_id=project_id, field=field, value=value)
+                  for project_id, field, value in deltas]
+    counters = ProjectStat.objects.filter(functools.reduce(operator.or_, conditions))
+    increment = Case(*[When(condition, then=Value(delta))
+                       for condition, delta in zip(conditions, deltas.values())],
+                     output_field=BigIntegerField())
+    if counters.update(count=F('count') + increment) == len(deltas):
+        return
+    existing = set(counters.values_list('project_id', 'field', 'value'))
+    for (project_id, field, value), delta in deltas.items():
+        if (project_id, field, value) in existing or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                ProjectStat.objects.create(project_id=project_id, field=field, value=value,
+                                           count=delta)
+        except IntegrityError:
+            # created by a concurrent write
+            ProjectStat.objects.filter(project_id=project_id, field=field, value=value) \
+                .update(count=F('count') + delta)
+
+
+def count_issues(project_ids):
+    """
+    The counters computed from the issues, by (project_id, field, value)
+    """
+    counts = Counter()
+    for field in STAT_FIELDS:
+        for project_id, value, count in Issue.objects.filter(project__in=project_ids) \
+                .values_list('project_id', field).annotate(count=Count('issue_id')) \
+                .order_by():
+            counts[(project_id, field, value)] = count
+    return counts
+
+
+def stored_counts(project_ids):
+    return Counter({(project_id, field, value): count
+                    for project_id, field, value, count in
+                    ProjectStat.objects.filter(project__in=project_ids)
+                    .values_list('project_id', 'field', 'value', 'count')
+                    if count})
+
+
+def verify(project_ids):
+    """
+    Return the (project_id, field, value, stored, computed) of the wrong counters
+    """
+    computed = count_issues(project_ids)
+    stored = stored_counts(project_ids)
+    return sorted((*key, stored[key], computed[key]) for key in set(computed) | set(stored)
+                  if stored[key] != computed[key])
+
+
+def rebuild(project_ids):
+    """
+    Recompute the counters of the projects from their issues. The project
+    rows are locked first: the writes of issues, which bump the version of
+    their project before their counters, wait for the rebuild to commit.
+    """
+    with transaction.atomic():
+        project_ids = list(Project.objects.select_for_update().filter(pk__in=project_ids)
+                           .values_list('pk', flat=True))
+        ProjectStat.objects.filter(project__in=project_ids).delete()
+        counters = {(stat.project_id, stat.field, stat.value): stat
+                    for stat in empty_counters(project_ids)}
+        for key, count in count_issues(project_ids).items():
+            counters.setdefault(key, ProjectStat(project_id=key[0], field=key[1],
+                                                 value=key[2])).count = count
+        ProjectStat.objects.bulk_create(counters.values(), batch_size=1000)
+
+
+def project_stats(project):
+    """
+    The number of issues of the project, in total and by value of each field
+    """
+    stats = {field: {value: 0 for value in choices.values}
+             for field, choices in STAT_FIELDS.items()}
+    for field, value, count in ProjectStat.objects.filter(project=project) \
+            .values_list('field', 'value', 'count'):
+        stats.setdefault(field, {})[value] = count
+    return {'project_id': project.pk, 'issues': sum(stats['status'].values()), **stats}
@@ -1,3 +1,1587 @@
-# from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import decimal
+import io
+import itertools
+import json
+import re
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib import admin
+from django.contrib.auth import hashers
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.db.models.signals import post_init
+from django.http import Http404, HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework_jwt.settings import api_settings
+
+from soft_desk.access import get_access_context
+from soft_desk.authentication import TokenCache, get_token_cache
+from soft_desk.caching import LRUCache
+from soft_desk.db import apply_sqlite_pragmas
+from soft_desk.export import ProjectExport
+from soft_desk.importer import Checkpoint, Importer
+from soft_desk.membership import MembershipCache, get_membership_cache
+from soft_desk.management.commands.benchmark_api import SCENARIOS, unmeasured_routes
+from soft_desk.middleware import ReadReplicaMiddleware
+from soft_desk.models import Comment, Contributor, ImportCheckpoint, Issue, Project, User
+from soft_desk.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from soft_desk.response_cache import get_response_cache
+from soft_desk.routers import ReadReplicaRouter
+from soft_desk.search import BACKENDS
+from soft_desk.seeding import Seeder, seed_benchmark_project
+from soft_desk.signals import bulk_create_with_pks
+from soft_desk.stats import verify
+from soft_desk.views import IssueViewSet
+
+jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
+jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
+
+
+class SoftDeskFixtures:
+    """
+    A project owned by owner, with member as contributor
+    """
+    def setUp(self):
+        self.owner = User.objects.create_user('owner@example.com', 'N3wpolo6', 'Owner', 'User')
+        self.member = User.objects.create_user('member@example.com', 'N3wpolo6',
+                                               'Member', 'User')
+        self.project = Project.objects.create(title='Project', author_user=self.owner)
+        Contributor.objects.create(user=self.member, project=self.project)
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+
+    def add_issues(self, count, comments=0):
+        start = Issue.objects.count()
+        for i in range(start, start + count):
+            issue = Issue.objects.create(title=f'Issue {i}', project=self.project,
+                                         author_user=self.owner, assignee_user=self.member)
+            for j in range(comments):
+                Comment.objects.create(description=f'Comment {j}', author_user=self.member,
+                                       issue=issue)
+
+    def add_contributors(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            user = User.objects.create(email=f'user{i}@example.com')
+            Contributor.objects.create(user=user, project=self.project)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+
+class SoftDeskTestCase(SoftDeskFixtures, TestCase):
+    pass
+
+
+class AccessContextTest(SoftDeskTestCase):
+    """
+    The project, the parent issue and the membership of a route are resolved
+    in one query, once per request, and only under the project of the route
+    """
+    def setUp(self):
+        super().setUp()
+        self.add_issues(1, comments=1)
+        self.issue = Issue.objects.get()
+        self.comment = Comment.objects.get()
+        self.other = Project.objects.create(title='Other', author_user=self.member)
+        self.other_issue = Issue.objects.create(title='Other', project=self.other,
+                                                author_user=self.member,
+                                                assignee_user=self.member)
+
+    def resolve(self, model, **kwargs):
+        request = RequestFactory().get('/')
+        request.user = self.member
+        view = SimpleNamespace(access_model=model, kwargs=kwargs)
+        return request, view, get_access_context(request, view)
+
+    def test_single_query(self):
+        routes = [
+            (Project, {'pk': self.project.pk}),
+            (Contributor, {'project_pk': self.project.pk}),
+            (Contributor, {'project_pk': self.project.pk, 'pk': self.member.pk}),
+            (Issue, {'project_pk': self.project.pk}),
+            (Issue, {'project_pk': self.project.pk, 'pk': self.issue.pk}),
+            (Comment, {'project_pk': self.project.pk, 'issue_pk': self.issue.pk}),
+            (Comment, {'project_pk': self.project.pk, 'issue_pk': self.issue.pk,
+                       'pk': self.comment.pk}),
+        ]
+        for model, kwargs in routes:
+            with self.subTest(model=model.__name__, **kwargs):
+                with self.assertNumQueries(1):
+                    request, view, context = self.resolve(model, **kwargs)
+                self.assertEqual(context.project, self.project)
+                self.assertTrue(context.is_contributor)
+                # the context is kept on the request for the permissions and the view
+                with self.assertNumQueries(0):
+                    self.assertIs(get_access_context(request, view), context)
+
+    def test_foreign_ids(self):
+        for model, kwargs in [
+            (Issue, {'project_pk': self.project.pk, 'pk': self.other_issue.pk}),
+            (Comment, {'project_pk': self.other.pk, 'issue_pk': self.issue.pk}),
+            (Comment, {'project_pk': self.other.pk, 'issue_pk': self.issue.pk,
+                       'pk': self.comment.pk}),
+            (Comment, {'project_pk': self.project.pk, 'issue_pk': self.other_issue.pk,
+                       'pk': self.comment.pk}),
+        ]:
+            with self.subTest(model=model.__name__, **kwargs):
+                with self.assertRaises(Http404):
+                    self.resolve(model, **kwargs)
+        urls = [f'/projects/{self.project.pk}/issues/{self.other_issue.pk}/',
+                f'/projects/{self.other.pk}/issues/{self.issue.pk}/comments/',
+                f'/projects/{self.other.pk}/issues/{self.issue.pk}/comments/{self.comment.pk}/']
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+
+class MembershipCacheTest(SoftDeskTestCase):
+    """
+    The memberships are cached in a bounded local tier and an optional shared
+    tier, and invalidated by the Contributor and Project signals
+    """
+    shared_settings = {
+        'CACHES': {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'membership': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                           'LOCATION': 'membership-test'},
+        },
+        'SOFT_DESK_MEMBERSHIP_CACHE': {'MAX_ENTRIES': 100, 'TIMEOUT': 60,
+                                       'CACHE_ALIAS': 'membership'},
+    }
+
+    def setUp(self):
+        super().setUp()
+        get_membership_cache().clear()
+
+    def assertMember(self, user, expected, queries):
+        with self.assertNumQueries(queries):
+            self.assertIs(user.is_contributor(self.project), expected)
+
+    def test_counters(self):
+        self.assertMember(self.member, True, 1)
+        self.assertMember(self.member, True, 0)
+        self.assertMember(self.owner, False, 1)
+        self.assertMember(self.owner, False, 0)
+        self.assertEqual(get_membership_cache().stats(), {
+            'hits': 2, 'misses': 2, 'local_hits': 2, 'shared_hits': 0, 'size': 2})
+
+    def test_lru_eviction(self):
+        cache = MembershipCache(max_entries=2, timeout=60)
+        for project_id in (1, 2, 1, 3):
+            cache.get_or_load(1, project_id, lambda: True)
+        # 2 is the least recently used entry
+        self.assertEqual((cache.stats()['size'], cache.misses), (2, 3))
+        cache.get_or_load(1, 1, lambda: True)
+        cache.get_or_load(1, 2, lambda: True)
+        self.assertEqual((cache.local_hits, cache.misses), (2, 4))
+
+    def test_signals(self):
+        contributor = Contributor.objects.get(user=self.member)
+        self.assertMember(self.member, True, 1)
+        contributor.delete()
+        self.assertMember(self.member, False, 1)
+        Contributor.objects.create(user=self.member, project=self.project)
+        self.assertMember(self.member, True, 1)
+        self.project.save()
+        self.assertMember(self.member, True, 1)
+        self.project.delete()
+        self.assertEqual(get_membership_cache().stats()['size'], 0)
+
+    def test_invalidated_on_commit(self):
+        cache = get_membership_cache()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Contributor.objects.filter(user=self.member).get().delete()
+                # a concurrent read, before the commit, caches the old membership
+                cache.set(self.member.pk, self.project.pk, True)
+        self.assertMember(self.member, False, 1)
+
+    def test_shared_tier(self):
+        with self.settings(**self.shared_settings):
+            caches['membership'].clear()
+            # another process, sharing the cache
+            other = MembershipCache(max_entries=100, timeout=60, cache_alias='membership')
+            self.assertMember(self.member, True, 1)
+            self.assertTrue(other.get_or_load(self.member.pk, self.project.pk, None))
+            self.assertTrue(other.get_or_load(self.member.pk, self.project.pk, None))
+            self.assertEqual((other.shared_hits, other.local_hits), (1, 1))
+            # the local entry of the other process is stale after the delete
+            Contributor.objects.filter(user=self.member).get().delete()
+            self.assertFalse(other.get_or_load(self.member.pk, self.project.pk,
+                                               lambda: False))
+            self.assertEqual(other.misses, 1)
+            self.assertMember(self.member, False, 0)
+
+
+class KeysetPaginationTest(SoftDeskTestCase):
+    """
+    The next and previous cursors walk the keyset pages on the ordering of the view
+    """
+    def setUp(self):
+        super().setUp()
+        self.add_issues(5)
+        self.ids = list(Issue.objects.order_by('issue_id').values_list('issue_id', flat=True))
+        self.url = f'/projects/{self.project.pk}/issues/?pagination=keyset&page_size=2'
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        return [issue['issue_id'] for issue in page['results']], page
+
+    def walk(self, url, link='next'):
+        pages = []
+        while url:
+            ids, page = self.get_page(url)
+            pages.append(ids)
+            url = page[link]
+        return pages
+
+    def test_next_and_previous(self):
+        pages = self.walk(self.url)
+        self.assertEqual(pages, [self.ids[:2], self.ids[2:4], self.ids[4:]])
+        ids, last = self.get_page(self.url)
+        while last['next']:
+            ids, last = self.get_page(last['next'])
+        self.assertEqual(self.walk(last['previous'], 'previous'),
+                         [self.ids[2:4], self.ids[:2]])
+
+    def test_custom_ordering(self):
+        self.assertEqual(self.walk(self.url + '&ordering=-issue_id'),
+                         [self.ids[:2:-1], self.ids[2:0:-1], self.ids[:1]])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url + '&cursor=invalid').status_code, 404)
+
+    def walk_with_insert(self, url):
+        ids, page = self.get_page(url)
+        self.add_issues(3)
+        return ids + sum(self.walk(page['next']), [])
+
+    def test_inserted_rows(self):
+        # the rows inserted between two pages neither shift nor repeat the next ones
+        ids = self.walk_with_insert(self.url)
+        added = list(Issue.objects.exclude(issue_id__in=self.ids)
+                     .order_by('issue_id').values_list('issue_id', flat=True))
+        self.assertEqual(ids, self.ids + added)
+        ids = sorted(self.ids + added, reverse=True)
+        self.assertEqual(self.walk_with_insert(self.url + '&ordering=-issue_id'), ids)
+
+
+class ListQueryCountTest(SoftDeskTestCase):
+    """
+    The list endpoints run a constant number of queries, whatever the page size
+    """
+    def assertConstantQueries(self, url, grow):
+        for query_string in ('', '?pagination=keyset&page_size=1000'):
+            grow()
+            small = self.count_queries(url + query_string)
+            grow()
+            grow()
+            self.assertEqual(self.count_queries(url + query_string), small, url + query_string)
+
+    def test_projects(self):
+        def grow():
+            for _ in range(5):
+                project = Project.objects.create(title='Other', author_user=self.owner)
+                Contributor.objects.create(user=self.member, project=project)
+        self.assertConstantQueries('/projects/', grow)
+
+    def test_contributors(self):
+        self.assertConstantQueries(f'/projects/{self.project.pk}/users/',
+                                   lambda: self.add_contributors(5))
+
+    def test_issues(self):
+        self.assertConstantQueries(f'/projects/{self.project.pk}/issues/',
+                                   lambda: self.add_issues(5))
+
+    def test_comments(self):
+        self.add_issues(1)
+        issue = Issue.objects.get()
+
+        def grow():
+            for i in range(5):
+                Comment.objects.create(description=f'Comment {i}', author_user=self.member,
+                                       issue=issue)
+        self.assertConstantQueries(f'/projects/{self.project.pk}/issues/{issue.pk}/comments/',
+                                   grow)
+
+
+class ProjectListTest(SoftDeskTestCase):
+    """
+    The projects of a user are the ones they own or contribute to, each one once
+    """
+    def test_owned_or_contributed(self):
+        owned = Project.objects.create(title='Owned', author_user=self.member)
+        both = Project.objects.create(title='Both', author_user=self.member)
+        Contributor.objects.create(user=self.member, project=both)
+        Project.objects.create(title='Foreign', author_user=self.owner)
+        expected = [self.project.pk, owned.pk, both.pk]
+        projects = Project.objects.owned_or_contributed_by(self.member).order_by('project_id')
+        self.assertEqual([project.pk for project in projects], expected)
+        response = self.client.get('/projects/')
+        self.assertEqual([project['project_id'] for project in response.json()['results']],
+                         expected)
+
+
+class FastListTest(SoftDeskTestCase):
+    """
+    The values-based rendering returns the bytes of the serializers
+    """
+    def test_byte_identical(self):
+        self.add_issues(3, comments=2)
+        Issue.objects.filter(pk=Issue.objects.first().pk).update(
+            title='Ünïcode "quoted" \u2028 line', desc='back\\slash\ttab')
+        Comment.objects.update(description='é \x00')
+        issue = Issue.objects.first()
+        urls = [f'/projects/{self.project.pk}/users/',
+                f'/projects/{self.project.pk}/issues/',
+                f'/projects/{self.project.pk}/issues/{issue.pk}/comments/']
+        endpoints = ('contributors', 'issues', 'comments')
+        for url, query_string, accelerator in itertools.product(
+                urls, ('', '?pagination=keyset&page_size=1'), (orjson, None)):
+            expected = self.client.get(url + query_string)
+            with self.settings(SOFT_DESK_FAST_LIST_ENDPOINTS=endpoints), \
+                    mock.patch('soft_desk.encoders.orjson', accelerator):
+                response = self.client.get(url + query_string)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIsInstance(response, Response)
+            self.assertEqual(response['Content-Type'], expected['Content-Type'])
+            self.assertEqual(response.content, expected.content)
+
+
+class IssueFilterTest(SoftDeskTestCase):
+    """
+    The issue list is filtered and ordered on the query parameters
+    """
+    def setUp(self):
+        super().setUp()
+        self.add_issues(4)
+        self.issues = list(Issue.objects.order_by('issue_id'))
+        Issue.objects.filter(pk=self.issues[1].pk).update(status='INP', priority='U',
+                                                          assignee_user=self.owner)
+        Issue.objects.filter(pk=self.issues[2].pk).update(status='CLO', tag='NF')
+        Issue.objects.filter(pk=self.issues[3].pk).update(time_created='2020-06-01T12:00Z')
+        self.url = f'/projects/{self.project.pk}/issues/'
+
+    def list_ids(self, query_string):
+        response = self.client.get(self.url + query_string)
+        self.assertEqual(response.status_code, 200)
+        return [issue['issue_id'] for issue in response.json()['results']]
+
+    def test_filters(self):
+        first, second, third, fourth = [issue.pk for issue in self.issues]
+        self.assertEqual(self.list_ids('?status=INP,CLO'), [second, third])
+        self.assertEqual(self.list_ids(f'?status=NEW&assignee_user={self.member.pk}'),
+                         [first, fourth])
+        self.assertEqual(self.list_ids('?priority=U'), [second])
+        self.assertEqual(self.list_ids('?tag=NF'), [third])
+        self.assertEqual(self.list_ids(f'?author_user={self.member.pk}'), [])
+        self.assertEqual(self.list_ids('?time_created_before=2021-01-01'), [fourth])
+        self.assertEqual(self.list_ids('?time_created_after=2020-06-01T12:00:00%2B00:00'),
+                         [first, second, third, fourth])
+
+    def test_ordering(self):
+        first, second, third, fourth = [issue.pk for issue in self.issues]
+        self.assertEqual(self.list_ids('?ordering=time_created'), [fourth, first, second, third])
+        self.assertEqual(self.list_ids('?ordering=-issue_id'), [fourth, third, second, first])
+        # not in the whitelist
+        self.assertEqual(self.list_ids('?ordering=title'), [first, second, third, fourth])
+        ids = []
+        query_string = '?ordering=-time_created&pagination=keyset&page_size=1'
+        url = self.url + query_string
+        while url:
+            response = self.client.get(url).json()
+            ids += [issue['issue_id'] for issue in response['results']]
+            url = response['next']
+        self.assertEqual(ids, [third, second, first, fourth])
+
+    def test_invalid(self):
+        response = self.client.get(self.url + '?status=NEW,XYZ&assignee_user=me'
+                                              '&time_created_after=yesterday')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'status', 'assignee_user', 'time_created_after'})
+
+
+class SparseFieldsetTest(SoftDeskTestCase):
+    """
+    ?fields=, ?omit= and ?expand= narrow the output and the loaded columns
+    """
+    def setUp(self):
+        super().setUp()
+        self.add_issues(3, comments=1)
+        self.url = f'/projects/{self.project.pk}/issues/'
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        issue_queries = [query['sql'] for query in context.captured_queries
+                         if 'FROM "soft_desk_issue"' in query['sql'] and 'LIMIT' in query['sql']]
+        return response.json()['results'], issue_queries[-1]
+
+    def test_fields_and_omit(self):
+        fast_list = ((), ('issues',))
+        for endpoints in fast_list:
+            with self.settings(SOFT_DESK_FAST_LIST_ENDPOINTS=endpoints):
+                results, sql = self.get(self.url + '?fields=issue_id,title')
+                self.assertEqual(list(results[0]), ['issue_id', 'title'])
+                self.assertNotIn('"desc"', sql)
+                results, sql = self.get(self.url + '?omit=desc,time_created')
+                self.assertNotIn('desc', results[0])
+                self.assertIn('status', results[0])
+                self.assertNotIn('"desc"', sql)
+        issue = Issue.objects.first()
+        response = self.client.get(f'{self.url}{issue.pk}/comments/?fields=description')
+        self.assertEqual(response.json()['results'], [{'description': 'Comment 0'}])
+        response = self.client.get(f'/projects/{self.project.pk}/?omit=description,type')
+        self.assertEqual(set(response.json()), {'project_id', 'title', 'author_user_id'})
+
+    def test_expand(self):
+        self.add_issues(5)
+        with self.settings(SOFT_DESK_FAST_LIST_ENDPOINTS=('issues',)):
+            with CaptureQueriesContext(connection) as context:
+                results, sql = self.get(self.url + '?fields=title&expand=assignee_user')
+        self.assertEqual(len(context.captured_queries),
+                         self.count_queries(self.url + '?fields=title'))
+        self.assertIn('JOIN "soft_desk_user"', sql)
+        self.assertEqual(results[0], {'title': 'Issue 0', 'assignee_user': {
+            'user_id': self.member.pk, 'first_name': 'Member', 'last_name': 'User'}})
+        results, sql = self.get(self.url + '?expand=author_user')
+        names = list(results[0])
+        self.assertEqual(names[names.index('author_user_id') + 1], 'author_user')
+
+    def test_omit_overlap(self):
+        results, sql = self.get(self.url + '?fields=title&omit=desc')
+        self.assertEqual(list(results[0]), ['title'])
+        results, sql = self.get(self.url + '?omit=title,title&fields=issue_id,title,title')
+        self.assertEqual(list(results[0]), ['issue_id'])
+
+    def test_expand_without_email(self):
+        for endpoints in ((), ('issues',)):
+            with self.settings(SOFT_DESK_FAST_LIST_ENDPOINTS=endpoints):
+                results, sql = self.get(self.url + '?expand=author_user,assignee_user')
+                self.assertEqual(set(results[0]['author_user']),
+                                 {'user_id', 'first_name', 'last_name'})
+                self.assertNotIn('"email"', sql)
+
+    def test_unknown_and_writes(self):
+        response = self.client.get(self.url + '?fields=title,secret&expand=project')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'fields', 'expand'})
+        response = self.client.post(self.url + '?fields=title',
+                                    {'title': 'New', 'assignee_user_id': self.member.pk},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('issue_id', response.json())
+
+
+class IssueActivityTest(SoftDeskTestCase):
+    """
+    The comment_count and last_activity_at of the issues follow the writes of comments
+    """
+    def setUp(self):
+        super().setUp()
+        self.add_issues(2)
+        self.first, self.second = Issue.objects.order_by('issue_id')
+        self.url = f'/projects/{self.project.pk}/issues/'
+
+    def test_comments(self):
+        comments_url = f'{self.url}{self.second.pk}/comments/'
+        response = self.client.post(comments_url, {'description': 'One'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(comments_url, [{'description': 'Two'},
+                                                   {'description': 'Three'}], format='json')
+        self.assertEqual(response.status_code, 201)
+        comment_id = response.json()[-1]['comment_id']
+        latest = Comment.objects.get(pk=comment_id).time_created
+        # the deletion of a comment leaves the last activity
+        self.assertEqual(self.client.delete(f'{comments_url}{comment_id}/').status_code, 204)
+        issue = self.client.get(self.url + '?ordering=-issue_id').json()['results'][0]
+        self.assertEqual(issue['comment_count'], 2)
+        self.assertEqual(datetime.datetime.fromisoformat(issue['last_activity_at']), latest)
+        # a stale instance does not overwrite the maintained fields
+        self.second.title = 'Renamed'
+        self.second.save()
+        self.second.refresh_from_db()
+        self.assertEqual((self.second.comment_count, self.second.last_activity_at), (2, latest))
+        ids = [issue['issue_id'] for issue in
+               self.client.get(self.url + '?ordering=-comment_count').json()['results']]
+        self.assertEqual(ids, [self.second.pk, self.first.pk])
+        ids = [issue['issue_id'] for issue in
+               self.client.get(self.url + '?ordering=last_activity_at').json()['results']]
+        self.assertEqual(ids, [self.first.pk, self.second.pk])
+
+    def test_bulk_and_past_comments(self):
+        past = datetime.datetime(2019, 3, 1, tzinfo=datetime.timezone.utc)
+        comments = [Comment(description='Old', author_user=self.owner, issue=self.first,
+                            time_created=past),
+                    Comment(description='Old', author_user=self.owner, issue=self.second,
+                            time_created=past)]
+        Importer({'project': {}, 'issue': {}}).insert(Comment, comments)
+        for issue in (self.first, self.second):
+            issue.refresh_from_db()
+            self.assertEqual(issue.comment_count, 1)
+            # an older comment leaves the last activity
+            self.assertEqual(issue.last_activity_at.date(), datetime.date.today())
+
+
+class CascadeDeleteTest(SoftDeskTestCase):
+    """
+    Deleting a project or an issue runs as many queries whatever the number
+    of the rows of its cascade, and keeps the versions and counters right
+    """
+    def add_project(self, issues, comments):
+        project = Project.objects.create(title='Other', author_user=self.owner)
+        for i in range(issues):
+            issue = Issue.objects.create(title=f'Issue {i}', project=project,
+                                         author_user=self.owner, assignee_user=self.owner)
+            Importer({'project': {}, 'issue': {}}).insert(Comment, [
+                Comment(description=f'Comment {j}', author_user=self.owner, issue=issue)
+                for j in range(comments)])
+        return project
+
+    def delete_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        return len(context.captured_queries)
+
+    def test_project(self):
+        self.client.force_authenticate(self.owner)
+        counts = [self.delete_queries(f'/projects/{self.add_project(*size).pk}/')
+                  for size in ((1, 2), (3, 30))]
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_issue(self):
+        self.client.force_authenticate(self.owner)
+        project = self.add_project(3, 0)
+        version = Project.objects.get(pk=project.pk).version
+        counts = []
+        for issue, comments in zip(Issue.objects.filter(project=project), (1, 2, 60)):
+            Importer({'project': {}, 'issue': {}}).insert(Comment, [
+                Comment(description=f'Comment {j}', author_user=self.owner, issue=issue)
+                for j in range(comments)])
+            counts.append(self.delete_queries(f'/projects/{project.pk}/issues/{issue.pk}/'))
+        self.assertEqual(len(set(counts)), 1, counts)
+        project.refresh_from_db()
+        # one bump per comment insert and per deletion
+        self.assertEqual(project.version, version + 6)
+        self.assertEqual(verify([project.pk]), [])
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN is specific to SQLite")
+class QueryPlanTest(SoftDeskTestCase):
+    """
+    No query run by an endpoint falls back to a full table scan or to a temporary
+    B-tree to sort its rows
+    """
+    forbidden = re.compile(r'^(SCAN (?!CONSTANT ROW)|USE TEMP B-TREE FOR)')
+
+    def setUp(self):
+        super().setUp()
+        self.add_issues(3, comments=2)
+        other = Project.objects.create(title='Other', author_user=self.member)
+        Contributor.objects.create(user=self.owner, project=other)
+
+    def query_plans(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400, url)
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                yield query['sql'], [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedQueries(self, method, url, data=None):
+        for sql, plan in self.query_plans(method, url, data):
+            for step in plan:
+                self.assertIsNone(self.forbidden.match(step),
+                                  f"{method.upper()} {url}\n{sql}\n" + '\n'.join(plan))
+
+    def test_projects(self):
+        self.assertIndexedQueries('get', '/projects/')
+        self.assertIndexedQueries('get', '/projects/?pagination=keyset')
+        self.assertIndexedQueries('get', f'/projects/{self.project.pk}/')
+
+    def test_contributors(self):
+        self.assertIndexedQueries('get', f'/projects/{self.project.pk}/users/')
+        self.assertIndexedQueries('get', f'/projects/{self.project.pk}/users/?pagination=keyset')
+        self.client.force_authenticate(self.owner)
+        self.assertIndexedQueries('delete', f'/projects/{self.project.pk}/users/{self.member.pk}/')
+
+    def test_issues(self):
+        issue = Issue.objects.first()
+        self.assertIndexedQueries('get', f'/projects/{self.project.pk}/issues/')
+        self.assertIndexedQueries('get', f'/projects/{self.project.pk}/issues/?pagination=keyset')
+        self.assertIndexedQueries('post', f'/projects/{self.project.pk}/issues/',
+                                  {'title': 'New', 'assignee_user_id': self.member.pk})
+        self.client.force_authenticate(self.owner)
+        self.assertIndexedQueries('put', f'/projects/{self.project.pk}/issues/{issue.pk}/',
+                                  {'title': 'Updated', 'assignee_user_id': self.member.pk})
+
+    def test_export(self):
+        with CaptureQueriesContext(connection) as context:
+            b''.join(ProjectExport(self.project.pk, chunk_size=2).ndjson())
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = [row[-1] for row in cursor.fetchall()]
+                for step in plan:
+                    self.assertIsNone(self.forbidden.match(step),
+                                      query['sql'] + '\n' + '\n'.join(plan))
+
+    def test_issue_filters(self):
+        url = f'/projects/{self.project.pk}/issues/'
+        for query_string in ('?status=INP', f'?assignee_user={self.member.pk}&status=INP',
+                             '?time_created_after=2021-01-01&ordering=-time_created',
+                             '?ordering=-comment_count', '?ordering=-last_activity_at'):
+            self.assertIndexedQueries('get', url + query_string)
+            self.assertIndexedQueries('get', url + query_string + '&pagination=keyset')
+
+    def test_comments(self):
+        issue = Issue.objects.first()
+        comment = Comment.objects.filter(issue=issue).first()
+        url = f'/projects/{self.project.pk}/issues/{issue.pk}/comments/'
+        self.assertIndexedQueries('get', url)
+        self.assertIndexedQueries('get', url + '?pagination=keyset')
+        self.assertIndexedQueries('get', f'{url}{comment.pk}/')
+        self.assertIndexedQueries('post', url, {'description': 'New'})
+
+
+@skipUnless(connection.vendor == 'sqlite', "PRAGMAs are specific to SQLite")
+class SqlitePragmasTest(TestCase):
+    """
+    The PRAGMAs of the database profile are applied to the new connections
+    """
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_applied(self):
+        pragmas = {'cache_size': self.pragma('cache_size'),
+                   'busy_timeout': self.pragma('busy_timeout')}
+        with self.settings(SOFT_DESK_SQLITE_PRAGMAS={'cache_size': -4321, 'busy_timeout': 1234}):
+            apply_sqlite_pragmas(sender=connection.__class__, connection=connection)
+        self.assertEqual((self.pragma('cache_size'), self.pragma('busy_timeout')), (-4321, 1234))
+        with self.settings(SOFT_DESK_SQLITE_PRAGMAS=pragmas):
+            apply_sqlite_pragmas(sender=connection.__class__, connection=connection)
+
+
+class BulkCreateTest(SoftDeskTestCase):
+    """
+    The create endpoints accept a list payload, validated as a whole
+    """
+    def test_primary_keys(self):
+        self.add_issues(2)
+        first, second = Issue.objects.order_by('issue_id')
+        comments = [Comment(description=f'Comment {i}', author_user=self.owner, issue=first)
+                    for i in range(3)]
+        bulk_create_with_pks(Comment, comments, issue=first)
+        # a row of another scope inserted later is not taken
+        Comment.objects.create(description='Other', author_user=self.owner, issue=second)
+        self.assertEqual([comment.pk for comment in comments],
+                         list(Comment.objects.filter(issue=first).order_by('pk')
+                              .values_list('pk', flat=True)))
+        self.assertEqual([Comment.objects.get(pk=comment.pk).description
+                          for comment in comments], ['Comment 0', 'Comment 1', 'Comment 2'])
+
+    def test_issues(self):
+        url = f'/projects/{self.project.pk}/issues/'
+        payload = [{'title': f'Issue {i}', 'assignee_user_id': self.member.pk} for i in range(50)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertLess(len(context.captured_queries), 10)
+        self.assertEqual([issue['title'] for issue in response.json()],
+                         [issue['title'] for issue in payload])
+        self.assertEqual(Issue.objects.filter(project=self.project, title='Issue 7').get().pk,
+                         response.json()[7]['issue_id'])
+
+    def test_errors_per_item(self):
+        url = f'/projects/{self.project.pk}/issues/'
+        stranger = User.objects.create(email='stranger@example.com')
+        payload = [{'title': 'Valid', 'assignee_user_id': self.member.pk},
+                   {'title': 'Stranger', 'assignee_user_id': stranger.pk},
+                   {'title': 'Valid', 'assignee_user_id': self.owner.pk}]
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([list(errors) for errors in response.json()],
+                         [[], ['assignee_user_id'], ['title']])
+        payload.append({'assignee_user_id': self.owner.pk})
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([list(errors) for errors in response.json()],
+                         [[], [], [], ['title']])
+        self.assertFalse(Issue.objects.exists())
+
+    def test_comments_and_contributors(self):
+        self.add_issues(1)
+        issue = Issue.objects.get()
+        response = self.client.post(
+            f'/projects/{self.project.pk}/issues/{issue.pk}/comments/',
+            [{'description': 'First'}, {'description': 'Second'}], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([comment['description'] for comment in response.json()],
+                         ['First', 'Second'])
+        users = [User.objects.create(email=f'new{i}@example.com') for i in range(3)]
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(f'/projects/{self.project.pk}/users/',
+                                    [{'user_id': user.pk, 'role': 'DEV'} for user in users],
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(all(user.is_contributor(self.project) for user in users))
+
+
+class ConditionalGetTest(SoftDeskTestCase):
+    """
+    List and retrieve responses carry an ETag, which changes with any write
+    """
+    def test_not_modified(self):
+        self.add_issues(2, comments=1)
+        issue = Issue.objects.first()
+        urls = [f'/projects/{self.project.pk}/',
+                f'/projects/{self.project.pk}/users/',
+                f'/projects/{self.project.pk}/issues/',
+                f'/projects/{self.project.pk}/issues/{issue.pk}/comments/']
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        for url, etag in etags.items():
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b'')
+        self.client.post(f'/projects/{self.project.pk}/issues/{issue.pk}/comments/',
+                         {'description': 'New'}, format='json')
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag)
+
+
+class ResponseCacheTest(SoftDeskTestCase):
+    """
+    The list responses are served from the cache until a write changes the version
+    """
+    def setUp(self):
+        super().setUp()
+        self.add_issues(2, comments=2)
+        self.issue = Issue.objects.first()
+        self.urls = [f'/projects/{self.project.pk}/users/',
+                     f'/projects/{self.project.pk}/issues/?page=1',
+                     f'/projects/{self.project.pk}/issues/{self.issue.pk}/comments/']
+
+    def response_cache_settings(self, cache_alias):
+        return self.settings(SOFT_DESK_RESPONSE_CACHE={
+            'ENDPOINTS': ('contributors', 'issues', 'comments'),
+            'CACHE_ALIAS': cache_alias})
+
+    def test_cached(self):
+        with tempfile.TemporaryDirectory() as location:
+            backends = {
+                'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'file': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                         'LOCATION': location},
+            }
+            for cache_alias in backends:
+                with self.settings(CACHES={'default': backends['locmem'],
+                                           'shared': backends['locmem'], **backends}), \
+                        self.response_cache_settings(cache_alias):
+                    caches[cache_alias].clear()
+                    self.assertCached()
+
+    def assertCached(self):
+        expected = {url: self.client.get(url).content for url in self.urls}
+        for url in self.urls:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.content, expected[url])
+        get_response_cache().local.clear()
+        for url in self.urls:
+            with self.assertNumQueries(1):
+                self.assertEqual(self.client.get(url).content, expected[url])
+        self.assertEqual(get_response_cache().shared_hits, len(self.urls))
+        self.client.post(self.urls[-1], {'description': 'New'}, format='json')
+        self.assertGreater(self.count_queries(self.urls[1]), 1)
+        self.assertNotEqual(self.client.get(self.urls[-1]).content, expected[self.urls[-1]])
+
+    def test_expanded_not_cached(self):
+        url = self.urls[1] + '&expand=assignee_user'
+        with self.response_cache_settings(None):
+            response = self.client.get(url)
+            self.assertNotIn('ETag', response)
+            self.member.first_name = 'Renamed'
+            self.member.save()
+            issue = self.client.get(url).json()['results'][0]
+            self.assertEqual(issue['assignee_user']['first_name'], 'Renamed')
+
+    def test_comment_eviction_without_query(self):
+        comment = Comment.objects.filter(issue=self.issue).first()
+        comment.description = 'Changed'
+        # the update and the bumps of the issue and of the project
+        with self.assertNumQueries(3):
+            comment.save()
+
+    def test_permission_checked(self):
+        with self.response_cache_settings(None):
+            self.client.get(self.urls[1])
+            stranger = User.objects.create(email='stranger@example.com')
+            self.client.force_authenticate(stranger)
+            self.assertEqual(self.client.get(self.urls[1]).status_code, 403)
+
+    def test_memory_budget(self):
+        cache = LRUCache(max_entries=10, max_size=10, get_size=len)
+        cache.set('a', b'1234')
+        cache.set('b', b'1234')
+        cache.get('a')
+        cache.set('c', b'1234')
+        cache.set('d', b'12345678901')
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c'), cache.get('d')),
+                         (b'1234', None, b'1234', None))
+        self.assertEqual(cache.size, 8)
+
+
+class RendererTest(SoftDeskTestCase):
+    """
+    FastJSONRenderer renders the bytes of JSONRenderer, with or without orjson,
+    and MessagePack is negotiated only when msgpack is installed
+    """
+    data = {
+        'count': 2 ** 70,
+        'results': [{'title': 'Ünïcode "quoted" \u2028 line', 'desc': 'back\\slash\ttab \x00',
+                     'time_created': datetime.datetime(2021, 5, 4, 3, 2, 1, 123456,
+                                                       tzinfo=datetime.timezone.utc),
+                     'amount': decimal.Decimal('1.10'), 'label': gettext_lazy('Task'),
+                     'tags': ('BF', 'NF'), 'none': None, 'flag': True}],
+    }
+
+    def test_byte_identical(self):
+        data = {**self.data, 'count': 2}
+        expected = JSONRenderer().render(data)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        # integers out of the range of orjson
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        with mock.patch('soft_desk.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+        context = {'indent': 2}
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json', context),
+                         JSONRenderer().render(data, 'application/json', context))
+
+    def test_endpoint(self):
+        self.add_issues(2)
+        url = f'/projects/{self.project.pk}/issues/'
+        response = self.client.get(url)
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    @skipIf(MessagePackRenderer.available, "msgpack is installed")
+    def test_msgpack_unavailable(self):
+        url = f'/projects/{self.project.pk}/issues/'
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT='application/msgpack').status_code,
+                         406)
+        response = self.client.post(url, b'\x80', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 415)
+
+    @skipUnless(MessagePackRenderer.available, "msgpack is not installed")
+    def test_msgpack(self):
+        url = f'/projects/{self.project.pk}/issues/'
+        body = msgpack.packb({'title': 'Packed', 'assignee_user_id': self.member.pk})
+        response = self.client.post(url, body, content_type='application/msgpack',
+                                    HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['title'], 'Packed')
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['results'][0]['title'], 'Packed')
+
+
+class ExportTest(SoftDeskTestCase):
+    """
+    The issues and comments of the project are streamed by keyset chunks
+    """
+    def setUp(self):
+        super().setUp()
+        self.add_issues(5, comments=3)
+        Comment.objects.filter(issue=Issue.objects.order_by('issue_id')[1]).delete()
+        other = Project.objects.create(title='Other', author_user=self.member)
+        Issue.objects.create(title='Other', project=other, author_user=self.member,
+                             assignee_user=self.member)
+        self.url = f'/projects/{self.project.pk}/export/'
+        self.expected = []
+        for issue in Issue.objects.filter(project=self.project).order_by('issue_id'):
+            self.expected.append(('issue', issue.pk))
+            self.expected += [('comment', comment.pk)
+                              for comment in issue.comment_set.order_by('comment_id')]
+
+    def test_ndjson(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in
+                   b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(record['type'], record[f"{record['type']}_id"])
+                          for record in records], self.expected)
+        issue = Issue.objects.order_by('issue_id').first()
+        expected = self.client.get(f'/projects/{self.project.pk}/issues/').json()['results'][0]
+        self.assertEqual(records[0], {'type': 'issue', **expected})
+        self.assertEqual(records[1]['issue_id'], issue.pk)
+
+    def test_chunks(self):
+        export = ProjectExport(self.project.pk, chunk_size=2)
+        with CaptureQueriesContext(connection) as context:
+            records = [(kind, record[f'{kind}_id']) for kind, record in export.records()]
+        self.assertEqual(records, self.expected)
+        # issues by 2, 2 and 1, with their 3, 6 and 3 comments by 2
+        self.assertEqual(len(context.captured_queries), 3 + 2 + 4 + 2)
+
+    def test_csv(self):
+        response = self.client.get(self.url, {'output': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(row['type'], int(row[f"{row['type']}_id"])) for row in rows],
+                         self.expected)
+        self.assertEqual(rows[1]['description'], 'Comment 0')
+        self.assertEqual(rows[1]['title'], '')
+
+    def test_permission_and_output(self):
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+        self.client.force_authenticate(User.objects.create(email='stranger@example.com'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class ImportTest(SoftDeskTestCase):
+    """
+    The import command inserts the records by chunks, and resumes from its checkpoint
+    """
+    records = [
+        {'type': 'project', 'ref': 'P1', 'title': 'Imported', 'project_type': 'F',
+         'author_email': 'owner@example.com'},
+        {'type': 'contributor', 'project_ref': 'P1', 'user_email': 'member@example.com',
+         'role': 'DEV'},
+        {'type': 'issue', 'ref': 1, 'project_ref': 'P1', 'title': 'First', 'status': 'INP',
+         'author_email': 'owner@example.com', 'assignee_email': 'member@example.com',
+         'time_created': '2019-03-01T10:00:00Z'},
+        {'type': 'comment', 'issue_ref': 1, 'description': 'Hello',
+         'author_email': 'member@example.com'},
+        {'type': 'issue', 'ref': 2, 'project_ref': 'P1', 'title': 'Second',
+         'author_email': 'owner@example.com', 'assignee_email': 'new@example.com'},
+        {'type': 'issue', 'ref': 3, 'project_ref': 'P1', 'title': 'First',
+         'author_email': 'owner@example.com', 'assignee_email': 'member@example.com'},
+        {'type': 'issue', 'ref': 4, 'project_ref': 'P1', 'title': 'Third', 'tag': 'XX',
+         'author_email': 'owner@example.com', 'assignee_email': 'member@example.com'},
+        {'type': 'comment', 'issue_ref': 1, 'description': 'Again',
+         'author_email': 'owner@example.com'},
+        {'type': 'comment', 'issue_ref': 2, 'description': 'Lost',
+         'author_email': 'owner@example.com'},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/import.ndjson'
+        with open(self.path, 'w') as f:
+            f.write('\n'.join(json.dumps(record) for record in self.records) + '\nnot json\n')
+
+    def run_import(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_projects', self.path, '--chunk-size', '4', *args,
+                     stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import(self):
+        out, err = self.run_import()
+        project = Project.objects.get(title='Imported')
+        self.assertEqual((project.type, project.author_user), ('F', self.owner))
+        self.assertEqual(Contributor.objects.get(project=project).role, 'DEV')
+        first = Issue.objects.get(project=project, title='First')
+        self.assertEqual((first.status, first.assignee_user), ('INP', self.member))
+        self.assertEqual(first.time_created.year, 2019)
+        self.assertEqual(list(first.comment_set.order_by('comment_id')
+                              .values_list('description', flat=True)), ['Hello', 'Again'])
+        self.assertEqual(Issue.objects.filter(project=project).count(), 1)
+        errors = err.splitlines()
+        self.assertEqual(errors[:2], ['record 5: assignee_email: no user new@example.com',
+                                      'record 6: this issue already exists'])
+        self.assertTrue(errors[2].startswith('record 7: tag: '))
+        self.assertEqual(errors[3:], [
+            'record 9: issue_ref: no issue 2 in the file',
+            'record 10: invalid JSON: Expecting value: line 1 column 1 (char 0)'])
+        self.assertIn('1 projects, 1 contributors, 1 issues, 2 comments, 5 rejected', out)
+        # a finished import is not run again
+        self.run_import()
+        self.assertEqual(Comment.objects.filter(issue=first).count(), 2)
+
+    def test_create_users_and_versions(self):
+        self.run_import('--create-users')
+        user = User.objects.get(email='new@example.com')
+        self.assertFalse(user.is_active or user.has_usable_password())
+        second = Issue.objects.get(title='Second', assignee_user=user)
+        self.assertEqual(second.comment_set.get().description, 'Lost')
+        self.assertGreater(second.project.version, 0)
+        with open(self.path, 'w') as f:
+            f.write(json.dumps({'type': 'project', 'ref': 'P2', 'title': 'Default type',
+                                'author_email': 'owner@example.com'}))
+        self.run_import('--restart')
+        self.assertEqual(Project.objects.get(title='Default type').type, 'B')
+
+    def test_resume(self):
+        import_chunk = Importer.import_chunk
+        calls = []
+
+        def failing(importer, records, checkpoint=None):
+            calls.append(records)
+            if len(calls) == 2:
+                raise RuntimeError('interrupted')
+            return import_chunk(importer, records, checkpoint)
+        with mock.patch.object(Importer, 'import_chunk', failing):
+            with self.assertRaises(RuntimeError):
+                self.run_import()
+        self.assertEqual(Issue.objects.filter(title='First').count(), 1)
+        self.assertFalse(Comment.objects.filter(description='Again').exists())
+        out, err = self.run_import()
+        self.assertIn('resuming after record 4', out)
+        first = Issue.objects.get(title='First')
+        self.assertEqual(first.comment_set.count(), 2)
+        self.assertIn('1 projects, 1 contributors, 1 issues, 2 comments, 5 rejected', out)
+
+    def test_repeated_refs(self):
+        issue = {'type': 'issue', 'project_ref': 'P1', 'author_email': 'owner@example.com',
+                 'assignee_email': 'member@example.com'}
+        records = [
+            self.records[0],
+            {**issue, 'ref': 1, 'title': 'First'},
+            {**issue, 'ref': 1, 'title': 'Same chunk'},
+            {'type': 'comment', 'issue_ref': 1, 'description': 'Hello',
+             'author_email': 'member@example.com'},
+            # the next chunk
+            {**self.records[0], 'title': 'Next chunk'},
+            {**issue, 'ref': 1, 'title': 'Next chunk'},
+            {'type': 'comment', 'issue_ref': 1, 'description': 'Again',
+             'author_email': 'owner@example.com'},
+        ]
+        with open(self.path, 'w') as f:
+            f.write('\n'.join(json.dumps(record) for record in records))
+        out, err = self.run_import()
+        self.assertEqual(err.splitlines(), ['record 3: ref 1 already used',
+                                            'record 5: ref P1 already used',
+                                            'record 6: ref 1 already used'])
+        first = Issue.objects.get()
+        self.assertEqual(first.title, 'First')
+        self.assertEqual(sorted(first.comment_set.values_list('description', flat=True)),
+                         ['Again', 'Hello'])
+        self.assertIn('1 projects, 0 contributors, 1 issues, 2 comments, 3 rejected', out)
+
+    def test_checkpoint_in_chunk_transaction(self):
+        # a crash after the inserts of a chunk also rolls back its progress
+        advance = Checkpoint.advance
+        calls = []
+
+        def failing(checkpoint, *args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('interrupted')
+            return advance(checkpoint, *args)
+        with mock.patch.object(Checkpoint, 'advance', failing):
+            with self.assertRaises(RuntimeError):
+                self.run_import()
+        self.assertEqual(ImportCheckpoint.objects.get().position, 4)
+        self.assertFalse(Comment.objects.filter(description='Again').exists())
+        out, err = self.run_import()
+        self.assertIn('resuming after record 4', out)
+        self.assertEqual(Comment.objects.filter(description='Again').count(), 1)
+        self.assertEqual(Issue.objects.get(title='First').time_created.year, 2019)
+
+
+class ProjectStatsTest(SoftDeskTestCase):
+    """
+    The counters of issues by status, priority and tag follow every write of issues
+    """
+    def get_stats(self):
+        response = self.client.get(f'/projects/{self.project.pk}/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_writes(self):
+        url = f'/projects/{self.project.pk}/issues/'
+        self.client.force_authenticate(self.owner)
+        payload = [{'title': f'Issue {i}', 'priority': 'H', 'assignee_user_id': self.member.pk}
+                   for i in range(3)]
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        issue_id = response.json()[0]['issue_id']
+        payload = {'title': 'Task', 'tag': 'TA', 'assignee_user_id': self.member.pk}
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        payload = {'status': 'COM', 'priority': 'U', 'assignee_user_id': self.member.pk}
+        response = self.client.put(f'{url}{issue_id}/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.delete(f"{url}{response.json()['issue_id'] + 1}/")
+        self.assertEqual(response.status_code, 204)
+        issue = Issue.objects.only('issue_id').get(title='Task')
+        issue.title = 'Renamed'
+        issue.save(update_fields=['title'])
+        Issue.objects.get(title='Renamed').delete()
+        stats = self.get_stats()
+        self.assertEqual(stats['issues'], 2)
+        self.assertEqual(stats['status'], {'NEW': 1, 'INP': 0, 'COM': 1, 'REJ': 0, 'CLO': 0})
+        self.assertEqual(stats['priority'], {'L': 0, 'N': 0, 'H': 1, 'U': 1, 'I': 0})
+        self.assertEqual(stats['tag'], {'BF': 2, 'NF': 0, 'TA': 0})
+        self.assertEqual(verify([self.project.pk]), [])
+
+    def test_stored_values_read_on_save(self):
+        # loading issues snapshots nothing, a save reads the counted fields it may change
+        self.add_issues(1)
+        self.assertFalse(post_init.has_listeners(Issue))
+        issue = Issue.objects.get()
+
+        def issue_selects(**kwargs):
+            with CaptureQueriesContext(connection) as context:
+                issue.save(**kwargs)
+            return sum(query['sql'].startswith('SELECT') and 'FROM "soft_desk_issue"'
+                       in query['sql'] for query in context.captured_queries)
+        issue.title = 'Renamed'
+        self.assertEqual(issue_selects(update_fields=['title']), 0)
+        issue.status = 'COM'
+        self.assertEqual(issue_selects(), 1)
+        self.assertEqual(self.get_stats()['status']['COM'], 1)
+        self.assertEqual(verify([self.project.pk]), [])
+
+    def test_access_and_etag(self):
+        self.add_issues(2)
+        url = f'/projects/{self.project.pk}/stats/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.add_issues(1)
+        self.assertEqual(self.get_stats()['issues'], 3)
+        self.client.force_authenticate(User.objects.create(email='stranger@example.com'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_command(self):
+        self.add_issues(3)
+        call_command('project_stats', stdout=io.StringIO())
+        # QuerySet.update() bypasses the signals
+        Issue.objects.filter(project=self.project).update(status='CLO')
+        err = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('project_stats', stdout=io.StringIO(), stderr=err)
+        self.assertIn(f'project {self.project.pk}: status CLO is 0, 3 issues', err.getvalue())
+        call_command('project_stats', '--rebuild', '--project', str(self.project.pk),
+                     stdout=io.StringIO())
+        self.assertEqual(self.get_stats()['status']['CLO'], 3)
+        call_command('project_stats', stdout=io.StringIO())
+
+
+class TokenCacheTest(SoftDeskTestCase):
+    """
+    A verified token skips the signature check and the User query, until the user changes
+    """
+    def setUp(self):
+        super().setUp()
+        get_token_cache().clear()
+        self.client.force_authenticate(None)
+        token = jwt_encode_handler(jwt_payload_handler(self.member))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_cached(self):
+        url = f'/projects/{self.project.pk}/issues/'
+        queries = self.count_queries(url)
+        with mock.patch('rest_framework_jwt.authentication.jwt_decode_handler') as decode:
+            self.assertEqual(self.count_queries(url), queries - 1)
+        decode.assert_not_called()
+        self.assertEqual(get_token_cache().stats()['hits'], 1)
+
+    def test_other_process(self):
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                  'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                             'LOCATION': 'token-test'}}
+        with self.settings(CACHES=caches,
+                           SOFT_DESK_TOKEN_CACHE={'MAX_ENTRIES': 100, 'TIMEOUT': 300,
+                                                  'CACHE_ALIAS': 'shared'}):
+            # another process, which has verified the token before the deactivation
+            other = TokenCache(max_entries=100, timeout=300, cache_alias='shared')
+            token = jwt_encode_handler(jwt_payload_handler(self.member))
+            other.set(token, {}, self.member)
+            self.assertEqual(other.get(token), self.member)
+            self.member.is_active = False
+            self.member.save()
+            self.assertIsNone(other.get(token))
+            self.assertEqual(other.stats(), {'hits': 1, 'misses': 1, 'size': 0})
+
+    def test_invalidated(self):
+        url = f'/projects/{self.project.pk}/'
+        self.count_queries(url)
+        self.member.is_active = False
+        self.member.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class PasswordTest(TestCase):
+    """
+    Passwords are hashed at signup and verified by the hasher at login
+    """
+    def setUp(self):
+        self.client = APIClient()
+
+    def signup_and_login(self):
+        response = self.client.post('/signup/', {'email': 'new@example.com',
+                                                 'password': 'N3wpolo6',
+                                                 'first_name': 'New', 'last_name': 'User'})
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('password', response.json())
+        self.assertTrue(User.objects.get().password.startswith('pbkdf2_sha256$1000$'))
+        response = self.client.post('/login/', {'email': 'new@example.com',
+                                                'password': 'N3wpolo6'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.json())
+        response = self.client.post('/login/', {'email': 'new@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_inline(self):
+        with self.settings(SOFT_DESK_PASSWORDS={'ITERATIONS': 1000, 'WORKERS': 0}):
+            self.signup_and_login()
+
+    def test_pool(self):
+        with self.settings(SOFT_DESK_PASSWORDS={'ITERATIONS': 1000, 'WORKERS': 1}):
+            self.signup_and_login()
+
+    def test_same_failure_for_unknown_email(self):
+        with self.settings(SOFT_DESK_PASSWORDS={'ITERATIONS': 1000, 'WORKERS': 0}):
+            self.signup_and_login()
+            wrong = self.client.post('/login/', {'email': 'new@example.com',
+                                                 'password': 'wrong'})
+            with mock.patch('soft_desk.passwords.hashers.make_password',
+                            wraps=hashers.make_password) as make_password:
+                unknown = self.client.post('/login/', {'email': 'unknown@example.com',
+                                                       'password': 'wrong'})
+            # the unknown email costs a hashing too
+            make_password.assert_called_once_with('wrong')
+            User.objects.update(is_active=False)
+            inactive = self.client.post('/login/', {'email': 'new@example.com',
+                                                    'password': 'N3wpolo6'})
+        for response in (unknown, inactive):
+            self.assertEqual((response.status_code, response.json()),
+                             (wrong.status_code, wrong.json()))
+
+    def test_cost_upgraded_at_login(self):
+        with self.settings(SOFT_DESK_PASSWORDS={'ITERATIONS': 1000, 'WORKERS': 0}):
+            self.signup_and_login()
+        with self.settings(SOFT_DESK_PASSWORDS={'ITERATIONS': 2000, 'WORKERS': 0}):
+            self.client.post('/login/', {'email': 'new@example.com', 'password': 'N3wpolo6'})
+        self.assertTrue(User.objects.get().password.startswith('pbkdf2_sha256$2000$'))
+
+
+class AsyncViewTest(SoftDeskFixtures, TransactionTestCase):
+    """
+    The async entry points serve the bytes of the synchronous endpoints
+    """
+    def setUp(self):
+        super().setUp()
+        self.add_issues(2, comments=2)
+        issue = Issue.objects.first()
+        comment = Comment.objects.filter(issue=issue).first()
+        self.urls = ['/projects/',
+                     f'/projects/{self.project.pk}/',
+                     f'/projects/{self.project.pk}/issues/',
+                     f'/projects/{self.project.pk}/issues/{issue.pk}/comments/',
+                     f'/projects/{self.project.pk}/issues/{issue.pk}/comments/{comment.pk}/']
+        token = jwt_encode_handler(jwt_payload_handler(self.member))
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.async_client = AsyncClient()
+        self.authorization = f'Bearer {token}'
+
+    async def test_same_content(self):
+        for url in self.urls:
+            expected = await sync_to_async(self.client.get)(url)
+            responses = await asyncio.gather(*[
+                self.async_client.get('/async' + url, authorization=self.authorization)
+                for _ in range(5)])
+            for response in responses:
+                self.assertEqual(response.status_code, 200, url)
+                self.assertEqual(response.content.replace(b'/async/', b'/'), expected.content)
+
+    async def test_timed_queries(self):
+        # the queries run in the threads of the async views count for the request
+        with self.settings(SOFT_DESK_TIMING={'ENABLED': True, 'SERVER_TIMING': 'all'}), \
+                self.assertLogs('soft_desk.timing'):
+            response = await self.async_client.get('/async' + self.urls[2],
+                                                   authorization=self.authorization)
+        queries = re.search(r'desc="queries=(\d+)"', response['Server-Timing']).group(1)
+        self.assertGreater(int(queries), 0)
+
+    async def test_permission_checked(self):
+        response = await self.async_client.get('/async' + self.urls[2])
+        self.assertEqual(response.status_code, 401)
+        stranger = await sync_to_async(User.objects.create)(email='stranger@example.com')
+        token = jwt_encode_handler(jwt_payload_handler(stranger))
+        response = await self.async_client.get('/async' + self.urls[2],
+                                               authorization=f'Bearer {token}')
+        self.assertEqual(response.status_code, 403)
+
+
+class ReadReplicaRouterTest(TestCase):
+    """
+    The safe requests to the soft_desk views read from a replica, unless the
+    client has just written
+    """
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.caches = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                       'LOCATION': directory.name},
+        }
+
+    def route(self, method, view_func, status=200):
+        router = ReadReplicaRouter()
+
+        def get_response(request):
+            middleware.process_view(request, view_func, (), {})
+            return HttpResponse(str(router.db_for_read(Issue)), status=status)
+        middleware = ReadReplicaMiddleware(get_response)
+        request = getattr(RequestFactory(), method)('/', HTTP_AUTHORIZATION='Bearer token')
+        return middleware(request).content.decode()
+
+    def test_routing(self):
+        issues = IssueViewSet.as_view({'get': 'list', 'post': 'create'})
+        with self.settings(CACHES=self.caches,
+                           SOFT_DESK_READ_REPLICAS={'ALIASES': ['replica1'],
+                                                    'STICKY_SECONDS': 5,
+                                                    'CACHE_ALIAS': 'shared'}):
+            self.assertEqual(self.route('get', issues), 'replica1')
+            self.assertEqual(self.route('get', admin.site.index), 'None')
+            self.assertEqual(self.route('post', issues, status=400), 'None')
+            self.assertEqual(self.route('get', issues), 'replica1')
+            self.assertEqual(self.route('post', issues, status=201), 'None')
+            self.assertEqual(self.route('get', issues), 'None')
+        self.assertIsNone(ReadReplicaRouter().db_for_read(Issue))
+        self.assertEqual(ReadReplicaRouter().db_for_write(Issue), 'default')
+
+    def test_shared_cache_required(self):
+        for cache_alias in (None, 'default'):
+            with self.settings(CACHES=self.caches,
+                               SOFT_DESK_READ_REPLICAS={'ALIASES': ['replica1'],
+                                                        'CACHE_ALIAS': cache_alias}):
+                with self.assertRaises(ImproperlyConfigured):
+                    ReadReplicaMiddleware(HttpResponse)
+
+
+class ReadReplicaDatabaseTest(SoftDeskFixtures, TransactionTestCase):
+    """
+    The reads go to a replica in another SQLite file, except the ones of a
+    client which has just written, recorded in a cache shared between processes
+    """
+    alias = 'replica_test'
+
+    def setUp(self):
+        super().setUp()
+        self.add_issues(1)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        connections.settings[self.alias] = {**connections['default'].settings_dict,
+                                            'NAME': f'{directory.name}/replica.sqlite3'}
+        self.addCleanup(self.remove_replica)
+        # the replica is a copy of the primary at this point
+        connections['default'].ensure_connection()
+        replica = sqlite3.connect(connections.settings[self.alias]['NAME'])
+        connections['default'].connection.backup(replica)
+        replica.close()
+        self.settings_override = self.settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                           'LOCATION': f'{directory.name}/cache'},
+            },
+            SOFT_DESK_READ_REPLICAS={'ALIASES': [self.alias], 'STICKY_SECONDS': 60,
+                                     'CACHE_ALIAS': 'shared'})
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def remove_replica(self):
+        connections[self.alias].close()
+        del connections[self.alias]
+        del connections.settings[self.alias]
+
+    def authenticated_client(self, user):
+        client = APIClient()
+        token = jwt_encode_handler(jwt_payload_handler(user))
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def list_titles(self, client):
+        response = client.get(f'/projects/{self.project.pk}/issues/')
+        self.assertEqual(response.status_code, 200)
+        return [issue['title'] for issue in response.json()['results']]
+
+    def test_read_your_writes(self):
+        member, owner = self.authenticated_client(self.member), \
+            self.authenticated_client(self.owner)
+        self.assertEqual(self.list_titles(member), ['Issue 0'])
+        response = member.post(f'/projects/{self.project.pk}/issues/',
+                               {'title': 'New', 'assignee_user_id': self.member.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.list_titles(member), ['Issue 0', 'New'])
+        # the replica has not caught up for the other clients
+        self.assertEqual(self.list_titles(owner), ['Issue 0'])
+        # another process, with its own connection to the shared cache, sees the write
+        del caches['shared']
+        self.assertEqual(self.list_titles(self.authenticated_client(self.member)),
+                         ['Issue 0', 'New'])
+
+
+class SearchTest(SoftDeskTestCase):
+    """
+    The issues and comments of the project are searched through the full-text index
+    """
+    def setUp(self):
+        super().setUp()
+        self.issue = Issue.objects.create(title='Crash au démarrage', desc='le serveur plante',
+                                          project=self.project, author_user=self.owner,
+                                          assignee_user=self.member)
+        self.other_issue = Issue.objects.create(title='Lenteur', desc='', project=self.project,
+                                                author_user=self.owner,
+                                                assignee_user=self.member)
+        self.comment = Comment.objects.create(description='Même crash chez moi',
+                                              issue=self.other_issue, author_user=self.member)
+        other = Project.objects.create(title='Other', author_user=self.member)
+        Issue.objects.create(title='Crash', project=other, author_user=self.member,
+                             assignee_user=self.member)
+        self.url = f'/projects/{self.project.pk}/search/'
+
+    def search(self, q):
+        response = self.client.get(self.url, {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [(hit['type'], hit[hit['type']][f"{hit['type']}_id"])
+                for hit in response.json()['results']]
+
+    def test_ranked(self):
+        self.assertEqual(self.search('crash'), [('issue', self.issue.pk),
+                                                ('comment', self.comment.pk)])
+        self.assertEqual(self.search('DEMARR*'), [('issue', self.issue.pk)])
+        self.assertEqual(self.search('serveur plante'), [('issue', self.issue.pk)])
+        self.assertEqual(self.search('serveur lenteur'), [])
+
+    def test_kept_in_sync(self):
+        self.issue.title = 'Écran noir'
+        self.issue.save()
+        self.comment.delete()
+        self.assertEqual(self.search('crash'), [])
+        self.assertEqual(self.search('noir'), [('issue', self.issue.pk)])
+        url = f'/projects/{self.project.pk}/issues/{self.issue.pk}/comments/'
+        response = self.client.post(url, [{'description': 'noir aussi'}], format='json')
+        self.assertEqual(self.search('noir')[1][0], 'comment')
+        self.assertEqual(len(response.json()), 1)
+
+    def test_other_databases(self):
+        with mock.patch.dict(BACKENDS, clear=True):
+            self.assertEqual(self.search('crash'), [('issue', self.issue.pk),
+                                                    ('comment', self.comment.pk)])
+            self.assertEqual(self.search('serveur plan*'), [('issue', self.issue.pk)])
+            response = self.client.get(self.url, {'q': 'crash', 'page_size': 1, 'page': 2})
+            self.assertEqual(response.json()['count'], 2)
+            self.assertEqual(response.json()['results'][0]['type'], 'comment')
+
+    def test_permission_and_query(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.client.force_authenticate(User.objects.create(email='stranger@example.com'))
+        self.assertEqual(self.client.get(self.url, {'q': 'crash'}).status_code, 403)
+
+
+class RequestTimingTest(SoftDeskTestCase):
+    """
+    The measured requests log their queries and timings, and send them in a
+    Server-Timing header to the chosen clients
+    """
+    def metrics(self, response):
+        return [re.match(r'(\w+);dur=[\d.]+', metric).group(1)
+                for metric in response['Server-Timing'].split(', ')]
+
+    def test_server_timing(self):
+        self.add_issues(3, comments=1)
+        url = f'/projects/{self.project.pk}/issues/'
+        with self.settings(SOFT_DESK_TIMING={'ENABLED': True, 'SERVER_TIMING': 'all'}), \
+                CaptureQueriesContext(connection) as context, \
+                self.assertLogs('soft_desk.timing') as logs:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.metrics(response),
+                         ['db', 'permission', 'render', 'serialization', 'total'])
+        queries = len(context.captured_queries)
+        self.assertIn(f'desc="queries={queries}"', response['Server-Timing'])
+        self.assertIn(f'method=GET view=issues-list status=200 queries={queries} ',
+                      logs.output[0])
+        self.assertEqual(logs.records[0].timing['queries'], queries)
+
+    def test_gated(self):
+        url = f'/projects/{self.project.pk}/'
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        with self.settings(SOFT_DESK_TIMING={'ENABLED': True}):
+            with self.assertLogs('soft_desk.timing'):
+                self.assertNotIn('Server-Timing', self.client.get(url))
+            self.owner.staff = True
+            self.owner.save()
+            self.client.force_authenticate(self.owner)
+            with self.assertLogs('soft_desk.timing'):
+                self.assertIn('permission;dur=', self.client.get(url)['Server-Timing'])
+
+
+class SeedBenchmarkTest(TransactionTestCase):
+    """
+    The seeder fills the maintained fields and counters, and the benchmark
+    measures every route on the seeded data
+    """
+    def setUp(self):
+        self.seeder = Seeder(users=20, projects=10, issues=200, comments=600, batch_size=64)
+        list(self.seeder.run())
+
+    def test_seed(self):
+        self.assertEqual([User.objects.count(), Project.objects.count(), Issue.objects.count(),
+                          Comment.objects.count()], [20, 10, 200, 600])
+        self.assertEqual(verify(list(Project.objects.values_list('pk', flat=True))), [])
+        self.assertEqual(sum(Issue.objects.values_list('comment_count', flat=True)), 600)
+        self.assertTrue(self.seeder.exists())
+        with self.assertRaises(CommandError):
+            call_command('seed_dataset', '--users', '1', stdout=io.StringIO())
+
+    def test_benchmark_project(self):
+        first = seed_benchmark_project('test', issues=3, comments=4)
+        second = seed_benchmark_project('test', issues=3, comments=4)
+        self.assertNotEqual(first[0].email, second[0].email)
+        the_issue = Issue.objects.get(pk=first[2].pk)
+        self.assertEqual(the_issue.comment_count, 4)
+        self.assertEqual(verify([first[1].pk, second[1].pk]), [])
+
+    def test_benchmark(self):
+        self.assertEqual(unmeasured_routes(), [])
+        with tempfile.NamedTemporaryFile(suffix='.json') as f:
+            call_command('benchmark_api', '--repeat', '1', '--output', f.name,
+                         stdout=io.StringIO(), stderr=io.StringIO())
+            results = json.load(f)['results']
+        self.assertEqual(len(results), len(SCENARIOS))
+        for result in results:
+            self.assertLess(result['status'], 400, result['name'])
+        self.assertEqual(Comment.objects.count(), 600)
+        self.assertFalse(User.objects.filter(email__startswith='benchmark').exists())
@@ -0,0 +1,122 @@
+import contextvars
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager, nullcontext
+
+from django.conf import settings
+from django.db import connections
+
+DEFAULTS = {
+    # measure every request, and log its timings to the soft_desk.timing logger
+    'ENABLED': False,
+    # clients of the Server-Timing header: 'all', 'staff' or None
+    'SERVER_TIMING': 'staff',
+}
+
+# timings of the current request, None when it is not measured
+_timing = contextvars.ContextVar('soft_desk_timing', default=None)
+
+_untimed = nullcontext()
+
+
+def get_timing_options():
+    return {**DEFAULTS, **getattr(settings, 'SOFT_DESK_TIMING', {})}
+
+
+def get_timing():
+    return _timing.get()
+
+
+class RequestTiming:
+    """
+    Durations, in seconds, of the phases of a request, and its SQL queries
+    counted by the execute wrapper of the database connections. A phase
+    measured again within itself, a nested serializer for instance, is only
+    counted once.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = None
+        self.queries = 0
+        self.durations = defaultdict(float)
+        self.depths = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.durations['db'] += time.perf_counter() - start
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+
+    @contextmanager
+    def measure(self, name):
+        self.depths[name] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.depths[name] -= 1
+            if not self.depths[name]:
+                self.add(name, time.perf_counter() - start)
+
+    def stop(self):
+        self.total = time.perf_counter() - self.start
+
+    def metrics(self):
+        """
+        (name, milliseconds) of the measured phases, db first and total last
+        """
+        names = ['db'] + sorted(name for name in self.durations if name != 'db')
+        return [(name, self.durations[name] * 1000) for name in names] \
+            + [('total', self.total * 1000)]
+
+    def server_timing(self):
+        metrics = [f'{name};dur={ms:.2f}' for name, ms in self.metrics()]
+        metrics[0] += f';desc="queries={self.queries}"'
+        return ', '.join(metrics)
+
+
+def timed(name):
+    """
+    Context manager measuring a phase of the current request, doing nothing
+    when the request is not measured
+    """
+    timing = _timing.get()
+    if timing is None:
+        return _untimed
+    return timing.measure(name)
+
+
+@contextmanager
+def timed_queries():
+    """
+    Count the queries run by the current thread on every database for the
+    current request: the async views run theirs in other threads
+    """
+    timing = _timing.get()
+    if timing is None:
+        yield
+        return
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timing))
+        yield
+
+
+@contextmanager
+def timed_request():
+    """
+    Measure the current request: yield its RequestTiming, stopped on exit
+    """
+    timing = RequestTiming()
+    token = _timing.set(timing)
+    try:
+        with timed_queries():
+            yield timing
+    finally:
+        _timing.reset(token)
+        timing.stop()
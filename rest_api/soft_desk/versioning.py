@@ -0,0 +1,41 @@
+from django.db.models import BigIntegerField, Case, DateTimeField, F, Value, When
+from django.db.models.functions import Greatest
+
+from soft_desk.models import Issue, Project
+
+
+def bump_projects(**lookups):
+    """
+    Bump the version of the projects matching the lookups, in one UPDATE
+    """
+    Project.objects.filter(**lookups).update(version=F('version') + 1)
+
+
+def bump_issues(changes=None, **lookups):
+    """
+    Bump the version of the issues matching the lookups, and apply the other
+    changes of their maintained fields, in one UPDATE
+    """
+    Issue.objects.filter(**lookups).update(version=F('version') + 1, **(changes or {}))
+
+
+def comment_changes(comments, sign=1):
+    """
+    Changes of the comment_count and last_activity_at of the issues when the
+    comments are created, or deleted with a sign of -1
+    """
+    counts = {}
+    latest = {}
+    for comment in comments:
+        counts[comment.issue_id] = counts.get(comment.issue_id, 0) + sign
+        if comment.time_created is not None:
+            latest[comment.issue_id] = max(latest.get(comment.issue_id, comment.time_created),
+                                           comment.time_created)
+    changes = {'comment_count': F('comment_count') + Case(
+        *[When(pk=issue_id, then=Value(count)) for issue_id, count in counts.items()],
+        default=Value(0), output_field=BigIntegerField())}
+    if sign > 0 and latest:
+        changes['last_activity_at'] = Greatest(F('last_activity_at'), Case(
+            *[When(pk=issue_id, then=Value(time)) for issue_id, time in latest.items()],
+            default=F('last_activity_at'), output_field=DateTimeField()))
+    return changes
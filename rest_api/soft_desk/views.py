@@ -1,5 +1,6 @@
 from django.contrib.auth.signals import user_logged_in
-from django.db.models import Q
+from django.db import router
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.db.utils import IntegrityError
 
@@ -7,7 +8,7 @@ from rest_framework import mixins
 from rest_framework import status
 from rest_framework import viewsets
 
-from rest_framework.exceptions import NotFound
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 
 from rest_framework.permissions import AllowAny
@@ -15,28 +16,44 @@ from rest_framework.response import Response
 
 from rest_framework_jwt.settings import api_settings
 
-from soft_desk.mixins import CustomUpdateModelMixin
+from soft_desk.export import ProjectExport
+
+from soft_desk.filters import (
+    QueryParamFilterBackend, TiebreakOrderingFilter, choice_list, datetime_value, integer_list
+)
+
+from soft_desk.mixins import (
+    AccessContextMixin, BulkCreateModelMixin, CachedListMixin, ConditionalGetMixin,
+    CustomUpdateModelMixin, FastListModelMixin, RenderTimingMixin, SparseFieldsetMixin
+)
 
 from soft_desk.models import (
     Comment, Contributor,
     Issue, Project, User
 )
 
+from soft_desk.pagination import SearchPagination
+from soft_desk.passwords import reject_password, verify_password
+
 from soft_desk.permissions import (
-    CommentPermission, ContributorPermission,
-    IssuePermission, ProjectPermission
+    CommentPermission, ContributorPermission, ExportPermission,
+    IssuePermission, ProjectPermission, SearchPermission
 )
 
+from soft_desk.search import SearchResults, parse_terms
+
 from soft_desk.serializers import (
     CommentSerializer, ContributorSerializer, IssueSerializer,
     ProjectSerializer, UserSerializer
 )
 
+from soft_desk.stats import project_stats
+
 jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
 jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
 
 
-class UserSignUpViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
+class UserSignUpViewSet(RenderTimingMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
     """
     class UserSignUpViewSet manages the following endpoint :
     /signup/
@@ -49,7 +66,7 @@ class UserSignUpViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
         serializer.save()
 
 
-class UserLoginViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+class UserLoginViewSet(RenderTimingMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     """
     class UserLoginViewSet manages the following endpoint :
     /login/
@@ -62,8 +79,10 @@ class UserLoginViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         try:
             email = request.data['email']
             password = request.data['password']
-            user = get_object_or_404(User, email=email, password=password)
-            if user:
+            user = User.objects.filter(email=email).first()
+            if user is None:
+                reject_password(password)
+            elif verify_password(user, password) and user.is_active:
                 try:
                     payload = jwt_payload_handler(user)
                     token = jwt_encode_handler(payload)
@@ -76,11 +95,10 @@ class UserLoginViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
                     return Response(user_details, status=status.HTTP_200_OK)
                 except Exception as e:
                     raise e
-            else:
-                res = {
-                    'error': 'can not authenticate with the given credentials \
-                    or the account has been deactivated'}
-                return Response(res, status=status.HTTP_403_FORBIDDEN)
+            res = {
+                'error': 'can not authenticate with the given credentials \
+                or the account has been deactivated'}
+            return Response(res, status=status.HTTP_403_FORBIDDEN)
         except KeyError:
             res = {'error': 'please provide a email and a password'}
             return Response(res, status=status.HTTP_400_BAD_REQUEST)
@@ -91,35 +109,57 @@ class UserLoginViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         return Response(res, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class ProjectViewSet(CustomUpdateModelMixin, viewsets.ModelViewSet):
+class ProjectViewSet(RenderTimingMixin,
+                     AccessContextMixin,
+                     SparseFieldsetMixin,
+                     ConditionalGetMixin,
+                     CustomUpdateModelMixin,
+                     viewsets.ModelViewSet):
     """
     class ProjectViewSet manages the following endpoints :
     /projects/
     /projects/{pk}/
+    /projects/{pk}/stats/
     """
     serializer_class = ProjectSerializer
     permission_classes = (ProjectPermission,)
+    access_model = Project
 
     def get_queryset(self):
         if self.action == 'list':
             the_user = self.request.user
-            list_project_id = [q['project_id'] for q in
-                               Contributor.objects.filter(user=the_user).values('project_id')]
-            return Project.objects.filter(Q(author_user=the_user) |
-                                          Q(project_id__in=list_project_id)).order_by('project_id')
+            return Project.objects.owned_or_contributed_by(the_user).order_by('project_id')
         else:
             return Project.objects.all()
 
+    def get_version(self):
+        if self.action in ('retrieve', 'stats'):
+            return self.get_access_context().project.version
+        return None
+
     def perform_create(self, serializer):
         serializer.save(author_user=self.request.user)
 
+    @action(detail=True)
+    def stats(self, request, *args, **kwargs):
+        """
+        The number of issues of the project by status, priority and tag, read
+        from the counters maintained on every write (see soft_desk.stats)
+        """
+        return Response(project_stats(self.get_access_context().project))
+
     def update(self, request, *args, **kwargs):
         return self.custom_update(request, 'title', **kwargs)
 
 
-class ContributorViewSet(mixins.CreateModelMixin,
+class ContributorViewSet(RenderTimingMixin,
+                         AccessContextMixin,
+                         SparseFieldsetMixin,
+                         ConditionalGetMixin,
+                         BulkCreateModelMixin,
                          mixins.DestroyModelMixin,
-                         mixins.ListModelMixin,
+                         CachedListMixin,
+                         FastListModelMixin,
                          viewsets.GenericViewSet):
     """
     class ContributorViewSet manages the following endpoints :
@@ -128,52 +168,77 @@ class ContributorViewSet(mixins.CreateModelMixin,
     """
     serializer_class = ContributorSerializer
     permission_classes = (ContributorPermission,)
+    access_model = Contributor
 
     def get_queryset(self):
-        the_project = get_object_or_404(Project, pk=self.kwargs['project_pk'])
+        the_project = self.get_access_context().project
         return Contributor.objects.filter(project=the_project).order_by('user_id')
 
-    def get_object(self):
-        the_user = get_object_or_404(User, pk=self.kwargs['pk'])
-        the_project = get_object_or_404(Project, pk=self.kwargs['project_pk'])
-        try:
-            obj = Contributor.objects.get(project=the_project, user=the_user)
-        except Contributor.DoesNotExist:
-            raise NotFound("The contributor does not exist")
-        else:
-            return obj
+    def get_version(self):
+        if self.action == 'list':
+            return self.get_access_context().project.version
+        return None
 
     def perform_create(self, serializer):
         the_user = get_object_or_404(User, pk=serializer._kwargs['data']['user_id'])
-        the_project = get_object_or_404(Project, pk=self.kwargs['project_pk'])
+        the_project = self.get_access_context().project
         try:
             serializer.save(user=the_user, project=the_project)
         except IntegrityError:
             raise ValidationError("this contributor already exists")
 
+    def perform_bulk_create(self, serializer):
+        serializer.save(project=self.get_access_context().project)
 
-class IssueViewSet(mixins.CreateModelMixin,
+
+class IssueViewSet(RenderTimingMixin,
+                   AccessContextMixin,
+                   SparseFieldsetMixin,
+                   ConditionalGetMixin,
+                   BulkCreateModelMixin,
                    CustomUpdateModelMixin,
                    mixins.DestroyModelMixin,
-                   mixins.ListModelMixin,
+                   CachedListMixin,
+                   FastListModelMixin,
                    viewsets.GenericViewSet):
     """
     class IssueViewSet manages the following endpoints :
     /projects/{project_pk}/issues/
     /projects/{project_pk}/issues/{pk}/
+
+    The list is filtered by ?status=, ?priority=, ?tag= (comma-separated
+    values), ?assignee_user=, ?author_user= (comma-separated ids),
+    ?time_created_after= and ?time_created_before= (ISO 8601), and ordered
+    by ?ordering= on issue_id, time_created, comment_count or last_activity_at.
     """
     serializer_class = IssueSerializer
     permission_classes = (IssuePermission,)
+    access_model = Issue
+    filter_backends = (QueryParamFilterBackend, TiebreakOrderingFilter)
+    filter_params = {
+        'status': ('status', choice_list(Issue.Status)),
+        'priority': ('priority', choice_list(Issue.Priority)),
+        'tag': ('tag', choice_list(Issue.Tag)),
+        'assignee_user': ('assignee_user', integer_list),
+        'author_user': ('author_user', integer_list),
+        'time_created_after': ('time_created__gte', datetime_value),
+        'time_created_before': ('time_created__lt', datetime_value),
+    }
+    ordering_fields = ('issue_id', 'time_created', 'comment_count', 'last_activity_at')
 
     def get_queryset(self):
-        the_project = get_object_or_404(Project, pk=self.kwargs['project_pk'])
+        the_project = self.get_access_context().project
         return Issue.objects.filter(project=the_project).order_by('issue_id')
 
+    def get_version(self):
+        if self.action == 'list':
+            return self.get_access_context().project.version
+        return None
+
     def perform_create(self, serializer):
         assignee_user_id = serializer._kwargs['data']['assignee_user_id']
         the_assignee_user = get_object_or_404(User, pk=assignee_user_id)
-        the_project = get_object_or_404(Project,
-                                        pk=self.kwargs['project_pk'])
+        the_project = self.get_access_context().project
         the_author_user = self.request.user
         try:
             serializer.save(assignee_user=the_assignee_user,
@@ -182,11 +247,23 @@ class IssueViewSet(mixins.CreateModelMixin,
         except IntegrityError:
             raise ValidationError("this issue already exists")
 
+    def perform_bulk_create(self, serializer):
+        serializer.save(author_user=self.request.user,
+                        project=self.get_access_context().project)
+
     def update(self, request, *args, **kwargs):
         return self.custom_update(request, 'title', **kwargs)
 
 
-class CommentViewSet(CustomUpdateModelMixin, viewsets.ModelViewSet):
+class CommentViewSet(RenderTimingMixin,
+                     AccessContextMixin,
+                     SparseFieldsetMixin,
+                     ConditionalGetMixin,
+                     BulkCreateModelMixin,
+                     CustomUpdateModelMixin,
+                     CachedListMixin,
+                     FastListModelMixin,
+                     viewsets.ModelViewSet):
     """
     class IssueViewSet manages the following endpoints :
     /projects/{project_pk}/issues/{issue_pk}/comments/
@@ -194,15 +271,86 @@ class CommentViewSet(CustomUpdateModelMixin, viewsets.ModelViewSet):
     """
     serializer_class = CommentSerializer
     permission_classes = (CommentPermission,)
+    access_model = Comment
 
     def get_queryset(self):
-        the_issue = get_object_or_404(Issue, pk=self.kwargs['issue_pk'])
+        the_issue = self.get_access_context().issue
         return Comment.objects.filter(issue=the_issue).order_by('comment_id')
 
+    def get_version(self):
+        if self.action in ('list', 'retrieve'):
+            return self.get_access_context().issue.version
+        return None
+
     def perform_create(self, serializer):
-        the_issue = get_object_or_404(Issue, pk=self.kwargs['issue_pk'])
+        the_issue = self.get_access_context().issue
         the_author_user = self.request.user
         serializer.save(author_user=the_author_user, issue=the_issue)
 
+    def perform_bulk_create(self, serializer):
+        serializer.save(author_user=self.request.user,
+                        issue=self.get_access_context().issue)
+
     def update(self, request, *args, **kwargs):
         return self.custom_update(request, 'description', **kwargs)
+
+
+class SearchViewSet(RenderTimingMixin, AccessContextMixin, viewsets.GenericViewSet):
+    """
+    class SearchViewSet manages the following endpoint :
+    /projects/{project_pk}/search/?q=
+    """
+    permission_classes = (SearchPermission,)
+    pagination_class = SearchPagination
+    hit_serializers = {'issue': (Issue, IssueSerializer),
+                       'comment': (Comment, CommentSerializer)}
+
+    def list(self, request, *args, **kwargs):
+        terms = parse_terms(request.query_params.get('q'))
+        if not terms:
+            raise ValidationError({'q': "please provide the words to search"})
+        results = SearchResults(self.get_access_context().project.pk, terms)
+        page = self.paginate_queryset(results)
+        return self.get_paginated_response(self.serialize_hits(page))
+
+    def serialize_hits(self, hits):
+        found = {kind: model.objects.in_bulk([pk for hit_kind, pk, rank in hits
+                                              if hit_kind == kind])
+                 for kind, (model, serializer_class) in self.hit_serializers.items()}
+        data = []
+        for kind, pk, rank in hits:
+            # skip the objects deleted since the hits were read
+            if pk in found[kind]:
+                serializer_class = self.hit_serializers[kind][1]
+                data.append({'type': kind, 'rank': round(rank, 6),
+                             kind: serializer_class(found[kind][pk]).data})
+        return data
+
+
+class ExportViewSet(RenderTimingMixin, AccessContextMixin, viewsets.GenericViewSet):
+    """
+    class ExportViewSet manages the following endpoint :
+    /projects/{project_pk}/export/?output=ndjson|csv
+
+    The issues of the project, each followed by its comments, are streamed
+    as they are read. Django 3.2 iterates a streaming response in the event
+    loop under ASGI, where the ORM can not run: the export is served by WSGI.
+    """
+    permission_classes = (ExportPermission,)
+
+    def perform_content_negotiation(self, request, force=False):
+        # the export is not rendered, only the errors are, by the first renderer
+        return super().perform_content_negotiation(request, force=True)
+
+    def list(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in ProjectExport.content_types:
+            raise ValidationError({'output': f"one of {', '.join(ProjectExport.content_types)}"})
+        the_project = self.get_access_context().project
+        # the replica is chosen now, the rows are read once the view has returned
+        export = ProjectExport(the_project.pk, using=router.db_for_read(Issue))
+        response = StreamingHttpResponse(getattr(export, output)(),
+                                         content_type=ProjectExport.content_types[output])
+        response['Content-Disposition'] = \
+            f'attachment; filename="project-{the_project.pk}.{output}"'
+        return response